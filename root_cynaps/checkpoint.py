@@ -0,0 +1,86 @@
+"""
+root_cynaps.checkpoint
+______________________
+Checkpoint and restart of composite models, used by Model.checkpoint and Model.restore.
+"""
+
+# Imports
+import pickle
+import numpy as np
+
+
+def save_checkpoint(path, time, g, soil_voxels, components):
+    """
+    Writes in a binary file everything needed to continue a simulation from the current time step:
+    the MTG with all component properties, the soil voxels, the model time, which is also the input tables cursor,
+    and the attributes listed in the checkpoint_attributes of each component.
+    """
+    state = dict(time=time, g=g, soil_voxels=soil_voxels,
+                 components={type(component).__name__: {name: getattr(component, name) for name in getattr(component, "checkpoint_attributes", ())}
+                             for component in components})
+    with open(path, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_checkpoint(path, g, soil_voxels, components):
+    """
+    Restores a checkpoint into an already initialized model.
+    Restored values are written in place in the existing MTG and soil containers, as components hold references to them.
+
+    :return: the model time of the checkpoint
+    """
+    with open(path, "rb") as f:
+        state = pickle.load(f)
+
+    restore_mtg(g, state["g"])
+    restore_in_place(soil_voxels, state["soil_voxels"])
+
+    for component in components:
+        for name, value in state["components"].get(type(component).__name__, {}).items():
+            setattr(component, name, value)
+        if hasattr(component, "post_restore_updating"):
+            component.post_restore_updating()
+        elif hasattr(component, "vertices"):
+            component.vertices = g.vertices(scale=g.max_scale())
+
+    return state["time"]
+
+
+def restore_mtg(g, saved):
+    """
+    Replaces the topology and properties of g by those of the saved MTG, keeping the property dictionaries linked to components.
+    Properties created after the checkpoint are emptied, as no vertex had values for them.
+    """
+    properties = g.properties()
+    saved_properties = saved.properties()
+    for name, values in properties.items():
+        values.clear()
+        if name in saved_properties:
+            values.update(saved_properties[name])
+        saved_properties[name] = values
+    spatial_indices = g.__dict__.get("_spatial_indices", {})
+    g.__dict__.update(saved.__dict__)
+    # Spatial indices of g are kept, to be rebuilt on their next query
+    g.__dict__["_spatial_indices"] = spatial_indices
+    for index in spatial_indices.values():
+        index.invalidate()
+
+
+def restore_in_place(current, saved):
+    """
+    Copies saved into current, recursively keeping the identity of nested dictionaries and arrays, and the saved keys order
+    """
+    if isinstance(current, dict):
+        previous = dict(current)
+        current.clear()
+        for key, value in saved.items():
+            if key in previous and isinstance(value, (dict, np.ndarray)) and type(previous[key]) == type(value) \
+                    and np.shape(previous[key]) == np.shape(value):
+                restore_in_place(previous[key], value)
+                current[key] = previous[key]
+            else:
+                current[key] = value
+    elif isinstance(current, np.ndarray):
+        current[...] = saved
+    else:
+        current.__dict__.update(saved.__dict__)
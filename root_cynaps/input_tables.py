@@ -0,0 +1,124 @@
+"""
+root_cynaps.input_tables
+________________________
+Input tables compiled into time-indexed arrays at model construction, so that applying the forcing of a time step does not search the tables.
+"""
+
+# Imports
+import numpy as np
+import pandas as pd
+
+
+class CompiledTable:
+    """
+    Numeric columns of an input table as a (rows, columns) array sorted by time, read through a monotone cursor.
+    Time is the 't' column if the table has one, its index otherwise.
+    Values are held constant before the first and after the last time of the table.
+
+    Tables are only sorted if needed, and the times and values arrays are views of the table data when it already holds floats in a single block,
+    e.g. tables loaded from the memory-mapped files of simulation.SharedTable, a leading 't' column being read from the same array.
+    Tables of several columns stored apart are copied once into a (rows, columns) array so that a row is read contiguously.
+
+    :param interpolation: 'linear' to interpolate between rows, 'step' to keep the values of the last row reached
+    """
+
+    def __init__(self, table, interpolation="linear"):
+        if interpolation not in ("linear", "step"):
+            raise ValueError(f"Unknown interpolation {interpolation}, expected 'linear' or 'step'")
+        if isinstance(table, pd.Series):
+            table = table.to_frame()
+        if len(table.columns) > 1 and table.columns[0] == "t" and all(np.issubdtype(dtype, np.number) for dtype in table.dtypes) \
+                and table["t"].is_monotonic_increasing:
+            # Times are read from the same array as values, as setting the index would split the block they are stored in
+            data = table.to_numpy(dtype=float)
+            self.columns = list(table.columns[1:])
+            self.times = data[:, 0]
+            self.values = data[:, 1:]
+        else:
+            if "t" in table.columns:
+                table = table.set_index("t")
+            if not all(np.issubdtype(dtype, np.number) for dtype in table.dtypes):
+                table = table.select_dtypes(include="number")
+            if not table.index.is_monotonic_increasing:
+                table = table.sort_index()
+
+            self.columns = list(table.columns)
+            self.times = table.index.to_numpy(dtype=float)
+            self.values = table.to_numpy(dtype=float)
+        self.interpolation = interpolation
+        self.cursor = 0
+
+    def seek(self, when):
+        """
+        Moves the cursor to the last row whose time is lower or equal to when, stepping forward from the previous position when time increases
+        and searching the table only when time goes back (e.g. after a restore)
+        """
+        times = self.times
+        k = self.cursor
+        if when < times[k]:
+            k = max(0, int(np.searchsorted(times, when, side="right")) - 1)
+        else:
+            last = len(times) - 1
+            while k < last and times[k + 1] <= when:
+                k += 1
+        self.cursor = k
+        return k
+
+    def __call__(self, when):
+        """
+        :return: array of the columns values at time when
+        """
+        k = self.seek(when)
+        # Values are held after the last row
+        if self.interpolation == "step" or when <= self.times[k] or k == len(self.times) - 1:
+            return self.values[k]
+        return self.values[k] + (self.values[k + 1] - self.values[k]) * ((when - self.times[k]) / (self.times[k + 1] - self.times[k]))
+
+
+class InputTables:
+    """
+    Applies the values of several compiled input tables to the components declaring their columns,
+    each column being bound once to the attributes of these components.
+    Values are set on every entry of the bound property dictionaries, i.e. the single entry of plant scale properties.
+
+    :param tables: dict of input tables (DataFrame or Series) by name
+    :param to: components the tables are applied to
+    :param interpolation: 'linear' or 'step' for all tables, or dict of these values by table name (default 'linear')
+    """
+
+    def __init__(self, tables, to, interpolation="linear"):
+        tables = tables or {}
+        self.tables = {}
+        self.bindings = {}
+        for name, table in tables.items():
+            method = interpolation.get(name, "linear") if isinstance(interpolation, dict) else interpolation
+            compiled = CompiledTable(table, interpolation=method)
+            if len(compiled.times) == 0:
+                continue
+            self.tables[name] = compiled
+            self.bindings[name] = [(j, [component for component in to if column in getattr(component, "__dataclass_fields__", {})])
+                                   for j, column in enumerate(compiled.columns)]
+
+    def values(self, when):
+        """
+        :return: dict of the values of all the tables columns at time when
+        """
+        values = {}
+        for compiled in self.tables.values():
+            values.update(zip(compiled.columns, compiled(when).tolist()))
+        return values
+
+    def apply(self, when):
+        for name, compiled in self.tables.items():
+            row = compiled(when)
+            for j, components in self.bindings[name]:
+                value = float(row[j])
+                column = compiled.columns[j]
+                for component in components:
+                    prop = getattr(component, column)
+                    if isinstance(prop, dict) and len(prop) == 1:
+                        prop[next(iter(prop))] = value
+                    elif hasattr(prop, "update"):
+                        prop.update(dict.fromkeys(prop, value))
+                    else:
+                        setattr(component, column, value)
@@ -0,0 +1,72 @@
+"""
+root_cynaps.kernels
+___________________
+Compiled array kernels of the nitrogen rate formulas, used by RootNitrogenModel vectorized processes when jit_kernels is True.
+
+Kernels are compiled with numba when it is installed. Otherwise jit_available is False and the model keeps using its NumPy formulations,
+the Python version of each kernel remaining available as kernel.py_func in both cases for validation.
+"""
+
+# Imports
+import math
+import numpy as np
+
+try:
+    from numba import njit
+    jit_available = True
+except ImportError:
+    njit = None
+    jit_available = False
+
+
+def kernel(f):
+    """
+    Compiles f in nopython mode if numba is available
+    """
+    if jit_available:
+        return njit(cache=True)(f)
+    f.py_func = f
+    return f
+
+
+@kernel
+def import_Nm(Nm, soil_Nm, root_exchange_surface, C_hexose_root, temperature_factor,
+              Km_Nm_root_LATS, Km_Nm_root_HATS, begin_N_regulation, span_N_regulation, vmax_Nm_root, transport_C_regulation):
+    precision = 0.99
+    regulation = precision / ((1 - precision) * math.exp(-begin_N_regulation))
+    out = np.empty(Nm.shape[0])
+    for i in range(Nm.shape[0]):
+        Km_Nm_root = (Km_Nm_root_LATS - Km_Nm_root_HATS) / (1 + regulation * math.exp(-Nm[i] / span_N_regulation)) + Km_Nm_root_HATS
+        out[i] = ((soil_Nm[i] * vmax_Nm_root * temperature_factor[i] / (soil_Nm[i] + Km_Nm_root)) * root_exchange_surface[i]
+                  * (C_hexose_root[i] / (C_hexose_root[i] + transport_C_regulation)))
+    return out
+
+
+@kernel
+def AA_synthesis(struct_mass, Nm, C_hexose_root, temperature_factor, smax_AA, Km_Nm_AA, Km_C_AA):
+    out = np.zeros(Nm.shape[0])
+    for i in range(Nm.shape[0]):
+        if C_hexose_root[i] > 0 and Nm[i] > 0:
+            out[i] = struct_mass[i] * smax_AA * temperature_factor[i] / (((1 + Km_Nm_AA) / Nm[i]) + ((1 + Km_C_AA) / C_hexose_root[i]))
+    return out
+
+
+@kernel
+def storage_synthesis(struct_mass, AA, temperature_factor, smax_stor, Km_AA_stor):
+    out = np.empty(AA.shape[0])
+    for i in range(AA.shape[0]):
+        out[i] = struct_mass[i] * (smax_stor * temperature_factor[i] * AA[i] / (Km_AA_stor + AA[i]))
+    return out
+
+
+@kernel
+def catabolism(struct_mass, substrate, C_hexose_root, temperature_factor, cmax, Km_catab, storage_C_regulation):
+    """
+    Common Michaelis-Menten formula of storage and AA catabolism, with a Km regulated by root hexose
+    """
+    out = np.empty(substrate.shape[0])
+    for i in range(substrate.shape[0]):
+        Km = Km_catab * math.exp(storage_C_regulation * C_hexose_root[i])
+        out[i] = struct_mass[i] * cmax * temperature_factor[i] * substrate[i] / (Km + substrate[i])
+    return out
+
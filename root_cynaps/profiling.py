@@ -0,0 +1,112 @@
+"""
+root_cynaps.profiling
+_____________________
+Per-step profiling of composite model runs, used by Model.start_profiling.
+"""
+
+# Imports
+import sys
+import inspect
+from time import perf_counter
+import numpy as np
+import pandas as pd
+
+
+class StepProfiler:
+    """
+    Records, for each time step, the wall time, number of calls and number of processed vertices of the methods of the model components,
+    among which the decorated processes (rate, state, axial, totalrate, stepinit...) and the components calls themselves.
+    Methods are traced through a profiling hook only installed between start and stop, so that a model which is not profiled runs unchanged.
+
+    Wall times of methods calling other traced methods include them.
+    Processed vertices are 1 per call for per-vertex processes, the size of vertex-indexed arrays for vectorized processes,
+    and all the component vertices for methods without arguments.
+    """
+
+    columns = ["step", "component", "process", "calls", "vertices", "wall_time"]
+
+    def __init__(self, model, components):
+        self.components = {id(instance): instance for instance in (model,) + tuple(components)}
+        self.codes = {}
+        for instance in self.components.values():
+            for cls in type(instance).__mro__[:-1]:
+                for name, value in vars(cls).items():
+                    function = traced_function(value)
+                    if function is not None and (name == "__call__" or not name.startswith("__")):
+                        self.codes.setdefault(function.__code__, name)
+        self.records = []
+        self.step_records = None
+        self.started = {}
+
+    def start(self, step):
+        self.step = step
+        self.step_records = {}
+        self.started.clear()
+        self.step_start = perf_counter()
+        sys.setprofile(self.trace)
+
+    def stop(self):
+        # Stopping a profiler which is not recording a step, e.g. from stop_profiling after a run stopped it, does nothing
+        if self.step_records is None:
+            return
+        sys.setprofile(None)
+        wall_time = perf_counter() - self.step_start
+        self.records.append((self.step, "model", "step", 1, 0, wall_time))
+        for (component, process), (calls, vertices, wall_time) in self.step_records.items():
+            self.records.append((self.step, component, process, calls, vertices, wall_time))
+        self.step_records = None
+
+    def trace(self, frame, event, arg):
+        if event == "call":
+            process = self.codes.get(frame.f_code)
+            if process is not None:
+                instance = self.components.get(id(frame.f_locals.get("self")))
+                if instance is not None:
+                    self.started[frame] = (type(instance).__name__, process, processed_vertices(instance, frame.f_locals), perf_counter())
+        elif event == "return" and frame in self.started:
+            component, process, vertices, start = self.started.pop(frame)
+            record = self.step_records.setdefault((component, process), [0, 0, 0.])
+            record[0] += 1
+            record[1] += vertices
+            record[2] += perf_counter() - start
+
+    def table(self):
+        """
+        :return: DataFrame with one row per step and traced method, the whole step being reported as the 'step' process of 'model'
+        """
+        return pd.DataFrame(self.records, columns=self.columns)
+
+    def to_csv(self, path):
+        self.table().to_csv(path, index=False)
+
+    def to_json(self, path):
+        self.table().to_json(path, orient="records", indent=1)
+
+
+def traced_function(value):
+    """
+    Returns the function actually executed for a class attribute, looking through decorators, or None if it is not a method
+    """
+    if isinstance(value, (staticmethod, classmethod)):
+        value = value.__func__
+    if not inspect.isfunction(value):
+        return None
+    value = inspect.unwrap(value)
+    # Decorators which do not keep the decorated function in __wrapped__ still hold it in their closure
+    while value.__closure__ is not None:
+        inner = [cell.cell_contents for cell in value.__closure__ if inspect.isfunction(cell.cell_contents)]
+        if len(inner) != 1:
+            break
+        value = inner[0]
+    return value
+
+
+def processed_vertices(instance, arguments):
+    arguments = [value for name, value in arguments.items() if name != "self" and not (isinstance(value, tuple) and len(value) == 0)]
+    sizes = [value.shape[-1] for value in arguments if isinstance(value, np.ndarray) and value.ndim > 0]
+    if len(sizes) > 0:
+        return max(sizes)
+    elif len(arguments) > 0:
+        return 1
+    else:
+        return len(getattr(instance, "vertices", ()))
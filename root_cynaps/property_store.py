@@ -0,0 +1,223 @@
+"""
+root_cynaps.property_store
+__________________________
+Columnar storage of the vertex-scale float properties of components, behind the {vid: value} dictionary interface of MTG properties.
+"""
+
+# Imports
+import numbers
+from collections.abc import MutableMapping
+import numpy as np
+
+
+class VertexRows:
+    """
+    Vertex id to row index shared by all the columnar properties of an MTG.
+    Rows are attributed in order of appearance and never move, the capacity of columns growing by doubling.
+    """
+
+    def __init__(self, capacity=64):
+        self.row = {}
+        self.vids = []
+        self.capacity = capacity
+        self._rows_cache = {}
+
+    def add(self, vid):
+        row = len(self.vids)
+        self.row[vid] = row
+        self.vids.append(vid)
+        while self.capacity <= row:
+            self.capacity *= 2
+        return row
+
+    def rows(self, vids):
+        """
+        Rows of the provided vertex ids, added to the index if missing.
+        Rows of the long-lived vertex lists of components and topology are cached, as a row never changes once attributed.
+        """
+        key = id(vids)
+        cached = self._rows_cache.get(key)
+        if cached is not None and cached[0] is vids and len(cached[1]) == len(vids):
+            return cached[1]
+        row = self.row
+        rows = np.fromiter((row[vid] if vid in row else self.add(vid) for vid in vids), dtype=int, count=len(vids))
+        if len(self._rows_cache) >= 8:
+            self._rows_cache.clear()
+        self._rows_cache[key] = (vids, rows)
+        return rows
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_rows_cache"] = {}
+        return state
+
+
+class ColumnarProperty(MutableMapping):
+    """
+    Float64 column of a vertex property indexed by a shared VertexRows, usable as the {vid: value} dictionary it replaces.
+    Values are returned as Python floats, and presence of each vertex is tracked so that missing vertices still raise KeyError.
+
+    take and put read and write the values of a list of vertices at once, without going through Python objects.
+    """
+
+    def __init__(self, index, values=()):
+        self.index = index
+        self.column = np.zeros(index.capacity)
+        self.present = bytearray(index.capacity)
+        self.count = 0
+        self.update(values)
+
+    def grow(self):
+        column = np.zeros(self.index.capacity)
+        column[:len(self.column)] = self.column
+        self.column = column
+        self.present += bytearray(self.index.capacity - len(self.present))
+
+    def __getitem__(self, vid):
+        row = self.index.row[vid]
+        if row < len(self.present) and self.present[row]:
+            return self.column.item(row)
+        raise KeyError(vid)
+
+    def __setitem__(self, vid, value):
+        row = self.index.row.get(vid)
+        if row is None:
+            row = self.index.add(vid)
+        if row >= len(self.present):
+            self.grow()
+        if not self.present[row]:
+            self.present[row] = 1
+            self.count += 1
+        self.column[row] = value
+
+    def __delitem__(self, vid):
+        row = self.index.row[vid]
+        if row >= len(self.present) or not self.present[row]:
+            raise KeyError(vid)
+        self.present[row] = 0
+        self.count -= 1
+
+    def __contains__(self, vid):
+        row = self.index.row.get(vid)
+        return row is not None and row < len(self.present) and self.present[row] == 1
+
+    def __iter__(self):
+        return (vid for vid, present in zip(self.index.vids, self.present) if present)
+
+    def __len__(self):
+        return self.count
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def clear(self):
+        self.present[:] = bytearray(len(self.present))
+        self.count = 0
+
+    def copy(self):
+        copied = ColumnarProperty(self.index)
+        copied.column = self.column.copy()
+        copied.present = bytearray(self.present)
+        copied.count = self.count
+        return copied
+
+    def take(self, vids, default=None):
+        """
+        Values of the provided vertices as a float array
+
+        :param default: value of the missing vertices, which raise KeyError if None
+        """
+        rows = self.index.rows(vids)
+        if len(self.present) < self.index.capacity:
+            self.grow()
+        present = np.frombuffer(self.present, dtype=np.uint8)[rows].astype(bool)
+        values = self.column[rows]
+        if not present.all():
+            if default is None:
+                raise KeyError(vids[int(np.argmin(present))])
+            values[~present] = default
+        return values
+
+    def put(self, vids, values):
+        """
+        Writes a float array of values for the provided vertices
+        """
+        rows = self.index.rows(vids)
+        if len(self.present) < self.index.capacity:
+            self.grow()
+        self.column[rows] = values
+        present = np.frombuffer(self.present, dtype=np.uint8)
+        self.count += len(np.unique(rows[present[rows] == 0]))
+        present[rows] = 1
+
+    def scale(self, factor):
+        """
+        Multiplies the values of all present vertices by factor
+        """
+        present = np.frombuffer(self.present, dtype=np.uint8).astype(bool)
+        self.column[present] *= factor
+
+
+def take(prop, vids):
+    """
+    Values of the {vid: value} property for the provided vertices as a float array
+    """
+    if isinstance(prop, ColumnarProperty):
+        return prop.take(vids)
+    return np.fromiter((prop[vid] for vid in vids), dtype=float, count=len(vids))
+
+
+def put(prop, vids, values):
+    """
+    Writes back a float array into the {vid: value} property for the provided vertices
+    """
+    if isinstance(prop, ColumnarProperty):
+        prop.put(vids, values)
+    else:
+        prop.update(zip(vids, values.tolist()))
+
+
+def scale(prop, factor):
+    """
+    Multiplies in place all the values of the {vid: value} property by factor
+    """
+    if isinstance(prop, ColumnarProperty):
+        prop.scale(factor)
+    else:
+        vids = list(prop)
+        put(prop, vids, take(prop, vids) * factor)
+
+
+def columnar_properties(g, components, linked=()):
+    """
+    Replaces the {vid: value} dictionaries of the vertex-scale float properties declared by the components
+    by ColumnarProperty sharing a single vertex index,
+    and rebinds the attributes of components and linked ones which were referencing the replaced dictionaries.
+    Plant-scale properties and properties holding other values than real numbers are left unchanged.
+
+    :param linked: other components sharing the MTG, whose own properties are kept as dictionaries
+    :return: names of the replaced properties
+    """
+    props = g.properties()
+    vertices = g.vertices(scale=g.max_scale())
+    index = next((prop.index for prop in props.values() if isinstance(prop, ColumnarProperty)), None)
+    if index is None:
+        index = VertexRows(capacity=max(64, len(vertices)))
+        index.rows(vertices)
+
+    replaced = {}
+    for component in components:
+        for name, field in getattr(component, "__dataclass_fields__", {}).items():
+            prop = props.get(name)
+            if (not isinstance(prop, dict) or len(prop) <= 1 or id(prop) in replaced
+                    or field.metadata.get("variable_type") in ("parameter", "plant_scale_state")):
+                continue
+            if all(isinstance(value, numbers.Real) and not isinstance(value, bool) for value in prop.values()):
+                props[name] = ColumnarProperty(index, prop)
+                replaced[id(prop)] = (name, props[name])
+
+    for component in tuple(components) + tuple(linked):
+        for attribute, value in list(vars(component).items()):
+            if id(value) in replaced:
+                setattr(component, attribute, replaced[id(value)][1])
+    return [name for name, _ in replaced.values()]
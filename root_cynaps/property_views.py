@@ -0,0 +1,154 @@
+"""
+root_cynaps.property_views
+__________________________
+Row-aligned array views of MTG properties and ring buffer logging of their time steps, used by the simulation logging path.
+"""
+
+# Imports
+import numpy as np
+import xarray as xr
+from root_cynaps.property_store import ColumnarProperty
+
+
+class PropertyViews:
+    """
+    Float arrays of the logged MTG properties, aligned on a persistent vertex index.
+    Rows are attributed to vertices in order of appearance and never move afterwards,
+    so that a row keeps describing the same vertex between time steps, new vertices being appended after growth.
+    Arrays are preallocated with an amortized capacity and only gathered again from the MTG on refresh.
+
+    Properties absent from the MTG, or from some vertices (e.g. plant scale properties only stored on the collar vertex), are NaN.
+    """
+
+    def __init__(self, g, variables, capacity=64):
+        self.g = g
+        self.variables = dict(variables)
+        self.vids = []
+        self.row = {}
+        self.capacity = capacity
+        self.arrays = {name: np.full(capacity, np.nan) for name in self.variables}
+
+    @property
+    def size(self):
+        return len(self.vids)
+
+    def update_index(self):
+        """
+        Appends the vertices which appeared since the last update to the index.
+
+        :return: True if vertices have been added
+        """
+        new_vids = [vid for vid in self.g.vertices(scale=self.g.max_scale()) if vid not in self.row]
+        if len(new_vids) == 0:
+            return False
+        self.row.update(zip(new_vids, range(self.size, self.size + len(new_vids))))
+        self.vids += new_vids
+        if self.size > self.capacity:
+            while self.capacity < self.size:
+                self.capacity *= 2
+            for name, array in self.arrays.items():
+                grown = np.full(self.capacity, np.nan)
+                grown[:len(array)] = array
+                self.arrays[name] = grown
+        return True
+
+    def refresh(self):
+        """
+        Gathers the current property values into the arrays.
+
+        :return: set of the names of the properties whose values changed since the last refresh, new vertices included
+        """
+        added = self.update_index()
+        props = self.g.properties()
+        changed = set()
+        for name, array in self.arrays.items():
+            prop = props.get(name)
+            if prop is None:
+                continue
+            if isinstance(prop, ColumnarProperty):
+                values = prop.take(self.vids, default=np.nan)
+            else:
+                values = np.fromiter((prop.get(vid, np.nan) for vid in self.vids), dtype=float, count=self.size)
+            current = array[:self.size]
+            if added or not np.array_equal(current, values, equal_nan=True):
+                current[:] = values
+                changed.add(name)
+        return changed
+
+    def view(self, name):
+        """
+        Read-only view of the property array over the indexed vertices, valid until the next refresh adding vertices
+        """
+        view = self.arrays[name][:self.size]
+        view.flags.writeable = False
+        return view
+
+    def __getitem__(self, name):
+        return self.view(name)
+
+
+class RingBufferLogger:
+    """
+    Logs time steps of PropertyViews into preallocated (time, vertex) buffers, flushed as a single Dataset to a writer
+    providing an append(datasets) method (e.g. NetCDFTimeWriter) once capacity steps have been logged.
+
+    Only the arrays which changed since the previous step are copied,
+    unchanged ones pointing to the buffer slot holding their last values until the flush expands them.
+    Buffers are also flushed when vertices are added, so that each flushed Dataset covers a constant set of vertices.
+    """
+
+    def __init__(self, views, writer, capacity=100, time_dim="t", vertex_dim="vid"):
+        self.views = views
+        self.writer = writer
+        self.capacity = capacity
+        self.time_dim = time_dim
+        self.vertex_dim = vertex_dim
+        self.times = np.empty(capacity)
+        self.slots = 0
+        self.size = 0
+        self.allocate()
+
+    def allocate(self):
+        self.width = self.views.capacity
+        self.buffers = {name: np.empty((self.capacity, self.width)) for name in self.views.variables}
+        self.sources = {name: np.zeros(self.capacity, dtype=int) for name in self.views.variables}
+
+    def snapshot(self, time):
+        """
+        Logs the current property values as time step time
+        """
+        changed = self.views.refresh()
+        if self.views.size != self.size:
+            self.flush()
+            self.size = self.views.size
+            if self.views.capacity != self.width:
+                self.allocate()
+        slot = self.slots
+        size = self.size
+        for name, buffer in self.buffers.items():
+            if slot == 0 or name in changed:
+                buffer[slot, :size] = self.views.arrays[name][:size]
+                self.sources[name][slot] = slot
+            else:
+                self.sources[name][slot] = self.sources[name][slot - 1]
+        self.times[slot] = time
+        self.slots += 1
+        if self.slots >= self.capacity:
+            self.flush()
+
+    def dataset(self):
+        """
+        :return: Dataset of the time steps logged since the last flush
+        """
+        size = self.size
+        data_vars = {}
+        for name, description in self.views.variables.items():
+            values = self.buffers[name][self.sources[name][:self.slots], :size]
+            data_vars[name] = xr.Variable((self.time_dim, self.vertex_dim), values, attrs=description)
+        return xr.Dataset(data_vars, coords={self.time_dim: self.times[:self.slots].copy(),
+                                             self.vertex_dim: np.array(self.views.vids[:size], dtype=int)})
+
+    def flush(self):
+        if self.slots > 0:
+            self.writer.append([self.dataset()])
+            self.slots = 0
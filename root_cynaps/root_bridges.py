@@ -12,6 +12,9 @@ from root_cynaps.root_water import RootWaterModel
 # Utilities
 from metafspm.composite_wrapper import CompositeModel
 from metafspm.component_factory import Choregrapher
+from root_cynaps.checkpoint import save_checkpoint, load_checkpoint
+from root_cynaps.profiling import StepProfiler
+from root_cynaps.input_tables import InputTables
 
 
 class Model(CompositeModel):
@@ -43,6 +46,7 @@ class Model(CompositeModel):
         self.time = 0
         parameters = scenario["parameters"]["root_bridges"]
         self.input_tables = scenario["input_tables"]
+        self.profiler = None
 
         # INIT INDIVIDUAL MODULES
         if len(scenario["input_mtg"]) > 0:
@@ -51,7 +55,7 @@ class Model(CompositeModel):
             self.root_growth = RootGrowthModelCoupled(time_step, **parameters)
         self.g = self.root_growth.g
         self.root_anatomy = RootAnatomy(self.g, time_step, **parameters)
-        self.root_water = RootWaterModel(self.g, time_step/10, **parameters)
+        self.root_water = RootWaterModel(self.g, time_step, **parameters)
         self.root_cn = RootCNUnified(self.g, time_step, **parameters)
         self.soil = SoilModel(self.g, time_step, **parameters)
         self.soil_voxels = self.soil.voxels
@@ -64,29 +68,66 @@ class Model(CompositeModel):
         self.link_around_mtg(translator_path=root_bridges.__path__[0])
 
         self.root_water.post_coupling_init()
+        self.input_forcing = InputTables(self.input_tables, to=self.models)
 
 
     def run(self):
-        self.apply_input_tables(tables=self.input_tables, to=self.models, when=self.time)
+        if self.profiler is not None:
+            self.profiler.start(self.time)
 
-        # Update environment boundary conditions
-        self.soil()
+        # The profiling hook is removed even if the step fails, otherwise it would trace everything run afterwards
+        try:
+            self.input_forcing.apply(when=self.time)
 
-        # Compute root growth from resulting states
-        self.root_growth()
+            # Update environment boundary conditions
+            self.soil()
 
-        # Extend property dictionaries after growth
-        self.root_anatomy.post_growth_updating()
-        self.root_water.post_growth_updating()
-        self.root_cn.post_growth_updating()
-        self.soil.post_growth_updating()
+            # Compute root growth from resulting states
+            self.root_growth()
+
+            # Extend property dictionaries after growth
+            self.root_anatomy.post_growth_updating()
+            self.root_water.post_growth_updating()
+            self.root_cn.post_growth_updating()
+            self.soil.post_growth_updating()
         
-        # Update topological surfaces and volumes based on other evolved structural properties
-        self.root_anatomy()
+            # Update topological surfaces and volumes based on other evolved structural properties
+            self.root_anatomy()
+
+            # Compute state variations for water and then carbon and nitrogen
+            self.root_water()
+            self.root_cn()
 
-        # Compute state variations for water and then carbon and nitrogen
-        self.root_water()
-        self.root_cn()
+            self.time += 1
+        finally:
+            if self.profiler is not None:
+                self.profiler.stop()
 
-        self.time += 1
+    def checkpoint(self, path):
+        """
+        Saves the current simulation state in a binary file at path, so that the run can be continued later with restore.
+        """
+        save_checkpoint(path, time=self.time, g=self.g, soil_voxels=self.soil_voxels, components=self.models)
+
+    def restore(self, path):
+        """
+        Restores a simulation state saved with checkpoint into this initialized model, following runs continuing from it.
+        """
+        self.time = load_checkpoint(path, g=self.g, soil_voxels=self.soil_voxels, components=self.models)
 
+    def start_profiling(self):
+        """
+        Starts recording the wall time, calls and processed vertices of each component method during the following runs.
+        """
+        self.profiler = StepProfiler(self, components=self.models)
+
+    def stop_profiling(self):
+        """
+        Stops profiling runs.
+
+        :return: the StepProfiler holding the per-step table, to be exported with its to_csv or to_json methods
+        """
+        profiler, self.profiler = self.profiler, None
+        if profiler is not None:
+            profiler.stop()
+        return profiler
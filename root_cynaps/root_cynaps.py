@@ -8,6 +8,10 @@ from rhizodep.root_growth import RootGrowthModel
 
 from metafspm.composite_wrapper import CompositeModel
 from metafspm.component_factory import Choregrapher
+from root_cynaps.checkpoint import save_checkpoint, load_checkpoint
+from root_cynaps.profiling import StepProfiler
+from root_cynaps.property_store import columnar_properties
+from root_cynaps.input_tables import InputTables
 
 from analyze.analyze import add_root_order_when_branching_is_wrong
 
@@ -26,7 +30,7 @@ class Model(CompositeModel):
     4. Use Model.run() in a for loop to perform the computations of a time step on the passed MTG File
     """
 
-    def __init__(self, name: str = "Plant", time_step: int = 3600, coordinates: list=[0, 0, 0], **scenario: dict):
+    def __init__(self, name: str = "Plant", time_step: int = 3600, coordinates: list=[0, 0, 0], input_interpolation="linear", **scenario: dict):
         """
         DESCRIPTION
         ----------
@@ -34,6 +38,7 @@ class Model(CompositeModel):
 
         :param g: the openalea.MTG() instance that will be worked on. It must be representative of a root architecture.
         :param time_step: the resolution time_step of the model in seconds.
+        :param input_interpolation: 'linear' or 'step' interpolation of input tables between their rows, or dict of these by table name.
         """
 
         # DECLARE GLOBAL SIMULATION TIME STEP
@@ -44,6 +49,7 @@ class Model(CompositeModel):
         self.time = parameters["plant_age"]
 
         self.input_tables = scenario["input_tables"]
+        self.profiler = None
 
         # INIT INDIVIDUAL MODULES
         # Here we use the growth model simply to initialize the structural mass and distance from tip regarding provided MTG's geometry.
@@ -51,7 +57,7 @@ class Model(CompositeModel):
         self.g = self.root_growth.g
         add_root_order_when_branching_is_wrong(self.g)
         self.root_anatomy = RootAnatomy(self.g, time_step, **parameters)
-        self.root_water = RootWaterModel(self.g, time_step/10, **parameters)
+        self.root_water = RootWaterModel(self.g, time_step, **parameters)
         self.root_nitrogen = RootNitrogenModel(self.g, time_step, **parameters)
         self.soil = SoilModel(self.g, time_step, **parameters)
         self.soil_voxels = self.soil.voxels
@@ -63,15 +69,66 @@ class Model(CompositeModel):
 
         # Some initialization must be performed after linking modules
         self.root_water.post_coupling_init()
+        # Input tables are compiled once so that applying them at each time step does not search them
+        self.input_forcing = InputTables(self.input_tables, to=(self.soil, self.root_water, self.root_nitrogen, self.root_anatomy, self.root_growth),
+                                         interpolation=input_interpolation)
         # Update topological surfaces and volumes based on initialized structural properties
         self.root_anatomy()
         self.soil()
 
+        # Once all properties have been created, those of water and nitrogen models may be stored as columns
+        if self.root_nitrogen.columnar_properties:
+            columnar_properties(self.g, components=(self.root_water, self.root_nitrogen),
+                                linked=(self.soil, self.root_anatomy, self.root_growth))
+
     def run(self):
-        self.apply_input_tables(tables=self.input_tables, to=self.components, when=self.time)
+        if self.profiler is not None:
+            self.profiler.start(self.time)
+
+        # The profiling hook is removed even if the step fails, otherwise it would trace everything run afterwards
+        try:
+            self.input_forcing.apply(when=self.time)
         
-        # Compute state variations for water and then carbon and nitrogen
-        self.root_water()
-        self.root_nitrogen()
+            # Compute state variations for water and then carbon and nitrogen
+            self.root_water()
+            self.root_nitrogen()
+
+            self.time += 1
+        finally:
+            if self.profiler is not None:
+                self.profiler.stop()
+
+    def set_ensemble(self, **parameters):
+        """
+        Computes several sets of nitrogen parameters at once in each run, see RootNitrogenModel.set_ensemble for the members outputs.
+        """
+        self.root_nitrogen.set_ensemble(**parameters)
+
+    def checkpoint(self, path):
+        """
+        Saves the current simulation state in a binary file at path, so that the run can be continued later with restore.
+        """
+        save_checkpoint(path, time=self.time, g=self.g, soil_voxels=self.soil_voxels, components=(self.soil, self.root_water, self.root_nitrogen, self.root_anatomy, self.root_growth))
 
-        self.time += 1
+    def restore(self, path):
+        """
+        Restores a simulation state saved with checkpoint into this initialized model, following runs continuing from it.
+        """
+        self.time = load_checkpoint(path, g=self.g, soil_voxels=self.soil_voxels, components=(self.soil, self.root_water, self.root_nitrogen, self.root_anatomy, self.root_growth))
+
+    def start_profiling(self):
+        """
+        Starts recording the wall time, calls and processed vertices of each component method during the following runs.
+        """
+        self.profiler = StepProfiler(self, components=(self.soil, self.root_water, self.root_nitrogen, self.root_anatomy, self.root_growth))
+
+    def stop_profiling(self):
+        """
+        Stops profiling runs.
+
+        :return: the StepProfiler holding the per-step table, to be exported with its to_csv or to_json methods
+        """
+        profiler, self.profiler = self.profiler, None
+        if profiler is not None:
+            profiler.stop()
+        return profiler
@@ -14,10 +14,15 @@ Methods' names are systematic through all class for ease of use :
 
 # Imports
 import numpy as np
+from contextlib import contextmanager
 from dataclasses import dataclass
+from inspect import signature
 
 from metafspm.component import Model, declare
 from metafspm.component_factory import *
+from root_cynaps.topology import TopologyIndex
+from root_cynaps.property_store import take, put
+from root_cynaps import kernels
 
 
 family = "metabolic"
@@ -31,6 +36,25 @@ class RootNitrogenModel(Model):
 
     family = family
 
+    # Processes evaluated at once on vertex-indexed arrays when vectorized_processes is True, in scheduling order
+    vertex_rates = ("import_Nm", "nitrate_transporters_affinity_factor", "diffusion_Nm_soil", "export_Nm", "diffusion_Nm_xylem",
+                    "diffusion_Nm_soil_xylem", "import_AA", "diffusion_AA_soil", "export_AA", "diffusion_AA_soil_xylem",
+                    "diffusion_AA_phloem", "AA_synthesis", "struct_synthesis", "storage_synthesis", "storage_catabolism",
+                    "AA_catabolism")
+    vertex_states = ("Nm", "AA", "storage_protein", "xylem_Nm", "xylem_AA", "xylem_struct_mass", "phloem_struct_mass")
+    # Inputs of the axial transport of N in xylem
+    axial_transport_inputs = ("struct_mass", "xylem_water", "axial_export_water_up", "axial_import_water_down", "radius",
+                              "export_Nm", "diffusion_Nm_soil_xylem", "diffusion_Nm_xylem", "export_AA", "diffusion_AA_soil_xylem",
+                              "xylem_Nm", "xylem_AA", "xylem_struct_mass", "cumulated_radial_exchanges_Nm", "cumulated_radial_exchanges_AA",
+                              "displaced_Nm_in", "displaced_AA_in", "displaced_Nm_out", "displaced_AA_out")
+    plant_states = ("total_phloem_AA", "AA_root_shoot_phloem_record", "total_cytokinins", "total_struct_mass", "total_Nm",
+                    "total_AA", "total_xylem_Nm", "total_xylem_AA", "total_AA_rhizodeposition", "total_hexose")
+    # Outputs of the axial transport of N in xylem, at vertex scale
+    axial_transport_outputs = ("cumulated_radial_exchanges_Nm", "cumulated_radial_exchanges_AA", "displaced_Nm_in", "displaced_AA_in",
+                               "displaced_Nm_out", "displaced_AA_out", "Nm_differential_by_water_transport")
+    # Ensemble members states, restored with checkpoints
+    checkpoint_attributes = ("ensemble_parameters", "ensemble_size", "ensemble")
+
     # --- INPUTS STATE VARIABLES FROM OTHER COMPONENTS : default values are provided if not superimposed by model coupling ---
 
     # FROM CARBON MODEL
@@ -294,6 +318,23 @@ class RootNitrogenModel(Model):
                                                 min_value="", max_value="", value_comment="", references="", DOI="",
                                                 variable_type="parameter", by="model_nitrogen", state_variable_type="", edit_by="user")
 
+    # computation mode
+    vectorized_processes: bool =        declare(default=False, unit="adim", unit_comment="", description="If True, vertex-scale processes are computed for all root segments at once on vertex-indexed arrays instead of one vertex at a time",
+                                                min_value="", max_value="", value_comment="", references="", DOI="",
+                                                variable_type="parameter", by="model_nitrogen", state_variable_type="", edit_by="user")
+    axial_transport_solver: str =       declare(default="iterative", unit="adim", unit_comment="", description="Algorithm used for axial transport in xylem, either 'iterative' chasing of each exported water column, or 'tree_flow' single pass on water volumes cumulated along the root system, to be selected explicitly as it shares downward columns crossing several branchings differently and accounts for all inflows in Nm_differential_by_water_transport",
+                                                min_value="", max_value="", value_comment="", references="", DOI="",
+                                                variable_type="parameter", by="model_nitrogen", state_variable_type="", edit_by="user")
+    pool_update_solver: str =           declare(default="explicit", unit="adim", unit_comment="", description="Time integration of Nm, AA and xylem pools, either 'explicit' Euler update with negative balances carried over as deficits to the next time step, or 'semi_implicit' update where the rates emptying a pool are limited in proportion to the pool available after gains (Patankar scheme), the limited amounts being credited to receiving pools so that nitrogen is conserved, which keeps Nm and AA pools positive without deficits for time steps of several hours (xylem pools keep the explicit balance of displaced water columns)",
+                                                min_value="", max_value="", value_comment="", references="", DOI="",
+                                                variable_type="parameter", by="model_nitrogen", state_variable_type="", edit_by="user")
+    jit_kernels: bool =                 declare(default=False, unit="adim", unit_comment="", description="If True, vectorized processes use the numba compiled kernels of root_cynaps.kernels for Michaelis-Menten rates, falling back to NumPy formulations if numba is not installed",
+                                                min_value="", max_value="", value_comment="", references="", DOI="",
+                                                variable_type="parameter", by="model_nitrogen", state_variable_type="", edit_by="user")
+    columnar_properties: bool =         declare(default=False, unit="adim", unit_comment="", description="If True, vertex-scale float properties of the nitrogen and water models are stored as float arrays on a shared vertex index behind their {vid: value} dictionary interface, which reduces memory and speeds up vectorized processes but slows down per-vertex access",
+                                                min_value="", max_value="", value_comment="", references="", DOI="",
+                                                variable_type="parameter", by="model_nitrogen", state_variable_type="", edit_by="user")
+
     # N TRANSPORT PROCESSES
     # kinetic parameters
     vmax_Nm_root: float =               declare(default=1e-6, unit="mol.s-1.m-2", unit_comment="of nitrates", description="",
@@ -500,7 +541,16 @@ class RootNitrogenModel(Model):
         # Before any other operation, we apply the provided scenario by changing default parameters and initialization
         self.apply_scenario(**scenario)
         self.link_self_to_mtg()
+        self.topology = TopologyIndex(self.g)
+        # Temperature modification factors of active and passive processes, per soil temperature value
+        self.temperature_factors = {}
+        self.summed_pools = None
+        # Ensemble of parameter sets computed along with this one, see set_ensemble
+        self.ensemble_parameters = None
+        self.ensemble_size = None
+        self.ensemble = None
         self.initiate_heterogeneous_variables()
+        self.update_active_vertices()
         
     def initiate_heterogeneous_variables(self):
         # We cover all the vertices in the MTG:
@@ -515,62 +565,105 @@ class RootNitrogenModel(Model):
             else:
                 n.C_hexose_root = max(0.0002 * np.exp(-7.857 * n.distance_from_tip), 2e-5)
 
-    def post_growth_updating(self):
+    def post_growth_updating(self, new_vertices=None):
         """
         Description :
             Extend property dictionary upon new element partitioning and updates concentrations upon structural_mass change
+
+        :param new_vertices: ids of the vertices created by growth since last update, in creation order, if reported by the growth component.
+            Otherwise, new vertices are those missing from the state dictionaries.
         """
+        # Vertices created by growth are appended to the MTG vertices, after the existing ones
+        existing = self.vertices
         self.vertices = self.g.vertices(scale=self.g.max_scale())
-        already_updated = []
-        for vid in self.vertices:
-            # We ignore already updated elements, e.g. parents of apices
-            if vid in already_updated:
-                continue
-
-            # If we focus on a new element
-            if vid not in list(self.Nm.keys()):
-                parent = self.g.parent(vid)
-                for prop in self.state_variables:
-                    # if intensive, equals to parent AFTER it has been updated
-                    if self.__dataclass_fields__[prop].metadata["state_variable_type"] == "intensive":
-                        getattr(self, prop).update({parent: getattr(self, prop)[parent] * (
-                                self.initial_struct_mass[parent] / self.struct_mass[parent])})
-                        getattr(self, prop).update({vid: getattr(self, prop)[parent]})
-                    # if extensive, we need structural mass wise partitioning
-                    else:
-                        # we partition the initial flow in the parent accounting for mass fraction
-                        # We use struct_mass, the resulting structural mass after growth
-                        mass_fraction = self.struct_mass[vid] / (self.struct_mass[vid] + self.struct_mass[parent])
-                        getattr(self, prop).update({vid: getattr(self, prop)[parent] * mass_fraction,
-                                                    parent: getattr(self, prop)[parent] * (1-mass_fraction)})
-                already_updated += [vid, parent]
-
-            # If the element already exists and isn't immediate neighbor of an apex
-            else:
-                # If after growth the element actually grown
-                if self.struct_mass[vid] > 0:
-                    for prop in self.state_variables:
-                        # if intensive, concentrations have to be updated based on new structural mass
-                        if self.__dataclass_fields__[prop].metadata["state_variable_type"] == "intensive":
-                            getattr(self, prop).update({vid: getattr(self, prop)[vid] * (
-                                self.initial_struct_mass[vid] / self.struct_mass[vid])})
-                        # if extensive, it doesn't need to be updated and if parent is segmented,
-
-                already_updated += [vid]
+        if new_vertices is None:
+            new_vertices = [vid for vid in self.vertices if vid not in self.Nm]
+        intensive = [prop for prop in self.state_variables if self.__dataclass_fields__[prop].metadata["state_variable_type"] == "intensive"]
+        extensive = [prop for prop in self.state_variables if self.__dataclass_fields__[prop].metadata["state_variable_type"] != "intensive"]
+
+        # If existing elements actually grown, concentrations have to be updated based on new structural mass,
+        # extensive properties don't need to be updated
+        struct_mass = self.vertex_array("struct_mass", existing)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            dilution = np.where(struct_mass > 0, self.vertex_array("initial_struct_mass", existing) / struct_mass, 1.)
+        self.update_from_arrays({prop: self.vertex_array(prop, existing) * dilution for prop in intensive}, existing)
+
+        intensive = [getattr(self, prop) for prop in intensive]
+        extensive = [getattr(self, prop) for prop in extensive]
+        for vid in new_vertices:
+            parent = self.g.parent(vid)
+            # if intensive, equals to parent AFTER it has been updated
+            for prop in intensive:
+                prop[parent] *= self.initial_struct_mass[parent] / self.struct_mass[parent]
+                prop[vid] = prop[parent]
+            # if extensive, we need structural mass wise partitioning
+            # we partition the initial flow in the parent accounting for mass fraction
+            # We use struct_mass, the resulting structural mass after growth
+            mass_fraction = self.struct_mass[vid] / (self.struct_mass[vid] + self.struct_mass[parent])
+            for prop in extensive:
+                prop[vid] = prop[parent] * mass_fraction
+                prop[parent] *= 1 - mass_fraction
+
+        self.update_active_vertices()
+        if self.ensemble_size is not None:
+            self.ensemble_post_growth_updating(existing, new_vertices)
     
+    def post_restore_updating(self):
+        """
+        Description :
+            Updates the structures derived from the MTG after a checkpoint has been restored into it
+        """
+        self.vertices = self.g.vertices(scale=self.g.max_scale())
+        self.topology.update(self.vertices, force=True)
+        self.temperature_factors.clear()
+        self.summed_pools = None
+        self.update_active_vertices()
+
+    def update_active_vertices(self):
+        """
+        Description :
+            Lists the emerged vertices, i.e. with a positive structural mass, to which vertex-scale computations are restricted.
+            Properties of the other vertices are left untouched until they emerge with growth.
+        """
+        emerged = self.vertex_array("struct_mass") > 0
+        # Positions of the active vertices in self.vertices, i.e. the columns of ensemble arrays
+        self.active_columns = np.flatnonzero(emerged)
+        self.active_vertices = [self.vertices[i] for i in self.active_columns.tolist()]
+
     @stepinit
     def initialize_cumulative(self):
         # Reinitialize for the sum of the next loop
         self.Nm_root_shoot_xylem[1] = 0
         self.AA_root_shoot_xylem[1] = 0
-        for vid in self.vertices:
-            # Cumulative flows are reinitialized
-            self.cumulated_radial_exchanges_Nm[vid] = 0
-            self.cumulated_radial_exchanges_AA[vid] = 0
-            self.displaced_Nm_out[vid] = 0
-            self.displaced_AA_out[vid] = 0
-            self.displaced_Nm_in[vid] = 0
-            self.displaced_AA_in[vid] = 0
+        # Soil temperature may have changed since last time step
+        self.temperature_factors.clear()
+        # Plant scale sums will be computed again from updated states
+        self.summed_pools = None
+        # Cumulative flows are reinitialized, also in non emerged vertices which may be filled by water columns
+        zeros = np.zeros(len(self.vertices))
+        for prop in (self.cumulated_radial_exchanges_Nm, self.cumulated_radial_exchanges_AA, self.displaced_Nm_out, self.displaced_AA_out,
+                     self.displaced_Nm_in, self.displaced_AA_in):
+            put(prop, self.vertices, zeros)
+
+    def process_temperature_modification(self, soil_temperature, processes="active"):
+        """
+        Temperature modification factor of active or passive processes.
+        Factors are cached per temperature value over the time step, so that the processes of all vertices sharing a soil temperature
+        use a single computation. When soil_temperature is a vertex-indexed array, the factor is looked up once per distinct temperature value.
+        """
+        factors = self.temperature_factors.setdefault(processes, {})
+        if isinstance(soil_temperature, np.ndarray):
+            temperatures, inverse = np.unique(soil_temperature, return_inverse=True)
+            values = np.array([self.cached_temperature_factor(factors, float(T), processes) for T in temperatures])
+            return values[inverse.reshape(-1)]
+        else:
+            return self.cached_temperature_factor(factors, soil_temperature, processes)
+
+    def cached_temperature_factor(self, factors, soil_temperature, processes):
+        if soil_temperature not in factors:
+            T_ref, A, B, C = (getattr(self, f"{processes}_processes_{p}") for p in ("T_ref", "A", "B", "C"))
+            factors[soil_temperature] = self.temperature_modification(soil_temperature=soil_temperature, T_ref=T_ref, A=A, B=B, C=C)
+        return factors[soil_temperature]
 
     # NITROGEN PROCESSES
 
@@ -610,11 +703,7 @@ class RootNitrogenModel(Model):
                      * np.exp(-Nm / self.span_N_regulation))
         ) + self.Km_Nm_root_HATS
         # (Michaelis-Menten kinetic, surface dependency, active transport C requirements)
-        vmax_Nm_root = self.vmax_Nm_root * self.temperature_modification(soil_temperature=soil_temperature,
-                                                                     T_ref=self.active_processes_T_ref,
-                                                                     A=self.active_processes_A,
-                                                                     B=self.active_processes_B,
-                                                                     C=self.active_processes_C)
+        vmax_Nm_root = self.vmax_Nm_root * self.process_temperature_modification(soil_temperature=soil_temperature, processes="active")
 
         return ((soil_Nm * vmax_Nm_root / (soil_Nm + Km_Nm_root)) * root_exchange_surface * (
             C_hexose_root / (C_hexose_root + self.transport_C_regulation)))
@@ -634,33 +723,21 @@ class RootNitrogenModel(Model):
             # Passive radial diffusion between soil and cortex.
             # It happens only through root segment external surface.
             # We summarize apoplasm-soil and cortex-soil diffusion in 1 flow.
-            diffusion_soil = self.diffusion_soil * self.temperature_modification(soil_temperature=soil_temperature,
-                                                                     T_ref=self.passive_processes_T_ref,
-                                                                     A=self.passive_processes_A,
-                                                                     B=self.passive_processes_B,
-                                                                     C=self.passive_processes_C)
+            diffusion_soil = self.diffusion_soil * self.process_temperature_modification(soil_temperature=soil_temperature, processes="passive")
             return (diffusion_soil * ((Nm * struct_mass / symplasmic_volume) - soil_Nm) * root_exchange_surface)
 
     @rate
     def _export_Nm(self, Nm, root_exchange_surface, cortex_exchange_surface, soil_temperature, C_hexose_root=1e-4):
         # We define active export to xylem from root segment
         # (Michaelis-Menten kinetic, surface dependency, active transport C requirements)
-        vmax_Nm_xylem = self.vmax_Nm_xylem * self.temperature_modification(soil_temperature=soil_temperature,
-                                                                     T_ref=self.active_processes_T_ref,
-                                                                     A=self.active_processes_A,
-                                                                     B=self.active_processes_B,
-                                                                     C=self.active_processes_C)
+        vmax_Nm_xylem = self.vmax_Nm_xylem * self.process_temperature_modification(soil_temperature=soil_temperature, processes="active")
         return ((Nm * vmax_Nm_xylem) / (Nm + self.Km_Nm_xylem)) * (root_exchange_surface - cortex_exchange_surface) * (
                 C_hexose_root / (C_hexose_root + self.transport_C_regulation))
 
     @rate
     def _diffusion_Nm_xylem(self, xylem_Nm, Nm, root_exchange_surface, cortex_exchange_surface, soil_temperature):
         # Passive radial diffusion between xylem and cortex through plasmalema
-        diffusion_xylem = self.diffusion_xylem * self.temperature_modification(soil_temperature=soil_temperature,
-                                                                     T_ref=self.passive_processes_T_ref,
-                                                                     A=self.passive_processes_A,
-                                                                     B=self.passive_processes_B,
-                                                                     C=self.passive_processes_C)
+        diffusion_xylem = self.diffusion_xylem * self.process_temperature_modification(soil_temperature=soil_temperature, processes="passive")
         return diffusion_xylem * (xylem_Nm - Nm) * (root_exchange_surface - cortex_exchange_surface)
 
     @rate
@@ -670,11 +747,7 @@ class RootNitrogenModel(Model):
         else:
             # Direct diffusion between soil and xylem when 1) xylem is apoplastic and 2) endoderm is not differentiated
             # Here, surface is not really representative of a structure as everything is apoplasmic
-            diffusion_apoplasm = self.diffusion_apoplasm * self.temperature_modification(soil_temperature=soil_temperature,
-                                                                     T_ref=self.passive_processes_T_ref,
-                                                                     A=self.passive_processes_A,
-                                                                     B=self.passive_processes_B,
-                                                                     C=self.passive_processes_C)
+            diffusion_apoplasm = self.diffusion_apoplasm * self.process_temperature_modification(soil_temperature=soil_temperature, processes="passive")
             return diffusion_apoplasm * (
                     (xylem_Nm * struct_mass / xylem_volume) - soil_Nm) * 2 * np.pi * radius * length * xylem_differentiation_factor * endodermis_conductance_factor
 
@@ -682,11 +755,7 @@ class RootNitrogenModel(Model):
     @rate
     def _import_AA(self, soil_AA, root_exchange_surface, soil_temperature, C_hexose_root=1e-4):
         # (Michaelis-Menten kinetic, surface dependency, active transport C requirements)
-        vmax_AA_root = self.vmax_AA_root * self.temperature_modification(soil_temperature=soil_temperature,
-                                                                     T_ref=self.active_processes_T_ref,
-                                                                     A=self.active_processes_A,
-                                                                     B=self.active_processes_B,
-                                                                     C=self.active_processes_C)
+        vmax_AA_root = self.vmax_AA_root * self.process_temperature_modification(soil_temperature=soil_temperature, processes="active")
         return ((soil_AA * vmax_AA_root / (soil_AA + self.Km_AA_root)) * root_exchange_surface * (
             C_hexose_root / (C_hexose_root + self.transport_C_regulation)))
 
@@ -696,11 +765,7 @@ class RootNitrogenModel(Model):
             return 0.
         else:
             # We define amino acid passive diffusion to soil
-            diffusion_soil = self.diffusion_soil * self.temperature_modification(soil_temperature=soil_temperature,
-                                                                     T_ref=self.passive_processes_T_ref,
-                                                                     A=self.passive_processes_A,
-                                                                     B=self.passive_processes_B,
-                                                                     C=self.passive_processes_C)
+            diffusion_soil = self.diffusion_soil * self.process_temperature_modification(soil_temperature=soil_temperature, processes="passive")
             return (diffusion_soil * ((AA * struct_mass / symplasmic_volume) - soil_AA) * root_exchange_surface )
 
     @rate
@@ -708,11 +773,7 @@ class RootNitrogenModel(Model):
         # We define active export to xylem from root segment
         # Km is defined as a constant here
         # (Michaelis-Menten kinetic, surface dependency, active transport C requirements)
-        vmax_AA_xylem = self.vmax_AA_xylem * self.temperature_modification(soil_temperature=soil_temperature,
-                                                                     T_ref=self.active_processes_T_ref,
-                                                                     A=self.active_processes_A,
-                                                                     B=self.active_processes_B,
-                                                                     C=self.active_processes_C)
+        vmax_AA_xylem = self.vmax_AA_xylem * self.process_temperature_modification(soil_temperature=soil_temperature, processes="active")
         return ((AA * vmax_AA_xylem / (AA + self.Km_AA_xylem))
                 * (root_exchange_surface - cortex_exchange_surface) * (C_hexose_root / (
                         C_hexose_root + self.transport_C_regulation)))
@@ -723,11 +784,7 @@ class RootNitrogenModel(Model):
             return 0.
         else:
             # Direct diffusion between soil and xylem when 1) xylem is apoplastic and 2) endoderm is not differentiated
-            diffusion_apoplasm = self.diffusion_apoplasm * self.temperature_modification(soil_temperature=soil_temperature,
-                                                                     T_ref=self.passive_processes_T_ref,
-                                                                     A=self.passive_processes_A,
-                                                                     B=self.passive_processes_B,
-                                                                     C=self.passive_processes_C)
+            diffusion_apoplasm = self.diffusion_apoplasm * self.process_temperature_modification(soil_temperature=soil_temperature, processes="passive")
             return (diffusion_apoplasm * ((xylem_AA * struct_mass / xylem_volume) - soil_AA)
                     * 2 * np.pi * radius * length * xylem_differentiation_factor * endodermis_conductance_factor)
 
@@ -736,11 +793,7 @@ class RootNitrogenModel(Model):
         # Passive radial diffusion between phloem and cortex through plasmodesmata
         # TODO : Change diffusive flow to enable realistic ranges, now, unloading is limited by a ping pong bug related to diffusion
         # TODO : resolve exception when mapping has to deal with plant scale properties AND local ones
-        diffusion_phloem = self.diffusion_phloem * self.temperature_modification(soil_temperature=soil_temperature,
-                                                                     T_ref=self.passive_processes_T_ref,
-                                                                     A=self.passive_processes_A,
-                                                                     B=self.passive_processes_B,
-                                                                     C=self.passive_processes_C)
+        diffusion_phloem = self.diffusion_phloem * self.process_temperature_modification(soil_temperature=soil_temperature, processes="passive")
         return (diffusion_phloem * (self.total_phloem_AA[1] - AA)
                 * phloem_exchange_surface)
 
@@ -751,246 +804,435 @@ class RootNitrogenModel(Model):
         """
             Description
             ___________
+            Displacement of xylem Nm and AA by axial water flows, and loading of radial exchanges in the displaced water columns.
+            Computed with the algorithm selected by axial_transport_solver.
+            With the semi_implicit pool_update_solver, the rates emptying pools are limited beforehand, so that the amounts loaded in xylem are those debited from the pools.
+        """
+        if self.pool_update_solver == "semi_implicit":
+            active = self.active_vertices
+            self.update_from_arrays(self.semi_implicit_rates({}, active), active)
+        if self.axial_transport_solver == "iterative":
+            self.iterative_axial_transport_N()
+        else:
+            self.tree_flow_axial_transport_N()
+
+    def iterative_axial_transport_N(self):
+        """
+        Chases the water column exported by each segment from neighbour to neighbour.
         """
         # TODO : probably collar children have to be reintroduced for good neighbor management. (from model_water)
         #  But if null water content proprely passes information between collar and it's children,
         #  it may be already working well
 
         # AXIAL TRANSPORT
-        for v in self.vertices:
-            if self.struct_mass[v] > 0 :
-                # If this is only an out flow to up parents
-                if self.axial_export_water_up[v] > 0:
-                    # Turnover defines a dilution factor of radial transport processes over the axially transported
-                    # water column
-                    turnover = self.axial_export_water_up[v] / self.xylem_water[v]
-                    if turnover <= 1:
-                        # Transport only affects considered segment
-                        self.cumulated_radial_exchanges_Nm[v] += (self.export_Nm[v] - self.diffusion_Nm_soil_xylem[v] - self.diffusion_Nm_xylem[v]) * self.time_step
-                        self.cumulated_radial_exchanges_AA[v] += (self.export_AA[v] - self.diffusion_AA_soil_xylem[v]) * self.time_step
-                        # Exported matter corresponds to the exported water proportion
-                        self.displaced_Nm_out[v] = turnover * self.xylem_Nm[v] * self.xylem_struct_mass[v]
-                        self.displaced_AA_out[v] = turnover * self.xylem_AA[v] * self.xylem_struct_mass[v]
-                        up_parent = self.g.parent(v)
-                        # If this is collar, this flow is exported
+        for v in self.active_vertices:
+            # If this is only an out flow to up parents
+            if self.axial_export_water_up[v] > 0:
+                # Turnover defines a dilution factor of radial transport processes over the axially transported
+                # water column
+                turnover = self.axial_export_water_up[v] / self.xylem_water[v]
+                if turnover <= 1:
+                    # Transport only affects considered segment
+                    self.cumulated_radial_exchanges_Nm[v] += (self.export_Nm[v] - self.diffusion_Nm_soil_xylem[v] - self.diffusion_Nm_xylem[v]) * self.time_step
+                    self.cumulated_radial_exchanges_AA[v] += (self.export_AA[v] - self.diffusion_AA_soil_xylem[v]) * self.time_step
+                    # Exported matter corresponds to the exported water proportion
+                    self.displaced_Nm_out[v] = turnover * self.xylem_Nm[v] * self.xylem_struct_mass[v]
+                    self.displaced_AA_out[v] = turnover * self.xylem_AA[v] * self.xylem_struct_mass[v]
+                    up_parent = self.g.parent(v)
+                    # If this is collar, this flow is exported
+                    if up_parent == None:
+                        self.Nm_root_shoot_xylem[1] += self.displaced_Nm_out[v]
+                        self.AA_root_shoot_xylem[1] += self.displaced_AA_out[v]
+                    else:
+                        # The immediate parent receives this flow
+                        self.displaced_Nm_in[up_parent] += self.displaced_Nm_out[v]
+                        self.displaced_AA_in[up_parent] += self.displaced_AA_out[v]
+                else:
+                    #print("Uturnover >1")
+                    # Exported matter corresponds to the whole segment's water content
+                    self.displaced_Nm_out[v] = self.xylem_Nm[v] * self.xylem_struct_mass[v]
+                    self.displaced_AA_out[v] = self.xylem_AA[v] * self.xylem_struct_mass[v]
+                    # Transport affects a chain of parents
+                    water_exchange_time = self.time_step / turnover
+                    # Loading of the current vertex into the current vertex's xylem
+                    self.cumulated_radial_exchanges_Nm[v] += (self.export_Nm[v] - self.diffusion_Nm_soil_xylem[v] - self.diffusion_Nm_xylem[v]) * water_exchange_time
+                    self.cumulated_radial_exchanges_AA[v] += (self.export_AA[v] - self.diffusion_AA_soil_xylem[v]) * water_exchange_time
+
+                    exported_water = self.axial_export_water_up[v]
+                    child = v
+                    # Loading of the current vertex into the vertices who have received water from it
+                    while exported_water > 0:
+                        # We remove the amount of water which has already received loading in previous loop
+                        exported_water -= self.xylem_water[child]
+                        up_parent = self.g.parent(child)
+                        # If we reached collar, this amount is being exported
                         if up_parent == None:
-                            self.Nm_root_shoot_xylem[1] += self.displaced_Nm_out[v]
-                            self.AA_root_shoot_xylem[1] += self.displaced_AA_out[v]
+                            self.Nm_root_shoot_xylem[1] += (self.export_Nm[v] - self.diffusion_Nm_soil_xylem[v] - self.diffusion_Nm_xylem[v]) * water_exchange_time * exported_water / self.xylem_water[v]
+                            self.AA_root_shoot_xylem[1] += (self.export_AA[v] - self.diffusion_AA_soil_xylem[v]) * water_exchange_time * exported_water / self.xylem_water[v]
+                            # If all water content of initial segment is exported through collar
+                            if exported_water > self.xylem_water[v]:
+                                self.Nm_root_shoot_xylem[1] += self.displaced_Nm_out[v]
+                                self.AA_root_shoot_xylem[1] += self.displaced_AA_out[v]
+                            else:
+                                parent_proportion = exported_water / self.xylem_water[v]
+                                self.Nm_root_shoot_xylem[1] += self.displaced_Nm_out[v] * parent_proportion
+                                self.AA_root_shoot_xylem[1] += self.displaced_AA_out[v] * parent_proportion
+                                self.displaced_Nm_in[child] += self.displaced_Nm_out[v] * (1 - parent_proportion)
+                                self.displaced_AA_in[child] += self.displaced_AA_out[v] * (1 - parent_proportion)
+                            # Break the loop
+                            exported_water = 0
                         else:
-                            # The immediate parent receives this flow
-                            self.displaced_Nm_in[up_parent] += self.displaced_Nm_out[v]
-                            self.displaced_AA_in[up_parent] += self.displaced_AA_out[v]
-                    else:
-                        #print("Uturnover >1")
-                        # Exported matter corresponds to the whole segment's water content
-                        self.displaced_Nm_out[v] = self.xylem_Nm[v] * self.xylem_struct_mass[v]
-                        self.displaced_AA_out[v] = self.xylem_AA[v] * self.xylem_struct_mass[v]
-                        # Transport affects a chain of parents
-                        water_exchange_time = self.time_step / turnover
-                        # Loading of the current vertex into the current vertex's xylem
-                        self.cumulated_radial_exchanges_Nm[v] += (self.export_Nm[v] - self.diffusion_Nm_soil_xylem[v] - self.diffusion_Nm_xylem[v]) * water_exchange_time
-                        self.cumulated_radial_exchanges_AA[v] += (self.export_AA[v] - self.diffusion_AA_soil_xylem[v]) * water_exchange_time
-
-                        exported_water = self.axial_export_water_up[v]
-                        child = v
-                        # Loading of the current vertex into the vertices who have received water from it
-                        while exported_water > 0:
-                            # We remove the amount of water which has already received loading in previous loop
-                            exported_water -= self.xylem_water[child]
-                            up_parent = self.g.parent(child)
-                            # If we reached collar, this amount is being exported
-                            if up_parent == None:
-                                self.Nm_root_shoot_xylem[1] += (self.export_Nm[v] - self.diffusion_Nm_soil_xylem[v] - self.diffusion_Nm_xylem[v]) * water_exchange_time * exported_water / self.xylem_water[v]
-                                self.AA_root_shoot_xylem[1] += (self.export_AA[v] - self.diffusion_AA_soil_xylem[v]) * water_exchange_time * exported_water / self.xylem_water[v]
-                                # If all water content of initial segment is exported through collar
+                            # If the considered parent have been completly filled with water from the child
+                            if exported_water - self.xylem_water[up_parent] > 0:
+                                # The exposition time is longer if the water content of the target neighbour is more important.
+                                self.cumulated_radial_exchanges_Nm[up_parent] += (self.export_Nm[v] - self.diffusion_Nm_soil_xylem[v] - self.diffusion_Nm_xylem[v]) * water_exchange_time * self.xylem_water[up_parent] / self.xylem_water[v]
+                                self.cumulated_radial_exchanges_AA[up_parent] += (self.export_AA[v] - self.diffusion_AA_soil_xylem[v]) * water_exchange_time * self.xylem_water[up_parent] / self.xylem_water[v]
+                            # If it's only partial, we account only for the exceeding amount
+                            else:
+                                self.cumulated_radial_exchanges_Nm[up_parent] += (self.export_Nm[v] - self.diffusion_Nm_soil_xylem[v] - self.diffusion_Nm_xylem[v]) * water_exchange_time * exported_water / self.xylem_water[v]
+                                self.cumulated_radial_exchanges_AA[up_parent] += (self.export_AA[v] - self.diffusion_AA_soil_xylem[v]) * water_exchange_time * exported_water / self.xylem_water[v]
+                                # If all water content of initial segment is exported to the considered grandparent
                                 if exported_water > self.xylem_water[v]:
-                                    self.Nm_root_shoot_xylem[1] += self.displaced_Nm_out[v]
-                                    self.AA_root_shoot_xylem[1] += self.displaced_AA_out[v]
+                                    self.displaced_Nm_in[up_parent] += self.displaced_Nm_out[v]
+                                    self.displaced_AA_in[up_parent] += self.displaced_AA_out[v]
                                 else:
+                                    # Displaced matter is shared between child and its parent
                                     parent_proportion = exported_water / self.xylem_water[v]
-                                    self.Nm_root_shoot_xylem[1] += self.displaced_Nm_out[v] * parent_proportion
-                                    self.AA_root_shoot_xylem[1] += self.displaced_AA_out[v] * parent_proportion
+                                    self.displaced_Nm_in[up_parent] += self.displaced_Nm_out[v] * parent_proportion
+                                    self.displaced_AA_in[up_parent] += self.displaced_AA_out[v] * parent_proportion
                                     self.displaced_Nm_in[child] += self.displaced_Nm_out[v] * (1 - parent_proportion)
                                     self.displaced_AA_in[child] += self.displaced_AA_out[v] * (1 - parent_proportion)
                                 # Break the loop
                                 exported_water = 0
-                            else:
-                                # If the considered parent have been completly filled with water from the child
-                                if exported_water - self.xylem_water[up_parent] > 0:
-                                    # The exposition time is longer if the water content of the target neighbour is more important.
-                                    self.cumulated_radial_exchanges_Nm[up_parent] += (self.export_Nm[v] - self.diffusion_Nm_soil_xylem[v] - self.diffusion_Nm_xylem[v]) * water_exchange_time * self.xylem_water[up_parent] / self.xylem_water[v]
-                                    self.cumulated_radial_exchanges_AA[up_parent] += (self.export_AA[v] - self.diffusion_AA_soil_xylem[v]) * water_exchange_time * self.xylem_water[up_parent] / self.xylem_water[v]
-                                # If it's only partial, we account only for the exceeding amount
-                                else:
-                                    self.cumulated_radial_exchanges_Nm[up_parent] += (self.export_Nm[v] - self.diffusion_Nm_soil_xylem[v] - self.diffusion_Nm_xylem[v]) * water_exchange_time * exported_water / self.xylem_water[v]
-                                    self.cumulated_radial_exchanges_AA[up_parent] += (self.export_AA[v] - self.diffusion_AA_soil_xylem[v]) * water_exchange_time * exported_water / self.xylem_water[v]
-                                    # If all water content of initial segment is exported to the considered grandparent
-                                    if exported_water > self.xylem_water[v]:
-                                        self.displaced_Nm_in[up_parent] += self.displaced_Nm_out[v]
-                                        self.displaced_AA_in[up_parent] += self.displaced_AA_out[v]
+                            child = up_parent
+
+            # If this is only a out flow to down children
+            if self.axial_import_water_down[v] < 0:
+                # Turnover defines a dilution factor of radial transport processes over the axially transported
+                # water column
+                turnover = - self.axial_import_water_down[v] / self.xylem_water[v]
+                if turnover <= 1:
+                    # Transport only affects considered segment
+                    self.cumulated_radial_exchanges_Nm[v] += (self.export_Nm[v] - self.diffusion_Nm_soil_xylem[v] - self.diffusion_Nm_xylem[v]) * self.time_step
+                    self.cumulated_radial_exchanges_AA[v] += (self.export_AA[v] - self.diffusion_AA_soil_xylem[v]) * self.time_step
+                    # Exported matter corresponds to the exported water proportion
+                    self.displaced_Nm_out[v] = turnover * self.xylem_Nm[v] * self.xylem_struct_mass[v]
+                    self.displaced_AA_out[v] = turnover * self.xylem_AA[v] * self.xylem_struct_mass[v]
+                    down_children = [k for k in self.g.children(v) if self.struct_mass[k] > 0]
+                    # The immediate children receive this flow
+                    radius_sum = sum([self.radius[k] for k in down_children])
+                    children_radius_prop = [self.radius[k] / radius_sum for k in down_children]
+                    for ch in range(len(down_children)):
+                        self.displaced_Nm_in[down_children[ch]] += self.displaced_Nm_out[v] * children_radius_prop[ch]
+                        self.displaced_AA_in[down_children[ch]] += self.displaced_AA_out[v] * children_radius_prop[ch]
+
+                else:
+                    # Transport affects several segments, and we verified it often happens under high transpiration
+                    # Exported matter corresponds to the whole segment's water content
+                    self.displaced_Nm_out[v] = self.xylem_Nm[v] * self.xylem_struct_mass[v]
+                    self.displaced_AA_out[v] = self.xylem_AA[v] * self.xylem_struct_mass[v]
+                    # Transport affects a chain of children
+                    water_exchange_time = self.time_step / turnover
+                    # Loading of the current vertex into the current vertex's xylem
+                    self.cumulated_radial_exchanges_Nm[v] += (self.export_Nm[v] - self.diffusion_Nm_soil_xylem[v] - self.diffusion_Nm_xylem[v]) * water_exchange_time
+                    self.cumulated_radial_exchanges_AA[v] += (self.export_AA[v] - self.diffusion_AA_soil_xylem[v]) * water_exchange_time
+
+                    parent = [v]
+                    # We initialize a list tracking water repartition among down axes
+                    axis_proportion = [1.0]
+                    # We remove the amount of water which has already been received
+                    exported_water = [-self.axial_import_water_down[v] - self.xylem_water[v]]
+                    # Loading of the current vertex into the vertices who have received water from it
+                    while True in [k > 0 for k in exported_water]:
+                        children_list = []
+                        children_exported_water = []
+                        for p in range(len(parent)):
+                            if exported_water[p] > 0:
+                                down_children = [k for k in self.g.children(parent[p]) if self.struct_mass[k] > 0]
+                                # if the parent is an apex and water has been exported from it,
+                                # it means that the apex concentrates the associated carried and loaded nitrogen matter
+                                if len(down_children) == 0:
+                                    # this water amount has also been subject to loading
+                                    self.cumulated_radial_exchanges_Nm[parent[p]] += (self.export_Nm[v] - self.diffusion_Nm_soil_xylem[v] - self.diffusion_Nm_xylem[v]) * water_exchange_time * exported_water[p] / self.xylem_water[v]
+                                    self.cumulated_radial_exchanges_AA[parent[p]] += (self.export_AA[v] - self.diffusion_AA_soil_xylem[v]) * water_exchange_time * exported_water[p] / self.xylem_water[v]
+                                    # if the translated nitrogen matter has completely ended up in the apex
+                                    if exported_water[p] + self.xylem_water[parent[p]] > self.xylem_water[v] * axis_proportion[p]:
+                                        self.displaced_Nm_in[parent[p]] += self.displaced_Nm_out[v] * axis_proportion[p]
+                                        self.displaced_AA_in[parent[p]] += self.displaced_AA_out[v] * axis_proportion[p]
+                                    # else it is shared with grandparent
                                     else:
-                                        # Displaced matter is shared between child and its parent
-                                        parent_proportion = exported_water / self.xylem_water[v]
-                                        self.displaced_Nm_in[up_parent] += self.displaced_Nm_out[v] * parent_proportion
-                                        self.displaced_AA_in[up_parent] += self.displaced_AA_out[v] * parent_proportion
-                                        self.displaced_Nm_in[child] += self.displaced_Nm_out[v] * (1 - parent_proportion)
-                                        self.displaced_AA_in[child] += self.displaced_AA_out[v] * (1 - parent_proportion)
-                                    # Break the loop
-                                    exported_water = 0
-                                child = up_parent
-
-                # If this is only a out flow to down children
-                if self.axial_import_water_down[v] < 0:
-                    # Turnover defines a dilution factor of radial transport processes over the axially transported
-                    # water column
-                    turnover = - self.axial_import_water_down[v] / self.xylem_water[v]
-                    if turnover <= 1:
-                        # Transport only affects considered segment
-                        self.cumulated_radial_exchanges_Nm[v] += (self.export_Nm[v] - self.diffusion_Nm_soil_xylem[v] - self.diffusion_Nm_xylem[v]) * self.time_step
-                        self.cumulated_radial_exchanges_AA[v] += (self.export_AA[v] - self.diffusion_AA_soil_xylem[v]) * self.time_step
-                        # Exported matter corresponds to the exported water proportion
-                        self.displaced_Nm_out[v] = turnover * self.xylem_Nm[v] * self.xylem_struct_mass[v]
-                        self.displaced_AA_out[v] = turnover * self.xylem_AA[v] * self.xylem_struct_mass[v]
-                        down_children = [k for k in self.g.children(v) if self.struct_mass[k] > 0]
-                        # The immediate children receive this flow
-                        radius_sum = sum([self.radius[k] for k in down_children])
-                        children_radius_prop = [self.radius[k] / radius_sum for k in down_children]
-                        for ch in range(len(down_children)):
-                            self.displaced_Nm_in[down_children[ch]] += self.displaced_Nm_out[v] * children_radius_prop[ch]
-                            self.displaced_AA_in[down_children[ch]] += self.displaced_AA_out[v] * children_radius_prop[ch]
-
-                    else:
-                        # Transport affects several segments, and we verified it often happens under high transpiration
-                        # Exported matter corresponds to the whole segment's water content
-                        self.displaced_Nm_out[v] = self.xylem_Nm[v] * self.xylem_struct_mass[v]
-                        self.displaced_AA_out[v] = self.xylem_AA[v] * self.xylem_struct_mass[v]
-                        # Transport affects a chain of children
-                        water_exchange_time = self.time_step / turnover
-                        # Loading of the current vertex into the current vertex's xylem
-                        self.cumulated_radial_exchanges_Nm[v] += (self.export_Nm[v] - self.diffusion_Nm_soil_xylem[v] - self.diffusion_Nm_xylem[v]) * water_exchange_time
-                        self.cumulated_radial_exchanges_AA[v] += (self.export_AA[v] - self.diffusion_AA_soil_xylem[v]) * water_exchange_time
-
-                        parent = [v]
-                        # We initialize a list tracking water repartition among down axes
-                        axis_proportion = [1.0]
-                        # We remove the amount of water which has already been received
-                        exported_water = [-self.axial_import_water_down[v] - self.xylem_water[v]]
-                        # Loading of the current vertex into the vertices who have received water from it
-                        while True in [k > 0 for k in exported_water]:
-                            children_list = []
-                            children_exported_water = []
-                            for p in range(len(parent)):
-                                if exported_water[p] > 0:
-                                    down_children = [k for k in self.g.children(parent[p]) if self.struct_mass[k] > 0]
-                                    # if the parent is an apex and water has been exported from it,
-                                    # it means that the apex concentrates the associated carried and loaded nitrogen matter
-                                    if len(down_children) == 0:
-                                        # this water amount has also been subject to loading
-                                        self.cumulated_radial_exchanges_Nm[parent[p]] += (self.export_Nm[v] - self.diffusion_Nm_soil_xylem[v] - self.diffusion_Nm_xylem[v]) * water_exchange_time * exported_water[p] / self.xylem_water[v]
-                                        self.cumulated_radial_exchanges_AA[parent[p]] += (self.export_AA[v] - self.diffusion_AA_soil_xylem[v]) * water_exchange_time * exported_water[p] / self.xylem_water[v]
-                                        # if the translated nitrogen matter has completely ended up in the apex
-                                        if exported_water[p] + self.xylem_water[parent[p]] > self.xylem_water[v] * axis_proportion[p]:
-                                            self.displaced_Nm_in[parent[p]] += self.displaced_Nm_out[v] * axis_proportion[p]
-                                            self.displaced_AA_in[parent[p]] += self.displaced_AA_out[v] * axis_proportion[p]
-                                        # else it is shared with grandparent
+                                        grandparent = self.g.parent(parent[p])
+                                        parent_proportion = (exported_water[p] + self.xylem_water[parent[p]]) / (self.xylem_water[v] * axis_proportion[p])
+                                        self.displaced_Nm_in[parent[p]] += self.displaced_Nm_out[v] * axis_proportion[p] * parent_proportion
+                                        self.displaced_AA_in[parent[p]] += self.displaced_AA_out[v] * axis_proportion[p] * parent_proportion
+                                        self.displaced_Nm_in[grandparent] += self.displaced_Nm_out[v] * axis_proportion[p] * (1 - parent_proportion)
+                                        self.displaced_AA_in[grandparent] += self.displaced_AA_out[v] * axis_proportion[p] * (1 - parent_proportion)
+
+                                # If there is only 1 child (root line)
+                                elif len(down_children) == 1:
+                                    # If the considered child have been completely filled with water from the parent
+                                    if exported_water[p] - self.xylem_water[down_children[0]] > 0:
+                                        # The exposition time is longer if the water content of the target neighbour is more important.
+                                        self.cumulated_radial_exchanges_Nm[down_children[0]] += (self.export_Nm[v] - self.diffusion_Nm_soil_xylem[v] - self.diffusion_Nm_xylem[v]) * water_exchange_time * self.xylem_water[down_children[0]] / self.xylem_water[v]
+                                        self.cumulated_radial_exchanges_AA[down_children[0]] += (self.export_AA[v] - self.diffusion_AA_soil_xylem[v]) * water_exchange_time * self.xylem_water[down_children[0]] / self.xylem_water[v]
+                                        children_exported_water += [exported_water[p] - self.xylem_water[down_children[0]]]
+                                    else:
+                                        self.cumulated_radial_exchanges_Nm[down_children[0]] += (self.export_Nm[v] - self.diffusion_Nm_soil_xylem[v] - self.diffusion_Nm_xylem[v]) * water_exchange_time * exported_water[p] / self.xylem_water[v]
+                                        self.cumulated_radial_exchanges_AA[down_children[0]] += (self.export_AA[v] - self.diffusion_AA_soil_xylem[v]) * water_exchange_time * exported_water[p] / self.xylem_water[v]
+                                        # If all water content from initial segment gone through this axis is exported to the considered child
+                                        if exported_water[p] > self.xylem_water[v] * axis_proportion[p]:
+                                            self.displaced_Nm_in[down_children[0]] += self.displaced_Nm_out[v] * axis_proportion[p]
+                                            self.displaced_AA_in[down_children[0]] += self.displaced_AA_out[v] * axis_proportion[p]
                                         else:
-                                            grandparent = self.g.parent(parent[p])
-                                            parent_proportion = (exported_water[p] + self.xylem_water[parent[p]]) / (self.xylem_water[v] * axis_proportion[p])
-                                            self.displaced_Nm_in[parent[p]] += self.displaced_Nm_out[v] * axis_proportion[p] * parent_proportion
-                                            self.displaced_AA_in[parent[p]] += self.displaced_AA_out[v] * axis_proportion[p] * parent_proportion
-                                            self.displaced_Nm_in[grandparent] += self.displaced_Nm_out[v] * axis_proportion[p] * (1 - parent_proportion)
-                                            self.displaced_AA_in[grandparent] += self.displaced_AA_out[v] * axis_proportion[p] * (1 - parent_proportion)
-
-                                    # If there is only 1 child (root line)
-                                    elif len(down_children) == 1:
+                                            # Displaced matter is shared between child and its parent
+                                            child_proportion = exported_water[p] / (self.xylem_water[v] * axis_proportion[p])
+                                            self.displaced_Nm_in[down_children[0]] += self.displaced_Nm_out[v] * axis_proportion[p] * child_proportion
+                                            self.displaced_AA_in[down_children[0]] += self.displaced_AA_out[v] * axis_proportion[p] * child_proportion
+                                            self.displaced_Nm_in[parent[p]] += self.displaced_Nm_out[v] * axis_proportion[p] * (1 - child_proportion)
+                                            self.displaced_AA_in[parent[p]] += self.displaced_AA_out[v] * axis_proportion[p] * (1 - child_proportion)
+                                        # Break the loop
+                                        children_exported_water += [0]
+
+                                # Else if there are several children
+                                else:
+                                    # Water repartition is done according to radius,
+                                    # as this is the main criteria used in the water model
+                                    radius_sum = sum([self.radius[k] for k in down_children])
+                                    children_down_flow = [exported_water[p] * self.radius[k] / radius_sum for k in down_children]
+                                    children_radius_prop = [self.radius[k] / radius_sum for k in down_children]
+                                    # Actualize the repartition of water when there is a new branching
+                                    for k in range(1, len(children_radius_prop)):
+                                        axis_proportion.insert(p + 1, axis_proportion[p] * children_radius_prop[-k])
+
+                                    axis_proportion[p] = axis_proportion[p] * children_radius_prop[0]
+                                    for ch in range(len(down_children)):
                                         # If the considered child have been completely filled with water from the parent
-                                        if exported_water[p] - self.xylem_water[down_children[0]] > 0:
+                                        if children_down_flow[ch] - self.xylem_water[down_children[ch]] > 0 :
                                             # The exposition time is longer if the water content of the target neighbour is more important.
-                                            self.cumulated_radial_exchanges_Nm[down_children[0]] += (self.export_Nm[v] - self.diffusion_Nm_soil_xylem[v] - self.diffusion_Nm_xylem[v]) * water_exchange_time * self.xylem_water[down_children[0]] / self.xylem_water[v]
-                                            self.cumulated_radial_exchanges_AA[down_children[0]] += (self.export_AA[v] - self.diffusion_AA_soil_xylem[v]) * water_exchange_time * self.xylem_water[down_children[0]] / self.xylem_water[v]
-                                            children_exported_water += [exported_water[p] - self.xylem_water[down_children[0]]]
+                                            self.cumulated_radial_exchanges_Nm[down_children[ch]] += (self.export_Nm[v] - self.diffusion_Nm_soil_xylem[v] - self.diffusion_Nm_xylem[v]) * water_exchange_time * self.xylem_water[down_children[ch]] / self.xylem_water[v]
+                                            self.cumulated_radial_exchanges_AA[down_children[ch]] += (self.export_AA[v] - self.diffusion_AA_soil_xylem[v]) * water_exchange_time * self.xylem_water[down_children[ch]] / self.xylem_water[v]
+                                            children_down_flow[ch] -= self.xylem_water[down_children[ch]]
                                         else:
-                                            self.cumulated_radial_exchanges_Nm[down_children[0]] += (self.export_Nm[v] - self.diffusion_Nm_soil_xylem[v] - self.diffusion_Nm_xylem[v]) * water_exchange_time * exported_water[p] / self.xylem_water[v]
-                                            self.cumulated_radial_exchanges_AA[down_children[0]] += (self.export_AA[v] - self.diffusion_AA_soil_xylem[v]) * water_exchange_time * exported_water[p] / self.xylem_water[v]
+                                            self.cumulated_radial_exchanges_Nm[down_children[ch]] += (self.export_Nm[v] - self.diffusion_Nm_soil_xylem[v] - self.diffusion_Nm_xylem[v]) * water_exchange_time * children_down_flow[ch] / self.xylem_water[v]
+                                            self.cumulated_radial_exchanges_AA[down_children[ch]] += (self.export_AA[v] - self.diffusion_AA_soil_xylem[v]) * water_exchange_time * children_down_flow[ch] / self.xylem_water[v]
                                             # If all water content from initial segment gone through this axis is exported to the considered child
-                                            if exported_water[p] > self.xylem_water[v] * axis_proportion[p]:
-                                                self.displaced_Nm_in[down_children[0]] += self.displaced_Nm_out[v] * axis_proportion[p]
-                                                self.displaced_AA_in[down_children[0]] += self.displaced_AA_out[v] * axis_proportion[p]
+                                            if children_down_flow[ch] > self.xylem_water[v] * axis_proportion[p + ch]:
+                                                self.displaced_Nm_in[down_children[ch]] += self.displaced_Nm_out[v] * axis_proportion[p + ch]
+                                                self.displaced_AA_in[down_children[ch]] += self.displaced_AA_out[v] * axis_proportion[p + ch]
                                             else:
                                                 # Displaced matter is shared between child and its parent
-                                                child_proportion = exported_water[p] / (self.xylem_water[v] * axis_proportion[p])
-                                                self.displaced_Nm_in[down_children[0]] += self.displaced_Nm_out[v] * axis_proportion[p] * child_proportion
-                                                self.displaced_AA_in[down_children[0]] += self.displaced_AA_out[v] * axis_proportion[p] * child_proportion
-                                                self.displaced_Nm_in[parent[p]] += self.displaced_Nm_out[v] * axis_proportion[p] * (1 - child_proportion)
-                                                self.displaced_AA_in[parent[p]] += self.displaced_AA_out[v] * axis_proportion[p] * (1 - child_proportion)
+                                                child_proportion = children_down_flow[ch] / (self.xylem_water[v] * axis_proportion[p + ch])
+                                                self.displaced_Nm_in[down_children[ch]] += self.displaced_Nm_out[v] * axis_proportion[p + ch] * child_proportion
+                                                self.displaced_AA_in[down_children[ch]] += self.displaced_AA_out[v] * axis_proportion[p + ch] * child_proportion
+                                                self.displaced_Nm_in[parent[p]] += self.displaced_Nm_out[v] * axis_proportion[p + ch] * (1 - child_proportion)
+                                                self.displaced_AA_in[parent[p]] += self.displaced_AA_out[v] * axis_proportion[p + ch] * (1 - child_proportion)
                                             # Break the loop
-                                            children_exported_water += [0]
+                                            children_down_flow[ch] = 0
+                                    children_exported_water += children_down_flow
 
-                                    # Else if there are several children
-                                    else:
-                                        # Water repartition is done according to radius,
-                                        # as this is the main criteria used in the water model
-                                        radius_sum = sum([self.radius[k] for k in down_children])
-                                        children_down_flow = [exported_water[p] * self.radius[k] / radius_sum for k in down_children]
-                                        children_radius_prop = [self.radius[k] / radius_sum for k in down_children]
-                                        # Actualize the repartition of water when there is a new branching
-                                        for k in range(1, len(children_radius_prop)):
-                                            axis_proportion.insert(p + 1, axis_proportion[p] * children_radius_prop[-k])
-
-                                        axis_proportion[p] = axis_proportion[p] * children_radius_prop[0]
-                                        for ch in range(len(down_children)):
-                                            # If the considered child have been completely filled with water from the parent
-                                            if children_down_flow[ch] - self.xylem_water[down_children[ch]] > 0 :
-                                                # The exposition time is longer if the water content of the target neighbour is more important.
-                                                self.cumulated_radial_exchanges_Nm[down_children[ch]] += (self.export_Nm[v] - self.diffusion_Nm_soil_xylem[v] - self.diffusion_Nm_xylem[v]) * water_exchange_time * self.xylem_water[down_children[ch]] / self.xylem_water[v]
-                                                self.cumulated_radial_exchanges_AA[down_children[ch]] += (self.export_AA[v] - self.diffusion_AA_soil_xylem[v]) * water_exchange_time * self.xylem_water[down_children[ch]] / self.xylem_water[v]
-                                                children_down_flow[ch] -= self.xylem_water[down_children[ch]]
-                                            else:
-                                                self.cumulated_radial_exchanges_Nm[down_children[ch]] += (self.export_Nm[v] - self.diffusion_Nm_soil_xylem[v] - self.diffusion_Nm_xylem[v]) * water_exchange_time * children_down_flow[ch] / self.xylem_water[v]
-                                                self.cumulated_radial_exchanges_AA[down_children[ch]] += (self.export_AA[v] - self.diffusion_AA_soil_xylem[v]) * water_exchange_time * children_down_flow[ch] / self.xylem_water[v]
-                                                # If all water content from initial segment gone through this axis is exported to the considered child
-                                                if children_down_flow[ch] > self.xylem_water[v] * axis_proportion[p + ch]:
-                                                    self.displaced_Nm_in[down_children[ch]] += self.displaced_Nm_out[v] * axis_proportion[p + ch]
-                                                    self.displaced_AA_in[down_children[ch]] += self.displaced_AA_out[v] * axis_proportion[p + ch]
-                                                else:
-                                                    # Displaced matter is shared between child and its parent
-                                                    child_proportion = children_down_flow[ch] / (self.xylem_water[v] * axis_proportion[p + ch])
-                                                    self.displaced_Nm_in[down_children[ch]] += self.displaced_Nm_out[v] * axis_proportion[p + ch] * child_proportion
-                                                    self.displaced_AA_in[down_children[ch]] += self.displaced_AA_out[v] * axis_proportion[p + ch] * child_proportion
-                                                    self.displaced_Nm_in[parent[p]] += self.displaced_Nm_out[v] * axis_proportion[p + ch] * (1 - child_proportion)
-                                                    self.displaced_AA_in[parent[p]] += self.displaced_AA_out[v] * axis_proportion[p + ch] * (1 - child_proportion)
-                                                # Break the loop
-                                                children_down_flow[ch] = 0
-                                        children_exported_water += children_down_flow
-
-                                    # Concatenate so that each children will become parent for the next loop
-                                    children_list += down_children
-
-                            # Children become parent for the next loop
-                            parent = children_list
-                            exported_water = children_exported_water
-
-                # If this is an inflow from both up an down segments
-                if self.axial_import_water_down[v] >= 0 >= self.axial_export_water_up[v]:
-                    # There is no exported matter, thus no receiver
-                    self.displaced_Nm_out[v] = 0
-                    self.displaced_AA_out[v] = 0
-                    # No matter what the transported water amount is, all radial transport effects remain on the current vertex.
-                    self.cumulated_radial_exchanges_Nm[v] += (self.export_Nm[v] - self.diffusion_Nm_soil_xylem[v] - self.diffusion_Nm_xylem[v]) * self.time_step
-                    self.cumulated_radial_exchanges_AA[v] += (self.export_AA[v] - self.diffusion_AA_soil_xylem[v]) * self.time_step
+                                # Concatenate so that each children will become parent for the next loop
+                                children_list += down_children
 
-                self.Nm_differential_by_water_transport[v] = self.displaced_Nm_in[v] - self.displaced_Nm_out[v]
+                        # Children become parent for the next loop
+                        parent = children_list
+                        exported_water = children_exported_water
+
+            # If this is an inflow from both up an down segments
+            if self.axial_import_water_down[v] >= 0 >= self.axial_export_water_up[v]:
+                # There is no exported matter, thus no receiver
+                self.displaced_Nm_out[v] = 0
+                self.displaced_AA_out[v] = 0
+                # No matter what the transported water amount is, all radial transport effects remain on the current vertex.
+                self.cumulated_radial_exchanges_Nm[v] += (self.export_Nm[v] - self.diffusion_Nm_soil_xylem[v] - self.diffusion_Nm_xylem[v]) * self.time_step
+                self.cumulated_radial_exchanges_AA[v] += (self.export_AA[v] - self.diffusion_AA_soil_xylem[v]) * self.time_step
+
+            self.Nm_differential_by_water_transport[v] = self.displaced_Nm_in[v] - self.displaced_Nm_out[v]
+
+    def tree_flow_axial_transport_N(self):
+        """
+        Single pass version of iterative_axial_transport_N on topology-indexed arrays.
+        Instead of chasing each exported water column from neighbour to neighbour, the segments it fills are located from
+        xylem water volumes cumulated along the paths to collar. Receivers of upward exports are found by binary lifting on these
+        cumulated volumes and the loading of completely filled parents is applied through subtree sums, so that the cost no longer
+        grows with the length of water columns under high transpiration. Downward exports are split among emerged children
+        by radius, as in the iterative version, and all columns are advanced together one branching level at a time.
+
+        Results are identical to the iterative version, except when a downward column meets several branchings, where the
+        iterative version misaligns the axis proportions of the branches. Nm_differential_by_water_transport also accounts here for
+        all inflows of the time step and not only those of previously visited vertices.
+        """
+        topology = self.topology
+        topology.update(self.vertices)
+        arrays = {name: topology.gather(self.props[name]) for name in self.axial_transport_inputs}
+        for name, values in self.tree_flow_transport(arrays).items():
+            if name in ("Nm_root_shoot_xylem", "AA_root_shoot_xylem"):
+                self.props[name][1] += values
+            elif name == "Nm_differential_by_water_transport":
+                topology.scatter(self.props[name], values, rows=arrays["struct_mass"] > 0)
+            else:
+                topology.scatter(self.props[name], values)
+
+    def tree_flow_transport(self, arrays):
+        """
+        Array core of tree_flow_axial_transport_N, working on row-ordered arrays of the topology index.
+
+        :param arrays: dict of row-ordered arrays for each name of axial_transport_inputs
+        :return: dict of the resulting row-ordered arrays, and of the amounts exported to shoot
+        """
+        topology = self.topology
+        parent = topology.parent
+
+        struct_mass = arrays["struct_mass"]
+        xylem_water = arrays["xylem_water"]
+        export_up = arrays["axial_export_water_up"]
+        import_down = arrays["axial_import_water_down"]
+        radius = arrays["radius"]
+        # Nm and AA are transported together as the two columns of the following arrays
+        loading = np.column_stack((
+            arrays["export_Nm"] - arrays["diffusion_Nm_soil_xylem"] - arrays["diffusion_Nm_xylem"],
+            arrays["export_AA"] - arrays["diffusion_AA_soil_xylem"]))
+        content = np.column_stack((arrays["xylem_Nm"], arrays["xylem_AA"])) * arrays["xylem_struct_mass"][:, None]
+        cumulated = np.column_stack((arrays["cumulated_radial_exchanges_Nm"], arrays["cumulated_radial_exchanges_AA"]))
+        displaced_in = np.column_stack((arrays["displaced_Nm_in"], arrays["displaced_AA_in"]))
+        displaced_out = np.column_stack((arrays["displaced_Nm_out"], arrays["displaced_AA_out"]))
+        root_shoot = np.zeros(2)
+
+        emerged = struct_mass > 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            turnover_up = export_up / xylem_water
+            turnover_down = - import_down / xylem_water
+
+        # If this is an inflow from both up and down segments, all radial transport effects remain on the current vertex
+        rows = np.flatnonzero(emerged & (import_down >= 0) & (export_up <= 0))
+        displaced_out[rows] = 0.
+        cumulated[rows] += loading[rows] * self.time_step
+
+        # Out flow to up parent only affecting the considered segment, the exported matter corresponds to the exported water proportion
+        rows = np.flatnonzero(emerged & (export_up > 0) & (turnover_up <= 1))
+        cumulated[rows] += loading[rows] * self.time_step
+        displaced_out[rows] = turnover_up[rows, None] * content[rows]
+        to_collar = parent[rows] < 0
+        root_shoot += displaced_out[rows[to_collar]].sum(axis=0)
+        np.add.at(displaced_in, parent[rows[~to_collar]], displaced_out[rows[~to_collar]])
+
+        # Out flow to a chain of up parents, the exported matter corresponds to the whole segment's water content
+        rows = np.flatnonzero(emerged & (export_up > 0) & (turnover_up > 1))
+        if len(rows) > 0:
+            water = xylem_water[rows]
+            moved = content[rows]
+            displaced_out[rows] = moved
+            column_loading = loading[rows] * (self.time_step / turnover_up[rows])[:, None]
+            cumulated[rows] += column_loading
+            unit_loading = column_loading / water[:, None]
+
+            # A parent is completely filled by the column if the column exceeds the water volume between the segment and this parent's parent
+            path_water = topology.path_sum(xylem_water)
+            upstream_water = path_water - xylem_water
+            threshold = path_water[rows] - export_up[rows]
+            last_filled = topology.furthest_ancestor(rows, lambda candidates, index: upstream_water[candidates] > threshold[index])
+
+            # The exposition time of filled parents is longer if their water content is more important
+            filled_loading = np.zeros_like(cumulated)
+            has_parent = parent[rows] >= 0
+            np.add.at(filled_loading, parent[rows[has_parent]], unit_loading[has_parent])
+            has_receiver = parent[last_filled] >= 0
+            np.add.at(filled_loading, parent[last_filled[has_receiver]], - unit_loading[has_receiver])
+            cumulated += topology.subtree_sum(filled_loading) * xylem_water[:, None]
+
+            # The water exceeding the filled parents is received by the next parent, or exported through collar
+            receiver = parent[last_filled]
+            exceeding = export_up[rows] - path_water[rows] + upstream_water[last_filled]
+            whole = exceeding > water
+            parent_proportion = np.where(whole, 1., exceeding / water)
+            received = unit_loading * exceeding[:, None] + moved * parent_proportion[:, None]
+            root_shoot += received[~has_receiver].sum(axis=0)
+            np.add.at(cumulated, receiver[has_receiver], (unit_loading * exceeding[:, None])[has_receiver])
+            np.add.at(displaced_in, receiver[has_receiver], (moved * parent_proportion[:, None])[has_receiver])
+            # Otherwise displaced matter is shared between the last filled segment and its parent
+            np.add.at(displaced_in, last_filled[~whole], (moved * (1 - parent_proportion[:, None]))[~whole])
+
+        # Water arriving in a segment is shared among its emerged children according to their radius, as in the water model
+        emerged_children = topology.children_sum(emerged.astype(float))
+        emerged_radius_sum = topology.children_sum(np.where(emerged, radius, 0.))
+
+        # Out flow to down children only affecting the considered segment
+        rows = np.flatnonzero(emerged & (import_down < 0) & (turnover_down <= 1))
+        cumulated[rows] += loading[rows] * self.time_step
+        displaced_out[rows] = turnover_down[rows, None] * content[rows]
+        origin, children = topology.expand_children(rows)
+        keep = emerged[children]
+        origin, children = rows[origin[keep]], children[keep]
+        np.add.at(displaced_in, children, displaced_out[origin] * (radius[children] / emerged_radius_sum[origin])[:, None])
+
+        # Out flow to the chains of down children
+        rows = np.flatnonzero(emerged & (import_down < 0) & (turnover_down > 1))
+        water = xylem_water[rows]
+        moved = content[rows]
+        displaced_out[rows] = moved
+        column_loading = loading[rows] * (self.time_step / turnover_down[rows])[:, None]
+        cumulated[rows] += column_loading
+        unit_loading = column_loading / water[:, None]
+
+        # Each branch of a water column is described by its source, the last filled segment, the remaining water
+        # and the proportion of the source column flowing through this branch
+        source = np.arange(len(rows))
+        branch = rows
+        exported_water = - import_down[rows] - water
+        axis_proportion = np.ones(len(rows))
+        while len(branch) > 0:
+            flowing = exported_water > 0
+            source, branch, exported_water, axis_proportion = source[flowing], branch[flowing], exported_water[flowing], axis_proportion[flowing]
+
+            # If the branch ends on an apex, it concentrates the associated carried and loaded matter
+            apex = emerged_children[branch] == 0
+            s, b, e, a = source[apex], branch[apex], exported_water[apex], axis_proportion[apex]
+            np.add.at(cumulated, b, unit_loading[s] * e[:, None])
+            apex_proportion = (e + xylem_water[b]) / (water[s] * a)
+            whole = apex_proportion > 1
+            apex_proportion[whole] = 1.
+            np.add.at(displaced_in, b, moved[s] * (a * apex_proportion)[:, None])
+            np.add.at(displaced_in, parent[b[~whole]], (moved[s] * (a * (1 - apex_proportion))[:, None])[~whole])
+
+            # Else the remaining water is shared among emerged children
+            origin, children = topology.expand_children(branch[~apex])
+            origin = np.flatnonzero(~apex)[origin]
+            keep = emerged[children]
+            origin, children = origin[keep], children[keep]
+            b = branch[origin]
+            s = source[origin]
+            radius_proportion = np.where(emerged_children[b] == 1, 1., radius[children] / emerged_radius_sum[b])
+            children_down_flow = exported_water[origin] * radius_proportion
+            a = axis_proportion[origin] * radius_proportion
+
+            # If the considered child have been completely filled with water from the parent, the exposition time is
+            # longer if the water content of the child is more important. Otherwise we account only for the exceeding amount
+            filled = children_down_flow - xylem_water[children] > 0
+            np.add.at(cumulated, children, unit_loading[s] * np.where(filled, xylem_water[children], children_down_flow)[:, None])
+
+            # Where the column stops, displaced matter is shared between the child and its parent
+            stop = ~filled
+            child_proportion = children_down_flow[stop] / (water[s[stop]] * a[stop])
+            child_proportion[child_proportion > 1] = 1.
+            np.add.at(displaced_in, children[stop], moved[s[stop]] * (a[stop] * child_proportion)[:, None])
+            np.add.at(displaced_in, b[stop], moved[s[stop]] * (a[stop] * (1 - child_proportion))[:, None])
+
+            # Filled children become the ends of the branches for the next level
+            source, branch = s[filled], children[filled]
+            exported_water = (children_down_flow - xylem_water[children])[filled]
+            axis_proportion = a[filled]
+
+        return dict(cumulated_radial_exchanges_Nm=cumulated[:, 0], cumulated_radial_exchanges_AA=cumulated[:, 1],
+                    displaced_Nm_in=displaced_in[:, 0], displaced_AA_in=displaced_in[:, 1],
+                    displaced_Nm_out=displaced_out[:, 0], displaced_AA_out=displaced_out[:, 1],
+                    Nm_differential_by_water_transport=displaced_in[:, 0] - displaced_out[:, 0],
+                    Nm_root_shoot_xylem=root_shoot[0], AA_root_shoot_xylem=root_shoot[1])
 
     # METABOLIC PROCESSES
     @rate
     def _AA_synthesis(self, struct_mass, Nm, soil_temperature, C_hexose_root=1e-4):
         # amino acid synthesis
         if C_hexose_root > 0 and Nm > 0:
-            smax_AA = self.smax_AA * self.temperature_modification(soil_temperature=soil_temperature,
-                                                                     T_ref=self.active_processes_T_ref,
-                                                                     A=self.active_processes_A,
-                                                                     B=self.active_processes_B,
-                                                                     C=self.active_processes_C)
+            smax_AA = self.smax_AA * self.process_temperature_modification(soil_temperature=soil_temperature, processes="active")
             return struct_mass * smax_AA / (
                     ((1 + self.Km_Nm_AA) / Nm) + ((1 + self.Km_C_AA) / C_hexose_root))
         else:
@@ -1004,44 +1246,28 @@ class RootNitrogenModel(Model):
     @rate
     def _storage_synthesis(self, struct_mass, AA, soil_temperature):
         # Organic storage synthesis (Michaelis-Menten kinetic)
-        smax_stor = self.smax_stor * self.temperature_modification(soil_temperature=soil_temperature,
-                                                                     T_ref=self.active_processes_T_ref,
-                                                                     A=self.active_processes_A,
-                                                                     B=self.active_processes_B,
-                                                                     C=self.active_processes_C)
+        smax_stor = self.smax_stor * self.process_temperature_modification(soil_temperature=soil_temperature, processes="active")
         return struct_mass * (smax_stor * AA / (self.Km_AA_stor + AA))
 
     @rate
     def _storage_catabolism(self, struct_mass, storage_protein, soil_temperature, C_hexose_root=1e-4):
         # Organic storage catabolism through proteinase
         Km_stor_root = self.Km_stor_catab * np.exp(self.storage_C_regulation * C_hexose_root)
-        cmax_stor = self.cmax_stor * self.temperature_modification(soil_temperature=soil_temperature,
-                                                                     T_ref=self.active_processes_T_ref,
-                                                                     A=self.active_processes_A,
-                                                                     B=self.active_processes_B,
-                                                                     C=self.active_processes_C)
+        cmax_stor = self.cmax_stor * self.process_temperature_modification(soil_temperature=soil_temperature, processes="active")
         return struct_mass * cmax_stor * storage_protein / (Km_stor_root + storage_protein)
 
     @rate
     def _AA_catabolism(self, struct_mass, AA, soil_temperature, C_hexose_root=1e-4):
         # AA catabolism through GDH
         Km_stor_root = self.Km_AA_catab * np.exp(self.storage_C_regulation * C_hexose_root)
-        cmax_AA = self.cmax_AA * self.temperature_modification(soil_temperature=soil_temperature,
-                                                                     T_ref=self.active_processes_T_ref,
-                                                                     A=self.active_processes_A,
-                                                                     B=self.active_processes_B,
-                                                                     C=self.active_processes_C)
+        cmax_AA = self.cmax_AA * self.process_temperature_modification(soil_temperature=soil_temperature, processes="active")
         return struct_mass * cmax_AA * AA / (Km_stor_root + AA)
 
     #@rate
     def _nitrogenase_fixation(self, type, struct_mass, C_hexose_root, Nm, soil_temperature):
         if type == "Root_nodule":
             # We model nitrogenase expression repression by higher nitrogen availability through an inibition law
-            vmax_bnf = (self.vmax_bnf / (1 + (Nm / self.K_bnf_Nm_inibition))) * self.temperature_modification(soil_temperature=soil_temperature,
-                                                                                                            T_ref=self.active_processes_T_ref,
-                                                                                                            A=self.active_processes_A,
-                                                                                                            B=self.active_processes_B,
-                                                                                                            C=self.active_processes_C)
+            vmax_bnf = (self.vmax_bnf / (1 + (Nm / self.K_bnf_Nm_inibition))) * self.process_temperature_modification(soil_temperature=soil_temperature, processes="active")
             # Michaelis-Menten formalism
             return struct_mass * vmax_bnf * C_hexose_root / (self.Km_hexose_bnf + C_hexose_root)
         else:
@@ -1092,20 +1318,12 @@ class RootNitrogenModel(Model):
         """
         Mainly Ammonium active export by AMF to roots as reported from 
         """
-        vmax_N_to_roots_fungus = self.vmax_N_to_roots_fungus * self.temperature_modification(soil_temperature=soil_temperature,
-                                                                                            T_ref=self.active_processes_T_ref,
-                                                                                            A=self.active_processes_A,
-                                                                                            B=self.active_processes_B,
-                                                                                            C=self.active_processes_C)
+        vmax_N_to_roots_fungus = self.vmax_N_to_roots_fungus * self.process_temperature_modification(soil_temperature=soil_temperature, processes="active")
         return vmax_N_to_roots_fungus * mycorrhiza_infected_length * Nm_fungus / (Nm_fungus + self.Km_N_to_roots_fungus)
 
     @totalrate
     def _cytokinin_synthesis(self, total_struct_mass, total_hexose, total_Nm, soil_temperature):
-        smax_cytok = self.smax_cytok * self.temperature_modification(soil_temperature=soil_temperature,
-                                                                                            T_ref=self.active_processes_T_ref,
-                                                                                            A=self.active_processes_A,
-                                                                                            B=self.active_processes_B,
-                                                                                            C=self.active_processes_C)
+        smax_cytok = self.smax_cytok * self.process_temperature_modification(soil_temperature=soil_temperature, processes="active")
         return total_struct_mass[1] * smax_cytok * (
                 total_hexose[1] / (total_hexose[1] + self.Km_C_cytok)) * (
                 total_Nm[1] / (total_Nm[1] + self.Km_N_cytok))
@@ -1125,7 +1343,11 @@ class RootNitrogenModel(Model):
                     + AA_catabolism / self.r_Nm_AA
                     + nitrogenase_fixation
                     - deficit_Nm)
-            if balance < 0.:
+            if self.pool_update_solver == "semi_implicit":
+                # Losses were limited by semi_implicit_rates, only the tolerance of its fixed point can leave a negative balance
+                self.deficit_Nm[vertex_index] = 0.
+                return max(balance, 0.)
+            elif balance < 0.:
                 deficit = - balance * (struct_mass) / self.time_step
                 self.deficit_Nm[vertex_index] = deficit if deficit > 1e-20 else 0.
                 return 0.
@@ -1152,7 +1374,11 @@ class RootNitrogenModel(Model):
                     + storage_catabolism / self.r_AA_stor
                     - AA_catabolism
                     - deficit_AA)
-            if balance < 0.:
+            if self.pool_update_solver == "semi_implicit":
+                # Losses were limited by semi_implicit_rates, only the tolerance of its fixed point can leave a negative balance
+                self.deficit_AA[vertex_index] = 0.
+                return max(balance, 0.)
+            elif balance < 0.:
                 deficit = - balance * (struct_mass) / self.time_step
                 self.deficit_AA[vertex_index] = deficit if deficit > 1e-20 else 0.
                 return 0.
@@ -1198,11 +1424,85 @@ class RootNitrogenModel(Model):
     def _phloem_struct_mass(self, struct_mass):
         return struct_mass * self.phloem_cross_area_ratio
 
+    # SEMI-IMPLICIT POOL UPDATES
+
+    def pool_transfers(self):
+        """
+        Rates of the Nm, AA and xylem pools balances of a vertex, as (rate, pool debited, pool credited, debited ratio, credited ratio) when the rate is positive,
+        bidirectional rates transferring in the opposite direction when negative.
+        None stands for the pools these balances do not include, i.e. soil, phloem, structure and storage.
+        """
+        return (("import_Nm", None, "Nm", 1., 1.),
+                ("mychorizal_mediated_import_Nm", None, "Nm", 1., 1.),
+                ("nitrogenase_fixation", None, "Nm", 1., 1.),
+                ("diffusion_Nm_soil", "Nm", None, 1., 1.),
+                ("diffusion_Nm_xylem", "xylem_Nm", "Nm", 1., 1.),
+                ("export_Nm", "Nm", "xylem_Nm", 1., 1.),
+                ("AA_synthesis", "Nm", "AA", self.r_Nm_AA, 1.),
+                ("AA_catabolism", "AA", "Nm", 1., 1. / self.r_Nm_AA),
+                ("deficit_Nm", "Nm", None, 1., 1.),
+                ("import_AA", None, "AA", 1., 1.),
+                ("diffusion_AA_phloem", None, "AA", 1., 1.),
+                ("diffusion_AA_soil", "AA", None, 1., 1.),
+                ("export_AA", "AA", "xylem_AA", 1., 1.),
+                ("struct_synthesis", "AA", None, 1., 1.),
+                ("storage_synthesis", "AA", None, self.r_AA_stor, 1.),
+                ("storage_catabolism", None, "AA", 1., 1. / self.r_AA_stor),
+                ("deficit_AA", "AA", None, 1., 1.),
+                ("diffusion_Nm_soil_xylem", "xylem_Nm", None, 1., 1.),
+                ("diffusion_AA_soil_xylem", "xylem_AA", None, 1., 1.))
+
+    def semi_implicit_rates(self, arrays, vertices=None, tolerance=1e-12, max_iterations=100):
+        """
+        Limits the rates emptying the Nm, AA and xylem pools of each vertex so that these pools stay positive over the time step (Patankar scheme).
+        Losses of a pool are multiplied by the factor new_pool / A = A / (A + L), A being the pool available after its gains over the time step and L its explicit losses,
+        which keeps the explicit losses as long as they are small compared to A and tends to A otherwise.
+        Gains transferred from another pool of the vertex are the limited losses of this pool, so that every transfer is debited and credited with the same amount.
+        As the factors of pools exchanging with each other depend on each other, they are found by fixed point iterations, which decrease monotonically from 1.
+        Xylem pools are only credited with the radial exchanges of their vertex here, water columns displaced along the root system being left to axial transport.
+        Works on vertex-indexed arrays as well as on (members, vertices) ensemble arrays, inputs missing in 'arrays' being gathered from properties.
+
+        :return: dict of the limited rates and deficits
+        """
+        def get(name):
+            return arrays[name] if name in arrays else self.vertex_array(name, vertices)
+
+        pools = dict(Nm=get("Nm") * get("struct_mass"), AA=get("AA") * get("struct_mass"),
+                     xylem_Nm=get("xylem_Nm") * get("xylem_struct_mass"), xylem_AA=get("xylem_AA") * get("xylem_struct_mass"))
+        # Amounts transferred over the time step in each direction
+        transfers = []
+        for rate, debited, credited, debited_ratio, credited_ratio in self.pool_transfers():
+            values = get(rate) * self.time_step
+            transfers.append((debited, credited, debited_ratio, credited_ratio, np.maximum(values, 0.)))
+            transfers.append((credited, debited, credited_ratio, debited_ratio, np.maximum(-values, 0.)))
+        losses = {pool: sum(ratio * amount for debited, _, ratio, _, amount in transfers if debited == pool) for pool in pools}
+
+        factors = {pool: np.ones_like(amount) for pool, amount in pools.items()}
+        for _ in range(max_iterations):
+            available = {pool: amount.copy() for pool, amount in pools.items()}
+            for debited, credited, _, ratio, amount in transfers:
+                if credited is not None:
+                    available[credited] += ratio * amount * (factors[debited] if debited is not None else 1.)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                updated = {pool: np.where(losses[pool] > 0., np.where(available[pool] > 0., available[pool] / (available[pool] + losses[pool]), 0.), 1.)
+                           for pool in pools}
+            change = max(float(np.max(np.abs(updated[pool] - factors[pool]), initial=0.)) for pool in pools)
+            factors = updated
+            if change < tolerance:
+                break
+
+        limited = {}
+        for rate, debited, credited, _, _ in self.pool_transfers():
+            values = get(rate)
+            limited[rate] = (np.maximum(values, 0.) * (factors[debited] if debited is not None else 1.)
+                             - np.maximum(-values, 0.) * (factors[credited] if credited is not None else 1.))
+        return limited
+
     # PLANT SCALE PROPERTIES UPDATE
 
     @totalstate
     def _total_phloem_AA(self, total_phloem_AA, diffusion_AA_phloem, AA_root_shoot_phloem, total_struct_mass):
-        return total_phloem_AA[1] + (- self.time_step * sum(diffusion_AA_phloem.values()) + AA_root_shoot_phloem[1]) / (
+        return total_phloem_AA[1] + (- self.time_step * self.plant_sums()["diffusion_AA_phloem"] + AA_root_shoot_phloem[1]) / (
                 total_struct_mass[1] * self.phloem_cross_area_ratio)
     
     @totalstate
@@ -1220,28 +1520,438 @@ class RootNitrogenModel(Model):
     @totalstate
     def _total_struct_mass(self, struct_mass):
         # WARNING, do not parallelize otherwise other pool updates will be based on previous time-step
-        return sum(struct_mass.values())
+        return self.plant_sums()["struct_mass"]
 
     @totalstate
     def _total_Nm(self, Nm, struct_mass, total_struct_mass):
-        return sum([x*y for x, y in zip(Nm.values(), struct_mass.values())]) / total_struct_mass[1]
+        return self.plant_sums()["Nm"] / total_struct_mass[1]
 
     @totalstate
     def _total_AA(self, AA, struct_mass, total_struct_mass):
-        return sum([x * y for x, y in zip(AA.values(), struct_mass.values())]) / total_struct_mass[1]
+        return self.plant_sums()["AA"] / total_struct_mass[1]
 
     @totalstate
     def _total_xylem_Nm(self, xylem_Nm, xylem_struct_mass, total_struct_mass):
-        return sum([x*y for x, y in zip(xylem_Nm.values(), xylem_struct_mass.values())]) / total_struct_mass[1]
+        return self.plant_sums()["xylem_Nm"] / total_struct_mass[1]
 
     @totalstate
     def _total_xylem_AA(self, xylem_AA, xylem_struct_mass, total_struct_mass):
-        return sum([x*y for x, y in zip(xylem_AA.values(), xylem_struct_mass.values())]) / total_struct_mass[1]
+        return self.plant_sums()["xylem_AA"] / total_struct_mass[1]
 
     @totalstate
     def _total_AA_rhizodeposition(self, diffusion_AA_soil, import_AA):
-        return self.time_step * (sum(diffusion_AA_soil.values()) - sum(import_AA.values()))
+        return self.time_step * (self.plant_sums()["diffusion_AA_soil"] - self.plant_sums()["import_AA"])
 
     @totalstate
     def _total_hexose(self, struct_mass, total_struct_mass, C_hexose_root=1e-4):
-        return sum([x*y for x, y in zip(C_hexose_root.values(), struct_mass.values())]) / total_struct_mass[1]
+        return self.plant_sums()["C_hexose_root"] / total_struct_mass[1]
+
+    def plant_sums(self):
+        """
+        Sums over root segments used by plant scale totals, weighted by the structural mass holding each pool.
+        They are all computed in a single pass on vertex-indexed arrays at the first request of the time step,
+        once vertex-scale states have been updated, and reused by the following totals.
+        Like in the per-vertex sums, rates of non emerged vertices are included.
+        """
+        if self.summed_pools is None:
+            self.summed_pools = {name: float(value) for name, value in self.sum_pools(self.vertex_array).items()}
+        return self.summed_pools
+
+    def sum_pools(self, array):
+        """
+        Computes the sums of plant_sums at once.
+
+        :param array: function returning the vertex-indexed array of a property, possibly with a leading ensemble members axis
+        :return: dict of the sums, being arrays of one value per member if any
+        """
+        struct_mass = array("struct_mass")
+        xylem_struct_mass = array("xylem_struct_mass")
+        weights = {"Nm": struct_mass, "AA": struct_mass, "C_hexose_root": struct_mass,
+                   "xylem_Nm": xylem_struct_mass, "xylem_AA": xylem_struct_mass,
+                   "diffusion_AA_phloem": 1., "diffusion_AA_soil": 1., "import_AA": 1.}
+        broadcast = np.broadcast_arrays(*(array(name) for name in weights), *weights.values())
+        sums = (np.stack(broadcast[:len(weights)]) * np.stack(broadcast[len(weights):])).sum(axis=-1)
+        summed = dict(zip(weights, sums))
+        summed["struct_mass"] = struct_mass.sum(axis=-1)
+        return summed
+
+    # VECTORIZED COMPUTATION MODE
+
+    def __call__(self, *args):
+        if self.ensemble_size is not None:
+            self.ensemble_step()
+        elif self.vectorized_processes:
+            self.vectorized_step()
+        else:
+            super().__call__(*args)
+
+    def vectorized_step(self):
+        """
+        Description
+        ___________
+        Performs a model time step with all vertex-scale rates and states computed on arrays of the active vertices.
+        Processes are applied in the same order as in the per-vertex scheduling, so that both modes give the same results.
+        Mycorrhiza processes are not included as they are still under development.
+        """
+        self.pull_available_inputs()
+        self.initialize_cumulative()
+
+        active = self.active_vertices
+        self.update_from_arrays(self.vectorized_rates(active), active)
+        self._axial_transport_N()
+        self.cytokinin_synthesis[1] = self._cytokinin_synthesis(*(self.props[arg] for arg in signature(self._cytokinin_synthesis).parameters))
+
+        self.update_from_arrays(self.vectorized_states(active), active)
+
+        for name in self.plant_states:
+            f = getattr(self, "_" + name)
+            self.props[name][1] = f(*(self.props[arg] for arg in signature(f).parameters))
+
+    def vertex_array(self, name, vertices=None):
+        """
+        Returns the property 'name' as a contiguous float array indexed like vertices, self.vertices by default
+        """
+        return take(self.props[name], self.vertices if vertices is None else vertices)
+
+    def update_from_arrays(self, arrays, vertices=None):
+        """
+        Writes back arrays indexed like vertices, self.vertices by default, into the corresponding property dictionaries
+        """
+        for name, values in arrays.items():
+            put(self.props[name], self.vertices if vertices is None else vertices, values)
+
+    def evaluate_on_arrays(self, name, arrays, vertices=None):
+        """
+        Calls the process computing 'name' once with vertex-indexed arrays of its inputs, which are gathered in 'arrays' if missing.
+        The '_<name>_vectorized' formulation is used when the per-vertex one branches on its inputs,
+        and the '_<name>_compiled' one, if any, when jit_kernels is True, numba is available and no ensemble is computed.
+        """
+        f = None
+        if self.jit_kernels and kernels.jit_available and self.ensemble_size is None:
+            f = getattr(self, f"_{name}_compiled", None)
+        if f is None:
+            f = getattr(self, f"_{name}_vectorized", getattr(self, f"_{name}"))
+        inputs = []
+        for arg in signature(f).parameters:
+            if arg not in arrays:
+                arrays[arg] = self.vertex_array(arg, vertices)
+            inputs.append(arrays[arg])
+        return f(*inputs)
+
+    def vectorized_rates(self, vertices=None):
+        """
+        Computes all vertex-scale rates from current states.
+
+        :param vertices: vertices on which rates are computed, self.vertices by default
+        :return: dict of arrays indexed like vertices for each rate of vertex_rates
+        """
+        arrays = {}
+        return {name: self.evaluate_on_arrays(name, arrays, vertices) for name in self.vertex_rates}
+
+    def vectorized_states(self, vertices=None):
+        """
+        Computes all vertex-scale states from current states and rates.
+        States are updated one after the other, so that a state uses the already updated values of the previous ones.
+
+        :param vertices: vertices on which states are computed, self.vertices by default
+        :return: dict of arrays indexed like vertices for each state of vertex_states and the resulting deficits
+        """
+        arrays = {}
+        for name in self.vertex_states:
+            arrays[name] = self.evaluate_on_arrays(name, arrays, vertices)
+        return {name: arrays[name] for name in self.vertex_states + ("deficit_Nm", "deficit_AA")}
+
+    # ENSEMBLE MODE
+
+    def set_ensemble(self, **parameters):
+        """
+        Description
+        ___________
+        Turns the model into an ensemble of members sharing the root architecture and environment, but differing by some parameter values,
+        e.g. the parameter sets of a sensitivity analysis. All members are computed at once in each vectorized time step,
+        vertex-scale states being stored as (members, vertices) arrays and plant-scale states as (members,) arrays in self.ensemble.
+        Property dictionaries of the MTG hold the states of the first member, which are the ones seen by coupled components,
+        so members only differ in nitrogen states. Vertices created by growth are partitioned for all members, see ensemble_post_growth_updating.
+        Axial transport uses the tree_flow solver.
+
+        :param parameters: one value per member for each varying parameter, all sequences having the same length
+        """
+        values = {}
+        for name, value in parameters.items():
+            field = self.__dataclass_fields__.get(name)
+            if field is None or field.metadata["variable_type"] != "parameter" or isinstance(getattr(self, name), (bool, str)):
+                raise ValueError(f"{name} is not a numerical parameter of {type(self).__name__}")
+            if name.startswith(("active_processes_", "passive_processes_")):
+                raise ValueError(f"{name} can't vary among ensemble members, as temperature modification factors are shared")
+            values[name] = np.asarray(value, dtype=float)
+        if len({value.shape for value in values.values()}) != 1 or next(iter(values.values())).ndim != 1:
+            raise ValueError("Ensemble parameters have to be provided as sequences of the same length")
+
+        self.ensemble_parameters = values
+        self.ensemble_size = len(next(iter(values.values())))
+        self.ensemble = {name: np.tile(self.vertex_array(name), (self.ensemble_size, 1))
+                         for name in self.vertex_states + ("deficit_Nm", "deficit_AA") + self.vertex_rates}
+        self.ensemble.update({name: np.full(self.ensemble_size, float(self.props[name][1])) for name in self.ensemble_plant_variables})
+
+    @property
+    def ensemble_plant_variables(self):
+        return self.plant_states + ("cytokinin_synthesis", "Nm_root_shoot_xylem", "AA_root_shoot_xylem")
+
+    def ensemble_array(self, name):
+        """
+        Returns the (members, vertices) array of 'name' if it differs among members, its vertex-indexed array otherwise
+        """
+        if name in self.ensemble:
+            return self.ensemble[name]
+        return self.vertex_array(name)
+
+    @contextmanager
+    def ensemble_members(self, vertex_scale):
+        """
+        Temporarily replaces the varying parameters and plant-scale states by their values for all members,
+        so that processes written for a single member are evaluated on all members at once.
+
+        :param vertex_scale: if True, values are shaped as (members, 1) to broadcast against vertex-indexed arrays, else as (members,)
+        """
+        shape = (self.ensemble_size, 1) if vertex_scale else (self.ensemble_size,)
+        saved = {name: getattr(self, name) for name in self.ensemble_parameters}
+        for name, values in self.ensemble_parameters.items():
+            setattr(self, name, values.reshape(shape))
+        for name in self.ensemble_plant_variables:
+            self.props[name][1] = self.ensemble[name].reshape(shape)
+        try:
+            yield
+        finally:
+            for name, value in saved.items():
+                setattr(self, name, value)
+            for name in self.ensemble_plant_variables:
+                self.ensemble[name] = np.broadcast_to(self.props[name][1], shape).reshape(-1).astype(float)
+                self.props[name][1] = float(self.ensemble[name][0])
+
+    def ensemble_step(self):
+        """
+        Description
+        ___________
+        Performs a vectorized time step for all ensemble members, processes being applied in the same order as in vectorized_step.
+        """
+        self.pull_available_inputs()
+        self.initialize_cumulative()
+        ensemble = self.ensemble
+        for name in ("Nm_root_shoot_xylem", "AA_root_shoot_xylem"):
+            ensemble[name] = np.zeros(self.ensemble_size)
+        # Like in vectorized_step, only the columns of active vertices are computed
+        active, columns = self.active_vertices, self.active_columns
+        shape = (self.ensemble_size, len(columns))
+
+        with self.ensemble_members(vertex_scale=True):
+            # Rates from the previous time step are the inputs of a member, as they would be read from its properties
+            arrays = {name: ensemble[name][:, columns] for name in self.vertex_states + self.vertex_rates}
+            for name in self.vertex_rates:
+                ensemble[name][:, columns] = np.broadcast_to(self.evaluate_on_arrays(name, arrays, active), shape)
+            if self.pool_update_solver == "semi_implicit":
+                arrays = {name: ensemble[name][:, columns] for name in self.vertex_states + ("deficit_Nm", "deficit_AA") + self.vertex_rates}
+                for name, values in self.semi_implicit_rates(arrays, active).items():
+                    if name in ensemble:
+                        ensemble[name][:, columns] = values
+        ensemble.update(self.ensemble_axial_transport_N())
+        with self.ensemble_members(vertex_scale=False):
+            self.cytokinin_synthesis[1] = self._cytokinin_synthesis(*(self.props[arg] for arg in signature(self._cytokinin_synthesis).parameters))
+
+        with self.ensemble_members(vertex_scale=True):
+            arrays = {name: ensemble[name][:, columns] for name in self.vertex_states + ("deficit_Nm", "deficit_AA") + self.vertex_rates + self.axial_transport_outputs}
+            for name in self.vertex_states:
+                arrays[name] = np.broadcast_to(self.evaluate_on_arrays(name, arrays, active), shape).copy()
+        for name in self.vertex_states + ("deficit_Nm", "deficit_AA"):
+            ensemble[name][:, columns] = arrays[name]
+
+        self.summed_pools = self.sum_pools(self.ensemble_array)
+        with self.ensemble_members(vertex_scale=False):
+            for name in self.plant_states:
+                f = getattr(self, "_" + name)
+                self.props[name][1] = f(*(self.props[arg] for arg in signature(f).parameters))
+        self.summed_pools = None
+
+        # The first member is the one provided to coupled components
+        self.update_from_arrays({name: ensemble[name][0] for name in self.vertex_states + self.vertex_rates + self.axial_transport_outputs
+                                 + ("deficit_Nm", "deficit_AA")})
+
+    def ensemble_axial_transport_N(self):
+        """
+        Axial transport of each member with the tree_flow solver, water flows being shared among members.
+
+        :return: dict of (members, vertices) arrays of the transported amounts
+        """
+        topology = self.topology
+        topology.update(self.vertices)
+        rows = topology.rows(self.vertices)
+        shape = (self.ensemble_size, len(self.vertices))
+        # Cumulated amounts start from their reinitialized values in properties, other inputs of the members being rates and states
+        varying = [name for name in self.axial_transport_inputs if name in self.vertex_rates + self.vertex_states]
+        shared = {name: topology.gather(self.props[name]) for name in self.axial_transport_inputs if name not in varying}
+        transported = {name: np.empty(shape) for name in self.axial_transport_outputs}
+        # Like in tree_flow_axial_transport_N, the differential of non emerged vertices is kept from the previous time step
+        transported["Nm_differential_by_water_transport"][:] = self.ensemble_array("Nm_differential_by_water_transport")
+        emerged = shared["struct_mass"] > 0
+        for member in range(self.ensemble_size):
+            arrays = dict(shared)
+            for name in varying:
+                arrays[name] = np.empty(len(rows))
+                arrays[name][rows] = self.ensemble[name][member]
+            for name, values in self.tree_flow_transport(arrays).items():
+                if name == "Nm_differential_by_water_transport":
+                    transported[name][member] = np.where(emerged[rows], values[rows], transported[name][member])
+                elif name in transported:
+                    transported[name][member] = values[rows]
+                else:
+                    self.ensemble[name][member] += values
+        return transported
+
+    def ensemble_post_growth_updating(self, existing, new_vertices):
+        """
+        Updates the members states upon structural mass change and partitions them in new elements, as post_growth_updating does for the first member.
+        Columns of the new vertices are appended to the (members, vertices) arrays, following self.vertices.
+
+        :param existing: vertices before growth, i.e. the current columns of the ensemble arrays
+        :param new_vertices: vertices created by growth, in creation order
+        """
+        vertex_scale = [name for name, values in self.ensemble.items() if values.ndim == 2]
+        intensive = [name for name in vertex_scale if name in self.state_variables
+                     and self.__dataclass_fields__[name].metadata["state_variable_type"] == "intensive"]
+        extensive = [name for name in vertex_scale if name in self.state_variables and name not in intensive]
+
+        struct_mass = self.vertex_array("struct_mass", existing)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            dilution = np.where(struct_mass > 0, self.vertex_array("initial_struct_mass", existing) / struct_mass, 1.)
+        for name in intensive:
+            self.ensemble[name] *= dilution
+        if len(new_vertices) == 0:
+            return
+
+        # New columns start from the properties of the first member, which states are then partitioned for all members
+        appended = self.vertices[len(existing):]
+        for name in vertex_scale:
+            self.ensemble[name] = np.hstack((self.ensemble[name], np.tile(self.vertex_array(name, appended), (self.ensemble_size, 1))))
+        column = dict(zip(self.vertices, range(len(self.vertices))))
+        for vid in new_vertices:
+            parent = self.g.parent(vid)
+            c, p = column[vid], column[parent]
+            for name in intensive:
+                self.ensemble[name][:, p] *= self.initial_struct_mass[parent] / self.struct_mass[parent]
+                self.ensemble[name][:, c] = self.ensemble[name][:, p]
+            mass_fraction = self.struct_mass[vid] / (self.struct_mass[vid] + self.struct_mass[parent])
+            for name in extensive:
+                self.ensemble[name][:, c] = self.ensemble[name][:, p] * mass_fraction
+                self.ensemble[name][:, p] *= 1 - mass_fraction
+
+    # Array formulations of the processes which branch on their inputs
+
+    def _diffusion_Nm_soil_vectorized(self, Nm, soil_Nm, root_exchange_surface, struct_mass, symplasmic_volume, soil_temperature):
+        diffusion_soil = self.diffusion_soil * self.process_temperature_modification(soil_temperature=soil_temperature, processes="passive")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(symplasmic_volume > 0,
+                            diffusion_soil * ((Nm * struct_mass / symplasmic_volume) - soil_Nm) * root_exchange_surface, 0.)
+
+    def _diffusion_Nm_soil_xylem_vectorized(self, soil_Nm, xylem_Nm, radius, length, xylem_differentiation_factor, endodermis_conductance_factor, struct_mass, xylem_volume, soil_temperature):
+        diffusion_apoplasm = self.diffusion_apoplasm * self.process_temperature_modification(soil_temperature=soil_temperature, processes="passive")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(xylem_volume > 0.,
+                            diffusion_apoplasm * ((xylem_Nm * struct_mass / xylem_volume) - soil_Nm) * 2 * np.pi * radius * length * xylem_differentiation_factor * endodermis_conductance_factor, 0.)
+
+    def _diffusion_AA_soil_vectorized(self, AA, soil_AA, root_exchange_surface, struct_mass, symplasmic_volume, soil_temperature):
+        diffusion_soil = self.diffusion_soil * self.process_temperature_modification(soil_temperature=soil_temperature, processes="passive")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(symplasmic_volume > 0,
+                            diffusion_soil * ((AA * struct_mass / symplasmic_volume) - soil_AA) * root_exchange_surface, 0.)
+
+    def _diffusion_AA_soil_xylem_vectorized(self, soil_AA, xylem_AA, radius, length, xylem_differentiation_factor, endodermis_conductance_factor, struct_mass, xylem_volume, soil_temperature):
+        diffusion_apoplasm = self.diffusion_apoplasm * self.process_temperature_modification(soil_temperature=soil_temperature, processes="passive")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(xylem_volume > 0,
+                            diffusion_apoplasm * ((xylem_AA * struct_mass / xylem_volume) - soil_AA) * 2 * np.pi * radius * length * xylem_differentiation_factor * endodermis_conductance_factor, 0.)
+
+    def _AA_synthesis_vectorized(self, struct_mass, Nm, soil_temperature, C_hexose_root):
+        smax_AA = self.smax_AA * self.process_temperature_modification(soil_temperature=soil_temperature, processes="active")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where((C_hexose_root > 0) & (Nm > 0),
+                            struct_mass * smax_AA / (((1 + self.Km_Nm_AA) / Nm) + ((1 + self.Km_C_AA) / C_hexose_root)), 0.)
+
+    def _Nm_vectorized(self, Nm, struct_mass, import_Nm, mychorizal_mediated_import_Nm, diffusion_Nm_soil, diffusion_Nm_xylem, export_Nm, AA_synthesis, AA_catabolism, nitrogenase_fixation, deficit_Nm):
+        emerged = struct_mass > 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            balance = Nm + (self.time_step / struct_mass) * (
+                    import_Nm
+                    + mychorizal_mediated_import_Nm
+                    - diffusion_Nm_soil
+                    + diffusion_Nm_xylem
+                    - export_Nm
+                    - AA_synthesis * self.r_Nm_AA
+                    + AA_catabolism / self.r_Nm_AA
+                    + nitrogenase_fixation
+                    - deficit_Nm)
+            deficit = - balance * struct_mass / self.time_step
+        if self.pool_update_solver == "semi_implicit":
+            deficit_Nm[..., emerged] = 0.
+        else:
+            deficit_Nm[..., emerged] = np.where((balance < 0.) & (deficit > 1e-20), deficit, 0.)[..., emerged]
+        return np.where(emerged, np.where(balance < 0., 0., balance), 0.)
+
+    def _AA_vectorized(self, AA, struct_mass, diffusion_AA_phloem, import_AA, diffusion_AA_soil, export_AA, AA_synthesis,
+                       struct_synthesis, storage_synthesis, storage_catabolism, AA_catabolism, deficit_AA):
+        emerged = struct_mass > 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            balance = AA + (self.time_step / struct_mass) * (
+                    diffusion_AA_phloem
+                    + import_AA
+                    - diffusion_AA_soil
+                    - export_AA
+                    + AA_synthesis
+                    - struct_synthesis
+                    - storage_synthesis * self.r_AA_stor
+                    + storage_catabolism / self.r_AA_stor
+                    - AA_catabolism
+                    - deficit_AA)
+            deficit = - balance * struct_mass / self.time_step
+        if self.pool_update_solver == "semi_implicit":
+            deficit_AA[..., emerged] = 0.
+        else:
+            deficit_AA[..., emerged] = np.where((balance < 0.) & (deficit > 1e-20), deficit, 0.)[..., emerged]
+        return np.where(emerged, np.where(balance < 0., 0., balance), 0.)
+
+    def _storage_protein_vectorized(self, storage_protein, struct_mass, storage_synthesis, storage_catabolism):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(struct_mass > 0, storage_protein + (self.time_step / struct_mass) * (storage_synthesis - storage_catabolism), 0.)
+
+    def _xylem_Nm_vectorized(self, xylem_Nm, displaced_Nm_in, displaced_Nm_out, cumulated_radial_exchanges_Nm, xylem_struct_mass):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(xylem_struct_mass > 0, xylem_Nm + (displaced_Nm_in - displaced_Nm_out + cumulated_radial_exchanges_Nm) / xylem_struct_mass, 0.)
+
+    def _xylem_AA_vectorized(self, xylem_AA, displaced_AA_in, displaced_AA_out, cumulated_radial_exchanges_AA, xylem_struct_mass):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(xylem_struct_mass > 0, xylem_AA + (displaced_AA_in - displaced_AA_out + cumulated_radial_exchanges_AA) / xylem_struct_mass, 0.)
+
+    # Compiled formulations of rates used when jit_kernels is True and numba is available, see root_cynaps.kernels
+
+    def _import_Nm_compiled(self, Nm, soil_Nm, root_exchange_surface, soil_temperature, C_hexose_root):
+        return kernels.import_Nm(Nm, soil_Nm, root_exchange_surface, C_hexose_root,
+                                 self.process_temperature_modification(soil_temperature=soil_temperature, processes="active"),
+                                 self.Km_Nm_root_LATS, self.Km_Nm_root_HATS, self.begin_N_regulation, self.span_N_regulation,
+                                 self.vmax_Nm_root, self.transport_C_regulation)
+
+    def _AA_synthesis_compiled(self, struct_mass, Nm, soil_temperature, C_hexose_root):
+        return kernels.AA_synthesis(struct_mass, Nm, C_hexose_root,
+                                    self.process_temperature_modification(soil_temperature=soil_temperature, processes="active"),
+                                    self.smax_AA, self.Km_Nm_AA, self.Km_C_AA)
+
+    def _storage_synthesis_compiled(self, struct_mass, AA, soil_temperature):
+        return kernels.storage_synthesis(struct_mass, AA, self.process_temperature_modification(soil_temperature=soil_temperature, processes="active"),
+                                         self.smax_stor, self.Km_AA_stor)
+
+    def _storage_catabolism_compiled(self, struct_mass, storage_protein, soil_temperature, C_hexose_root):
+        return kernels.catabolism(struct_mass, storage_protein, C_hexose_root,
+                                  self.process_temperature_modification(soil_temperature=soil_temperature, processes="active"),
+                                  self.cmax_stor, self.Km_stor_catab, self.storage_C_regulation)
+
+    def _AA_catabolism_compiled(self, struct_mass, AA, soil_temperature, C_hexose_root):
+        return kernels.catabolism(struct_mass, AA, C_hexose_root,
+                                  self.process_temperature_modification(soil_temperature=soil_temperature, processes="active"),
+                                  self.cmax_AA, self.Km_AA_catab, self.storage_C_regulation)
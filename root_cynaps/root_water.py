@@ -1,10 +1,12 @@
 import numpy as np
-from openalea.mtg.traversal import pre_order2
 from dataclasses import dataclass
 
 from metafspm.component import Model, declare
 from metafspm.component_factory import *
 
+from root_cynaps.topology import TopologyIndex
+from root_cynaps.property_store import take, scale
+
 
 family = "hydraulic"
 
@@ -13,6 +15,10 @@ family = "hydraulic"
 class RootWaterModel(Model):
 
     family = "hydraulic"
+    # Attributes not stored in the MTG that have to be saved by Model.checkpoint
+    checkpoint_attributes = ("collar_skip", "collar_children", "sub_steps_counts")
+    # Flows expressed per reference sub-step, see __call__
+    flows = ("radial_import_water", "axial_export_water_up", "axial_import_water_down")
 
     # --- INPUTS STATE VARIABLES FROM OTHER COMPONENTS : default values are provided if not superimposed by model coupling ---
 
@@ -80,12 +86,25 @@ class RootWaterModel(Model):
                                           min_value="", max_value="", value_comment="", references="", DOI="",
                                           variable_type="plant_scale_state", by="model_water", state_variable_type="", edit_by="user")
 
+    water_sub_steps: int = declare(default=1, unit="adim", unit_comment="", description="number of sub-steps used by the last water time step",
+                                   min_value="", max_value="", value_comment="", references="", DOI="",
+                                   variable_type="plant_scale_state", by="model_water", state_variable_type="", edit_by="user")
+
     # --- INITIALIZES MODEL PARAMETERS ---
 
     # time resolution
     sub_time_step: int = declare(default=3600, unit="s", unit_comment="", description="MUST be a multiple of base time_step", 
                                  min_value="", max_value="", value_comment="", references="", DOI="",
                                  variable_type="parameter", by="model_water", state_variable_type="", edit_by="user")
+    min_sub_steps: int = declare(default=1, unit="adim", unit_comment="", description="minimal number of sub-steps of a water time step",
+                                 min_value="1", max_value="", value_comment="", references="", DOI="",
+                                 variable_type="parameter", by="model_water", state_variable_type="", edit_by="user")
+    max_sub_steps: int = declare(default=10, unit="adim", unit_comment="", description="maximal number of sub-steps of a water time step, setting min_sub_steps to the same value gives fixed sub-steps",
+                                 min_value="1", max_value="", value_comment="", references="", DOI="",
+                                 variable_type="parameter", by="model_water", state_variable_type="", edit_by="user")
+    max_xylem_water_change: float = declare(default=0.01, unit="adim", unit_comment="of total xylem water", description="maximal relative change of xylem water content expected within a sub-step",
+                                            min_value="", max_value="", value_comment="", references="", DOI="",
+                                            variable_type="parameter", by="model_water", state_variable_type="", edit_by="user")
 
     # Water properties
     water_molar_mass: float = declare(default=18, unit="g.mol-1", unit_comment="", description="", 
@@ -134,8 +153,25 @@ class RootWaterModel(Model):
         self.apply_scenario(**scenario)
         self.link_self_to_mtg()
 
+        self.topology = TopologyIndex(self.g)
+        # Number of time steps performed with each number of sub-steps
+        self.sub_steps_counts = {}
+
+    def post_restore_updating(self):
+        """
+        Description :
+            Updates the structures derived from the MTG after a checkpoint has been restored into it
+        """
+        self.vertices = self.g.vertices(scale=self.g.max_scale())
+        self.topology.update(self.vertices, force=True)
+        self.update_active_vertices()
+        self.build_flow_levels()
+        self.update_geometry()
+
     def post_coupling_init(self):
         self.pull_available_inputs()
+        self.update_active_vertices()
+        self.update_geometry()
         
         # Must be performed after so that self state variables are indeed dicts
         self.init_xylem_water()
@@ -149,53 +185,202 @@ class RootWaterModel(Model):
             if (self.struct_mass[vid] == 0) and (True in [self.struct_mass[k] > 0 for k in child]):
                 self.collar_skip += [vid]
                 self.collar_children += [k for k in self.g.children(vid) if self.struct_mass[k] > 0]
-        
+
+        self.build_flow_levels()
+
+    def update_active_vertices(self):
+        """
+        Description :
+            Lists the emerged vertices, i.e. with a positive structural mass, which are the only ones exchanging water radially.
+        """
+        self.active_vertices = [vid for vid in self.vertices if self.struct_mass[vid] > 0]
+
+    def build_flow_levels(self):
+        """
+        Description :
+            Precomputes from the topology index the rows through which the axial down flow is partitioned.
+            Each row receives its axial upper flow from its "flow parent", which is its MTG parent, except for collar children which
+            receive it from the collar and for children of skipped collar vertices which receive nothing.
+            Rows are then grouped by depth along these flow relations for a level-by-level sweep from collar to tips,
+            each level storing the rows fed by their flow parent and the non-skipped rows for which a down flow is computed.
+        """
+        topology = self.topology
+        n = len(topology.vids)
+
+        skipped = np.zeros(n, dtype=bool)
+        skipped[topology.rows([vid for vid in self.collar_skip if vid in topology.row])] = True
+
+        self.collar_row = topology.row.get(1, -1)
+        self.flow_parent = topology.parent.copy()
+        has_parent = self.flow_parent >= 0
+        self.flow_parent[has_parent & skipped[np.maximum(topology.parent, 0)]] = -1
+        self.collar_fed = np.zeros(n, dtype=bool)
+        if self.collar_row >= 0 and not skipped[self.collar_row] and topology.children_count[self.collar_row] == 1 and len(self.collar_children) > 0:
+            # Collar flow is partitioned among collar children rather than transmitted to its only child
+            self.flow_parent[topology.children[topology.children_start[self.collar_row]]] = -1
+            self.collar_fed[topology.rows(self.collar_children)] = True
+            self.flow_parent[self.collar_fed] = self.collar_row
+
+        # Flow parents are met before their children in pre-order
+        flow_depth = np.zeros(n, dtype=int)
+        for r in np.flatnonzero(self.flow_parent >= 0).tolist():
+            flow_depth[r] = flow_depth[self.flow_parent[r]] + 1
+        swept = np.argsort(flow_depth, kind="stable")
+        self.flow_levels = [(level[self.flow_parent[level] >= 0], level[~skipped[level]])
+                            for level in np.split(swept, np.flatnonzero(np.diff(flow_depth[swept])) + 1)]
+        # Flow fractions have to be computed again for the new flow relations
+        self.flow_fractions = None
+
+    def update_flow_fractions(self):
+        """
+        Description :
+            Fraction of the axial down flow of its flow parent received by each row. If there are several children, the down flow is partitioned
+            according to Hagen-Poiseuille's law (same as collar), otherwise the only child receives all of it.
+            As radii only change with growth and anatomy updates, fractions are only computed again if a radius changed since the last computation,
+            or if flow levels have been rebuilt.
+        """
+        topology = self.topology
+        radius = topology.gather(self.radius)
+        if self.flow_fractions is not None and np.array_equal(radius, self.flow_fractions_radius):
+            return
+
+        HP = np.pi * (radius ** 4) / (8 * self.sap_viscosity)
+        flow_parent = np.maximum(self.flow_parent, 0)
+        fraction = np.ones(len(topology.vids))
+        several_children = (self.flow_parent >= 0) & (topology.children_count[flow_parent] > 1) & ~self.collar_fed
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fraction[several_children] = HP[several_children] / topology.children_sum(HP)[flow_parent[several_children]]
+            if self.collar_fed.any():
+                fraction[self.collar_fed] = HP[self.collar_fed] / HP[self.collar_fed].sum()
+
+        self.flow_fractions = fraction
+        self.flow_fractions_radius = radius
+
+    def update_geometry(self):
+        """
+        Description :
+            Water content of the root system xylem at rest, i.e. without pressure deformation, from segments' mean radius and total length.
+            These only change upon growth, so they are summed once after each growth update instead of at each water transport computation.
+        """
+        mean_radius = np.fromiter(self.radius.values(), dtype=float, count=len(self.radius)).mean()
+        total_length = np.fromiter(self.length.values(), dtype=float, count=len(self.length)).sum()
+        self.xylem_water_at_rest = np.pi * (mean_radius ** 2) * total_length * self.xylem_cross_area_ratio * self.water_volumic_mass / self.water_molar_mass
+
     def init_xylem_water(self):
         # At pressure = soil_pressure, the corresponding xylem volume at rest is
         # filled with water in standard conditions
 
         # We compute the total water amount from the formula used for pressure calculation
-        self.total_xylem_water[1] = ((((self.xylem_total_pressure[1] - np.mean(list(self.soil_water_pressure.values()))) / self.xylem_young_modulus) + 1) ** 2) * (
-                np.pi * (np.mean(list(self.radius.values())) ** 2) * sum(self.length.values()) * self.xylem_cross_area_ratio * self.water_volumic_mass) / self.water_molar_mass
+        self.total_xylem_water[1] = ((((self.xylem_total_pressure[1] - np.mean(list(self.soil_water_pressure.values()))) / self.xylem_young_modulus) + 1) ** 2) * self.xylem_water_at_rest
 
         sum_volume = sum(self.xylem_volume.values())
 
-        for vid in self.vertices:
-            # if root segment emerged
-            if self.struct_mass[vid] > 0:
-                self.xylem_water[vid] = self.total_xylem_water[1] * self.xylem_volume[vid] / sum_volume
+        for vid in self.active_vertices:
+            self.xylem_water[vid] = self.total_xylem_water[1] * self.xylem_volume[vid] / sum_volume
 
-    def post_growth_updating(self):
+    def post_growth_updating(self, new_vertices=None):
         """
         Description :
             Extend property dictionnary uppon new element partionning and updates concentrations uppon structural_mass change
+
+        :param new_vertices: ids of the vertices created by growth since last update, in creation order, if reported by the growth component.
+            Otherwise, new vertices are those missing from the state dictionaries.
         """
         self.vertices = self.g.vertices(scale=self.g.max_scale())
-        for vid in self.vertices:
-            if vid not in list(self.xylem_water.keys()):
-                parent = self.g.parent(vid)
-                mass_fraction = self.struct_mass[vid] / (self.struct_mass[vid] + self.struct_mass[parent])
-                for prop in self.state_variables:
-                    # if intensive, equals to parent
-                    if self.__dataclass_fields__[prop].metadata["state_variable_type"] == "intensive":
-                        getattr(self, prop).update({vid: getattr(self, prop)[parent]})
-                    # if extensive, we need structural mass wise partitioning
-                    else:
-                        getattr(self, prop).update({vid: getattr(self, prop)[parent] * mass_fraction,
-                                                    parent: getattr(self, prop)[parent] * (1 - mass_fraction)})
+        if new_vertices is None:
+            new_vertices = [vid for vid in self.vertices if vid not in self.xylem_water]
+        intensive = [getattr(self, prop) for prop in self.state_variables if self.__dataclass_fields__[prop].metadata["state_variable_type"] == "intensive"]
+        extensive = [getattr(self, prop) for prop in self.state_variables if self.__dataclass_fields__[prop].metadata["state_variable_type"] != "intensive"]
+        for vid in new_vertices:
+            parent = self.g.parent(vid)
+            mass_fraction = self.struct_mass[vid] / (self.struct_mass[vid] + self.struct_mass[parent])
+            # if intensive, equals to parent
+            for prop in intensive:
+                prop[vid] = prop[parent]
+            # if extensive, we need structural mass wise partitioning
+            for prop in extensive:
+                prop[vid] = prop[parent] * mass_fraction
+                prop[parent] *= 1 - mass_fraction
+
+        # Root dimensions have changed with growth
+        self.update_active_vertices()
+        self.update_geometry()
     
+    def __call__(self, *args):
+        """
+        Description :
+            Performs the water time step as a number of sub-steps chosen by sub_steps, each computed with time_step divided accordingly.
+            Flows are always expressed per reference sub-step, time_step / max_sub_steps, so that coupled components receive
+            comparable amounts whatever the number of sub-steps used.
+        """
+        self.pull_available_inputs()
+        # Radii may have changed with growth or anatomy updates since the last time step
+        if self.flow_fractions is not None:
+            self.update_flow_fractions()
+        n = self.sub_steps()
+        time_step = self.time_step
+        # Flows kept from previous time step, e.g. in skipped segments, are converted from the reference sub-step to the sub-step duration
+        # (time_step / n being max_sub_steps / n times longer) and back afterwards
+        scale = n / self.max_sub_steps
+        self.scale_flows(1 / scale)
+        self.time_step = time_step / n
+        try:
+            for _ in range(n):
+                super().__call__(*args)
+        finally:
+            self.time_step = time_step
+        self.scale_flows(scale)
+
+        self.water_sub_steps[1] = n
+        self.sub_steps_counts[n] = self.sub_steps_counts.get(n, 0) + 1
+
+    def sub_steps(self):
+        """
+        Description :
+            Number of sub-steps needed by the coming time step, bounded by min_sub_steps and max_sub_steps. Within a sub-step:
+            - accuracy: the xylem water change expected from current pressure and transpiration mustn't exceed max_xylem_water_change of the xylem water,
+            - stability: the pressure feedback on radial import, explicitly computed from the previous sub-step, mustn't overshoot the equilibrium.
+        """
+        active = self.active_vertices
+        conductance = (self.apoplasmic_water_conductivity * take(self.apoplasmic_exchange_surface, active)
+                       + self.cortex_water_conductivity * take(self.cortex_exchange_surface, active))
+        soil_water_pressure = take(self.soil_water_pressure, active)
+        total_xylem_water = self.total_xylem_water[1]
+        if total_xylem_water <= 0. or self.xylem_water_at_rest <= 0.:
+            return self.max_sub_steps
+
+        water_change = abs((conductance * (soil_water_pressure - self.xylem_total_pressure[1])).sum() - self.water_root_shoot_xylem[1]) * self.time_step
+        accuracy = water_change / (self.max_xylem_water_change * total_xylem_water)
+        # Derivative of radial import with xylem water, through the pressure computation of transport_water
+        stiffness = conductance.sum() * self.xylem_young_modulus / (2 * np.sqrt(total_xylem_water * self.xylem_water_at_rest))
+        stability = stiffness * self.time_step
+
+        return int(min(max(np.ceil(max(accuracy, stability)), self.min_sub_steps), self.max_sub_steps))
+
+    def scale_flows(self, factor):
+        if factor != 1.:
+            for name in self.flows:
+                scale(getattr(self, name), factor)
+
+    def sub_stepping_statistics(self):
+        """
+        :return: dict with the number of time steps performed and the mean, minimal and maximal number of sub-steps they used
+        """
+        counts = self.sub_steps_counts
+        time_steps = sum(counts.values())
+        if time_steps == 0:
+            return dict(time_steps=0, sub_steps=0, mean=None, min=None, max=None)
+        sub_steps = sum(n * count for n, count in counts.items())
+        return dict(time_steps=time_steps, sub_steps=sub_steps, mean=sub_steps / time_steps, min=min(counts), max=max(counts))
+
     @state
     def transport_water(self):
         # Using previous time-step flows, we compute current time-step pressure for flows computation
 
         # Compute the minimal water content for current dimensions under which we would have shearing and cavitation processes
-        tearing_total_xylem_water = (((- self.xylem_tear / self.xylem_young_modulus) + 1) ** 2) * (
-                  np.pi * (np.mean(list(self.radius.values())) ** 2) * sum(
-              self.length.values()) * self.xylem_cross_area_ratio * self.water_volumic_mass) / self.water_molar_mass
+        tearing_total_xylem_water = (((- self.xylem_tear / self.xylem_young_modulus) + 1) ** 2) * self.xylem_water_at_rest
         # We compute a target equilibrium water content that will be converged when no transpiration disturbance occur.
-        flux_inversion_xylem_water = (((+ 0. / self.xylem_young_modulus) + 1) ** 2) * (
-                  np.pi * (np.mean(list(self.radius.values())) ** 2) * sum(
-              self.length.values()) * self.xylem_cross_area_ratio * self.water_volumic_mass) / self.water_molar_mass
+        flux_inversion_xylem_water = (((+ 0. / self.xylem_young_modulus) + 1) ** 2) * self.xylem_water_at_rest
 
         # we set collar element the flow provided by shoot model
         potential_transpiration = self.water_root_shoot_xylem[1] * self.time_step
@@ -204,23 +389,22 @@ class RootWaterModel(Model):
 
         sum_volume = sum(self.xylem_volume.values())
         # Loop computing individual segments' water exchange
-        for vid in self.vertices:
-            if self.struct_mass[vid] > 0:
-                # radial exchanges are only hydrostatic-driven for now
-                apoplastic_water_import = self.apoplasmic_water_conductivity * (self.soil_water_pressure[vid] - self.xylem_total_pressure[1]) * self.apoplasmic_exchange_surface[vid]
+        for vid in self.active_vertices:
+            # radial exchanges are only hydrostatic-driven for now
+            apoplastic_water_import = self.apoplasmic_water_conductivity * (self.soil_water_pressure[vid] - self.xylem_total_pressure[1]) * self.apoplasmic_exchange_surface[vid]
 
-                cross_membrane_water_import = self.cortex_water_conductivity * (self.soil_water_pressure[vid] - self.xylem_total_pressure[1]) * self.cortex_exchange_surface[vid]
+            cross_membrane_water_import = self.cortex_water_conductivity * (self.soil_water_pressure[vid] - self.xylem_total_pressure[1]) * self.cortex_exchange_surface[vid]
 
-                self.radial_import_water[vid] = (apoplastic_water_import + cross_membrane_water_import) * self.time_step
+            self.radial_import_water[vid] = (apoplastic_water_import + cross_membrane_water_import) * self.time_step
 
-                # We also take advantage of this loop to compute the local water content to prevent another for loop over mtg
-                self.xylem_water[vid] = self.total_xylem_water[1] * self.xylem_volume[vid] / sum_volume
+            # We also take advantage of this loop to compute the local water content to prevent another for loop over mtg
+            self.xylem_water[vid] = self.total_xylem_water[1] * self.xylem_volume[vid] / sum_volume
 
         total_radial_import_water = sum(self.radial_import_water.values())
 
         # From potential transpiration and water import fluxes, we compute the actual transpiration if potential is too high
         if self.total_xylem_water[1] - potential_transpiration + total_radial_import_water < tearing_total_xylem_water:
-            self.axial_export_water_up[1] = max(0., self.total_xylem_water[1] - tearing_total_xylem_water + sum(self.radial_import_water.values()))
+            self.axial_export_water_up[1] = max(0., self.total_xylem_water[1] - tearing_total_xylem_water + total_radial_import_water)
             print(f"\n[Warning] Artificially restraining transpiration at {round(100*self.axial_export_water_up[1]/potential_transpiration, 2)} %")
         else:
             self.axial_export_water_up[1] = potential_transpiration
@@ -229,77 +413,58 @@ class RootWaterModel(Model):
         # to avoid this behavior that is possible with such a discrete model, we converge towards the above precomputed equilibrium
         if total_radial_import_water > 0. and self.total_xylem_water[1] - self.axial_export_water_up[1] + total_radial_import_water > flux_inversion_xylem_water:
             excess_import_water = self.total_xylem_water[1] - potential_transpiration + total_radial_import_water - flux_inversion_xylem_water
-            for vid in self.vertices:
+            # Non emerged vertices don't import water
+            for vid in self.active_vertices:
                 self.radial_import_water[vid] -= excess_import_water * self.radial_import_water[vid] / total_radial_import_water
             total_radial_import_water = sum(self.radial_import_water.values())
 
         total_delta_water = total_radial_import_water - self.axial_export_water_up[1]
                 
         # Finally we compute the axial result of these transpiration fluxes and radial uptake
-        # We define "root" as the starting point of the loop below:
-        root_gen = self.g.component_roots_at_scale_iter(self.g.root, scale=1)
-        root = next(root_gen)
-
-        # We travel in the MTG from the root collar to the tips:
-        for vid in pre_order2(self.g, root):
-            # We apply the following for all structural mass, because null length element can be support for
-            # ramification
-
-            child = self.g.children(vid)
-
-            # if we look at a collar artificial vertex of null lenght, we do nothing
-            if vid not in self.collar_skip:
-
-                # We suppose the xylem depletion or filling is evenly reparted during the time step
-                delta_water = total_delta_water * self.xylem_water[vid] / self.total_xylem_water[1]
-
-                # For current vertex, compute axial down flow from axial upper flow, radial flow and volume at considered pressure
-                # There is no pressure variation effect as water is incompressible
-
-                # If this is a root tip or a non-emerged root segment, there is no down import
-                if (vid != 1) and ((len(child) == 0) or (True not in [self.struct_mass[k] > 0 for k in child])):
-                    self.axial_import_water_down[vid] = 0
-
-                # if there are children, there is a down import flux
-                else:
-                    self.axial_import_water_down[vid] = delta_water - self.radial_import_water[vid] + self.axial_export_water_up[vid]
-
-                # For reference, balance between flows is :
-                # delta_water = self.radial_import_water[vid] - self.axial_export_water_up[vid] + self.axial_import_water_down[vid]
-
-                # For current vertex's children, provide previous down flow as axial upper flow for children
-                if len(child) == 1:
-                    # if current vertex is collar, we affect down flow at previously computed collar children
-                    if vid == 1 and len(self.collar_children) > 0:
-                        HP = [0 for k in self.collar_children]
-                        for k in range(len(self.collar_children)):
-                            # compute Hagen-Poiseuille coefficient
-                            HP[k] = np.pi * (self.radius[self.collar_children[k]]**4) / (8 * self.sap_viscosity)
-                        HP_tot = sum(HP)
-                        for k in range(len(self.collar_children)):
-                            self.axial_export_water_up[self.collar_children[k]] = (HP[k] / HP_tot) * self.axial_import_water_down[vid]
-                    # else, if there is only one child, the entire flux is applied
-                    else:
-                        self.axial_export_water_up[child[0]] = self.axial_import_water_down[vid]
-
-                # finally, if there are several children, a fraction of the flux is applied
-                # according to Hagen-Poiseuille's law (same as collar)
-                else:
-                    HP = [0 for k in child]
-                    for k in range(len(child)):
-                        # compute Hagen-Poiseuille coefficient
-                        HP[k] = np.pi * (self.radius[child[k]]**4) / (8 * self.sap_viscosity)
-
-                    HP_tot = sum(HP)
-                    for k in range(len(child)):
-                        self.axial_export_water_up[child[k]] = (HP[k] / HP_tot) * self.axial_import_water_down[vid]
+        # The topology index is only rebuilt if growth modified the MTG
+        if self.topology.update(self.vertices):
+            self.build_flow_levels()
+        self.partition_axial_flows(total_delta_water)
 
         # Computed here as it is required by pressure computations
         self.total_xylem_water[1] += total_delta_water
 
         # Finally, we assume pressure homogeneity and compute the resulting pressure for the next time_step
         self.xylem_total_pressure[1] = self.xylem_young_modulus * (
-                    (((self.total_xylem_water[1] * self.water_molar_mass) / (
-                        np.pi * (np.mean(list(self.radius.values())) ** 2) * sum(self.length.values()) *
-                            self.xylem_cross_area_ratio * self.water_volumic_mass)) ** 0.5) - 1) + np.mean(
+                    ((self.total_xylem_water[1] / self.xylem_water_at_rest) ** 0.5) - 1) + np.mean(
                             list(self.soil_water_pressure.values()))
+
+    def partition_axial_flows(self, total_delta_water):
+        """
+        Description :
+            Computes the axial down flow of each segment from its axial upper flow, radial flow and volume,
+            and transmits it as the axial upper flow of its children, from the collar to the tips.
+            Flows are swept level by level on the topology index arrays, all segments of a level being computed at once.
+        """
+        topology = self.topology
+        struct_mass = topology.gather(self.struct_mass)
+        axial_export_water_up = topology.gather(self.axial_export_water_up)
+        axial_import_water_down = topology.gather(self.axial_import_water_down)
+
+        # We suppose the xylem depletion or filling is evenly reparted during the time step
+        # For reference, balance between flows is :
+        # delta_water = radial_import_water - axial_export_water_up + axial_import_water_down
+        delta_water = total_delta_water * topology.gather(self.xylem_water) / self.total_xylem_water[1]
+        radial_balance = delta_water - topology.gather(self.radial_import_water)
+
+        # If this is a root tip or a non-emerged root segment, there is no down import, except for the collar
+        no_down_import = topology.children_sum((struct_mass > 0).astype(float)) == 0
+        if self.collar_row >= 0:
+            no_down_import[self.collar_row] = False
+
+        # Hagen-Poiseuille partition of down flows, kept from previous sub-steps if neither radii nor topology changed
+        if self.flow_fractions is None:
+            self.update_flow_fractions()
+        fraction = self.flow_fractions
+
+        for fed, computed in self.flow_levels:
+            axial_export_water_up[fed] = fraction[fed] * axial_import_water_down[self.flow_parent[fed]]
+            axial_import_water_down[computed] = np.where(no_down_import[computed], 0., radial_balance[computed] + axial_export_water_up[computed])
+
+        topology.scatter(self.axial_export_water_up, axial_export_water_up)
+        topology.scatter(self.axial_import_water_down, axial_import_water_down)
@@ -2,7 +2,9 @@
 import pickle
 import os
 import shutil
+import numpy as np
 import xarray as xr
+import netCDF4
 from dataclasses import asdict
 import matplotlib.pyplot as plt
 from matplotlib.widgets import Slider
@@ -12,13 +14,104 @@ from time import time
 from root_cynaps.root_cynaps import Model
 
 from root_cynaps.output_properties import state_extracts, flow_extracts, global_state_extracts, global_flow_extracts
-from tools.mtg_dict_to_xarray import mtg_to_dataset
+from root_cynaps.property_views import PropertyViews, RingBufferLogger
 
 from statistical_tools.main import launch_analysis
 
 '''FUNCTIONS'''
 
 
+class NetCDFTimeWriter:
+    """
+    Appends logged time steps to a single NetCDF file along unlimited time and vertex dimensions.
+    Outputs are streamed to disk as the simulation runs, without intermediate files to merge and reload afterwards.
+    Vertices of each batch are matched with those already written, new ones being appended to the vertex dimension,
+    and float values of vertices absent from a batch are left as NaN, like the outer join of the former merge of files.
+    Scenario values are stored as size 1 leading dimensions of all time-dependent variables, booleans being stored as int8.
+    """
+
+    def __init__(self, file_path, time_dim="t", vertex_dim="vid", scenario=None):
+        self.file_path = file_path
+        self.time_dim = time_dim
+        self.vertex_dim = vertex_dim
+        self.scenario = scenario if scenario is not None else {}
+        self.nc = None
+        self.size = 0
+        self.positions = {}
+
+    @staticmethod
+    def storage_dtype(dtype):
+        if dtype == object:
+            return str
+        if dtype == bool:
+            return np.int8
+        return dtype
+
+    def create(self, dataset):
+        self.nc = netCDF4.Dataset(self.file_path, "w")
+        for key, value in self.scenario.items():
+            value = np.asarray([value])
+            self.nc.createDimension(key, 1)
+            self.nc.createVariable(key, self.storage_dtype(value.dtype), (key,))[:] = value.astype(self.storage_dtype(value.dtype))
+        for dim, size in dataset.sizes.items():
+            self.nc.createDimension(dim, None if dim in (self.time_dim, self.vertex_dim) else size)
+        for name, variable in dataset.variables.items():
+            dims = variable.dims
+            if self.time_dim in dims and name not in dataset.coords:
+                dims = tuple(self.scenario) + dims
+            dtype = self.storage_dtype(variable.dtype)
+            fill_value = np.nan if dtype is not str and np.issubdtype(dtype, np.floating) else None
+            nc_variable = self.nc.createVariable(name, dtype, dims, fill_value=fill_value)
+            nc_variable.setncatts({key: str(value) for key, value in variable.attrs.items()})
+            # Variables independent of time and vertices are only written once
+            if self.time_dim not in dims and self.vertex_dim not in dims:
+                nc_variable[:] = variable.values
+
+    def vertex_index(self, vids):
+        """
+        Positions of the provided vertices in the vertex dimension of the file, appending the new ones
+
+        :return: index of these positions, and the order in which the batch values have to be written along the vertex dimension
+        """
+        new_vids = [vid for vid in vids.tolist() if vid not in self.positions]
+        if len(new_vids) > 0:
+            start = len(self.positions)
+            self.positions.update(zip(new_vids, range(start, start + len(new_vids))))
+            self.nc.variables[self.vertex_dim][start:start + len(new_vids)] = np.array(new_vids)
+        positions = np.fromiter((self.positions[vid] for vid in vids.tolist()), dtype=int, count=len(vids))
+        if len(positions) > 0 and np.array_equal(positions, np.arange(positions[0], positions[0] + len(positions))):
+            return slice(positions[0], positions[0] + len(positions)), slice(None)
+        order = np.argsort(positions)
+        return positions[order], order
+
+    def append(self, datasets):
+        """
+        Writes the provided list of time step datasets at the end of the file
+        """
+        dataset = xr.concat(datasets, dim=self.time_dim)
+        if self.nc is None:
+            self.create(dataset)
+        steps = dataset.sizes[self.time_dim]
+        vertex_index, vertex_order = self.vertex_index(dataset[self.vertex_dim].values) if self.vertex_dim in dataset.coords else (None, None)
+        for name, variable in dataset.variables.items():
+            if name == self.vertex_dim or (self.time_dim not in variable.dims and self.vertex_dim not in variable.dims):
+                continue
+            nc_variable = self.nc.variables[name]
+            values = variable.values
+            if self.vertex_dim in variable.dims and isinstance(vertex_order, np.ndarray):
+                values = np.take(values, vertex_order, axis=variable.dims.index(self.vertex_dim))
+            index = tuple(0 if dim in self.scenario else slice(self.size, self.size + steps) if dim == self.time_dim
+                          else vertex_index if dim == self.vertex_dim else slice(None)
+                          for dim in nc_variable.dimensions)
+            nc_variable[index] = values.astype(np.int8) if values.dtype == bool else values
+        self.size += steps
+        self.nc.sync()
+
+    def close(self):
+        if self.nc is not None:
+            self.nc.close()
+
+
 def N_simulation(z_soil_Nm_max, output_path, current_file_dir, init, steps_number, time_step, echo=False,
                  plotting_2D=True, plotting_STM=False, logging=False, max_time_steps_for_memory=100, **kwargs):
 
@@ -61,7 +154,10 @@ def N_simulation(z_soil_Nm_max, output_path, current_file_dir, init, steps_numbe
     # Init output xarray list
     if logging:
         os.mkdir(output_path[:-3])
-        time_xrs = [mtg_to_dataset(g, variables=log_outputs, time=0)]
+        # Time steps are buffered and appended to the output file every max_time_steps_for_memory steps
+        writer = NetCDFTimeWriter(output_path[:-3] + '/merged.nc', time_dim="t", scenario=scenario)
+        logger = RingBufferLogger(PropertyViews(g, variables=log_outputs), writer, capacity=max_time_steps_for_memory, time_dim="t")
+        logger.snapshot(time=0)
         # xarray_output[0].to_netcdf(output_path + f"/xarray_used_input_{start_time}.nc")
 
     # Scheduler : actual computation loop
@@ -73,34 +169,15 @@ def N_simulation(z_soil_Nm_max, output_path, current_file_dir, init, steps_numbe
             print("time step : {}h".format(i))
 
         if logging:
-            # we build a list of xarray at each time_step as it more efficient than concatenation at each time step
-            time_xrs += [mtg_to_dataset(g, variables=log_outputs, time=i+1)]
-            if len(time_xrs) >= max_time_steps_for_memory:
-                interstitial_dataset = xr.concat(time_xrs, dim="t")
-                interstitial_dataset.to_netcdf(output_path[:-3] + f'/t={i+1}.nc')
-                del interstitial_dataset
-                del time_xrs
-                time_xrs = []
+            # Only the properties which changed since the previous step are copied into the preallocated buffers
+            logger.snapshot(time=i+1)
 
     if logging:
-        if len(time_xrs) > 0:
-            interstitial_dataset = xr.concat(time_xrs, dim="t")
-            interstitial_dataset.to_netcdf(output_path[:-3] + f'/tf.nc')
-            del interstitial_dataset
-            del time_xrs
-
-        # SAVING and merging
-        # NOTE : merging is slower but way less space is needed
-        time_step_files = [output_path[:-3] + '/' + name for name in os.listdir(output_path[:-3])]
-        time_dataset = xr.open_mfdataset(time_step_files)
-        time_dataset = time_dataset.assign_coords(coords=scenario).expand_dims(dim=dict(zip(list(scenario.keys()), [1 for k in scenario])))
-        time_dataset.to_netcdf(output_path[:-3] + '/merged.nc')
-        del time_dataset
-        for file in os.listdir(output_path[:-3]):
-            if '.nc' in file and file != "merged.nc":
-                os.remove(output_path[:-3] + '/' + file)
-
-        time_dataset = xr.load_dataset(output_path[:-3] + '/merged.nc')
+        logger.flush()
+        writer.close()
+
+        # Outputs are lazily read from disk by the analyses
+        time_dataset = xr.open_dataset(output_path[:-3] + '/merged.nc')
         # Launching outputs analyses
         launch_analysis(dataset=time_dataset, mtg=g, output_dir=output_path[:-3],
                         global_state_extracts=global_state_extracts, global_flow_extracts=global_flow_extracts,
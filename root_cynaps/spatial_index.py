@@ -0,0 +1,117 @@
+"""
+root_cynaps.spatial_index
+_________________________
+KD-tree of the positions of MTG vertices, for nearest vertex and radius queries in picking, soil voxel assignment and analysis scripts.
+
+The tree is built with scipy when it is installed. Otherwise queries are computed on the coordinates array with NumPy.
+"""
+
+# Imports
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+
+class SpatialIndex:
+    """
+    Positions of the vertices having x2, y2, z2 coordinates, i.e. the ends of root segments,
+    or the middles of segments with points='middle' when their starts x1, y1, z1 are available (the end being used otherwise).
+    The index is rebuilt on the next query after vertices have been added or moved, e.g. by growth elongating apexes,
+    which is detected from the number of vertices and the sums of their coordinates.
+    """
+
+    def __init__(self, g, points="end"):
+        if points not in ("end", "middle"):
+            raise ValueError(f"Unknown points {points}, expected 'end' or 'middle'")
+        self.g = g
+        self.points = points
+        self.fingerprint = None
+
+    def invalidate(self):
+        self.fingerprint = None
+
+    def __getstate__(self):
+        # The tree is not saved with the MTG, e.g. in checkpoints, being rebuilt on the next query
+        return dict(g=self.g, points=self.points, fingerprint=None)
+
+    def coordinates_fingerprint(self):
+        """
+        Number of positioned vertices and sums of their coordinates, which is much cheaper to compute than the tree
+        """
+        props = self.g.properties()
+        names = ("x2", "y2", "z2", "x1", "y1", "z1") if self.points == "middle" else ("x2", "y2", "z2")
+        coordinates = [props.get(name, {}) for name in names]
+        return (len(coordinates[0]),) + tuple(float(np.fromiter(values.values(), dtype=float, count=len(values)).sum()) for values in coordinates)
+
+    def refresh(self):
+        """
+        Builds the index again if positioned vertices have been added or moved since the last build
+        """
+        if self.fingerprint != self.coordinates_fingerprint():
+            self.build()
+
+    def build(self):
+        props = self.g.properties()
+        x2, y2, z2 = (props.get(name, {}) for name in ("x2", "y2", "z2"))
+        vids = [vid for vid in x2 if vid in y2 and vid in z2]
+        coordinates = np.array([(x2[vid], y2[vid], z2[vid]) for vid in vids], dtype=float).reshape(-1, 3)
+        if self.points == "middle":
+            x1, y1, z1 = (props.get(name, {}) for name in ("x1", "y1", "z1"))
+            for k, vid in enumerate(vids):
+                if vid in x1 and vid in y1 and vid in z1:
+                    coordinates[k] = (coordinates[k] + (x1[vid], y1[vid], z1[vid])) / 2
+
+        self.vids = np.array(vids, dtype=int)
+        self.coordinates = coordinates
+        self.tree = cKDTree(coordinates) if cKDTree is not None and len(vids) > 0 else None
+        self.fingerprint = self.coordinates_fingerprint()
+
+    def nearest_vertices(self, points):
+        """
+        :param points: (n, 3) array of positions
+        :return: arrays of the nearest vertex of each point and of its distance
+        """
+        self.refresh()
+        points = np.asarray(points, dtype=float).reshape(-1, 3)
+        if len(self.vids) == 0:
+            raise ValueError("No vertex with x2, y2, z2 coordinates to search")
+        if self.tree is not None:
+            distances, rows = self.tree.query(points)
+        else:
+            squared = ((points[:, np.newaxis, :] - self.coordinates[np.newaxis, :, :]) ** 2).sum(axis=2)
+            rows = squared.argmin(axis=1)
+            distances = np.sqrt(squared[np.arange(len(points)), rows])
+        return self.vids[rows], distances
+
+    def nearest(self, point):
+        """
+        :return: the vertex nearest to point and its distance
+        """
+        vids, distances = self.nearest_vertices([point])
+        return int(vids[0]), float(distances[0])
+
+    def within(self, point, radius):
+        """
+        :return: list of the vertices within radius of point, sorted by distance
+        """
+        self.refresh()
+        point = np.asarray(point, dtype=float)
+        if self.tree is not None:
+            rows = np.array(self.tree.query_ball_point(point, radius), dtype=int)
+        else:
+            rows = np.flatnonzero(((self.coordinates - point) ** 2).sum(axis=1) <= radius ** 2)
+        distances = np.sqrt(((self.coordinates[rows] - point) ** 2).sum(axis=1))
+        return self.vids[rows[np.argsort(distances, kind="stable")]].tolist()
+
+
+def spatial_index(g, points="end"):
+    """
+    SpatialIndex attached to the MTG, created on first use and shared by all the callers of the same points
+    """
+    indices = g.__dict__.setdefault("_spatial_indices", {})
+    if points not in indices:
+        indices[points] = SpatialIndex(g, points=points)
+    return indices[points]
@@ -13,6 +13,8 @@
 # TODO: add functions from making_graph.py and video.py
 
 import os
+import shutil
+import hashlib
 from decimal import Decimal
 from math import pi, cos, sin, floor
 import numpy as np
@@ -29,12 +31,14 @@ import openalea.plantgl.all as pgl
 # TODO: see if this function should stay in tools, or move to simulations/run_rhizodep.py
 
 def formatted_inputs(original_input_file="None", final_input_file='updated_input_file.csv', original_time_step_in_days=1 / 24., final_time_step_in_days=1.,
-                     simulation_period_in_days=60., do_not_execute_if_file_with_suitable_size_exists=False):
+                     simulation_period_in_days=60., do_not_execute_if_file_with_suitable_size_exists=False, cache_dirpath=None):
     """
     This function creates a new input file containing data on soil temperature and sucrose input rate (in mol of sucrose per second),
     based on an original file. The new file is adapted to the required time step (higher, equal or lower than the original time step).
     If the option 'do_not_execute_if_file_with_suitable_size_exists' is set to True, a new file will be created only if the already-
     existing 'input_file.csv' does not contain the correct number of lines.
+    If a 'cache_dirpath' is given, the resampled table is stored there under a hash of the content of the original file and of the time steps,
+    so that scenarios sharing the same forcing reuse it instead of resampling it again (no cache by default, so that nothing is written out of final_input_file).
     """
 
     # If there is a file where the inputs of sucrose in the root system have to be read:
@@ -42,8 +46,6 @@ def formatted_inputs(original_input_file="None", final_input_file='updated_input
 
         # We first define the path and the file to read as a .csv:
         PATH1 = os.path.join('.', original_input_file)
-        # Then we read the file and copy it in a dataframe "df":
-        df = pd.read_csv(PATH1, sep=',', header=0)
 
         # simulation_period_in_days = df['time_in_days'].max()-df['time_in_days'].min()
         n_steps = int(floor(simulation_period_in_days / final_time_step_in_days)) + 1
@@ -57,6 +59,20 @@ def formatted_inputs(original_input_file="None", final_input_file='updated_input
                       "we therefore did not create a new input file here (if you wish to do so, please select 'do_not_execute_if_file_with_suitable_size_exists=False').")
                 return previous_file
 
+        # We look for a table already resampled from the same file content with the same time steps:
+        if cache_dirpath is not None:
+            with open(PATH1, 'rb') as f:
+                key = hashlib.sha1(f.read() + repr((original_time_step_in_days, final_time_step_in_days, n_steps)).encode()).hexdigest()
+            cache_path = os.path.join(cache_dirpath, key + '.csv')
+            if os.path.isfile(cache_path):
+                shutil.copyfile(cache_path, final_input_file)
+                input_frame = pd.read_csv(cache_path, sep=',', header=0, float_precision='round_trip')
+                print("The input file adapted to the required time step has been reused from", cache_path)
+                return input_frame
+
+        # Then we read the file and copy it in a dataframe "df":
+        df = pd.read_csv(PATH1, sep=',', header=0)
+
         # We create a new, final dataframe that will be used to read inputs of sucrose:
         input_frame = pd.DataFrame(
             columns=["step_number", "initial_time_in_days", "final_time_in_days", "soil_temperature_in_degree_Celsius",
@@ -68,138 +84,71 @@ def formatted_inputs(original_input_file="None", final_input_file='updated_input
         print("Creating a new input file adapted to the required time step (time step =",
               "{:.2f}".format(Decimal(final_time_step_in_days)), "days)...")
 
+        sucrose_input_rate = df['sucrose_input_rate'].to_numpy(dtype=float)
+        temperature = df['soil_temperature_in_Celsius'].to_numpy(dtype=float)
+
         # CASE 1: the final time step is higher than the original one, so we have to calculate an average value:
         # -------------------------------------------------------------------------------------------------------
         if final_time_step_in_days >= original_time_step_in_days:
+            input_frame['sucrose_input_rate'] = averaged_inputs(sucrose_input_rate, original_time_step_in_days, final_time_step_in_days, n_steps)
+            input_frame['soil_temperature_in_degree_Celsius'] = averaged_inputs(temperature, original_time_step_in_days, final_time_step_in_days, n_steps)
 
-            # We initialize the row ID "j" in which exact sucrose inputs will be recorded:
-            j = 0
-            # We initialize the time over which sucrose input will be integrated:
-            cumulated_time_in_days = 0.
-            time_in_days = 0.
-            sucrose_input = 0.
-            sum_of_temperature_in_degree_days = 0.
-
-            # For each line of the data frame that contains information on sucrose input:
-            for i in range(0, len(df['time_in_days'])):
-
-                # If the current cumulated time is below the time step of the main simulation:
-                if (cumulated_time_in_days + original_time_step_in_days) < 0.9999 * final_time_step_in_days:
-                    # Then the amount of time elapsed here is the initial time step:
-                    net_elapsed_time_in_days = original_time_step_in_days
-                    remaining_time = 0.
-                else:
-                    # Otherwise, we limit the elapsed time to the one necessary for reaching a round number of final_time_step_in_days:
-                    net_elapsed_time_in_days = original_time_step_in_days - (
-                            cumulated_time_in_days + original_time_step_in_days - final_time_step_in_days)
-                    remaining_time = (cumulated_time_in_days + original_time_step_in_days - final_time_step_in_days)
-
-                # In any case, the sucrose input and the sum of temperature are increased according to the elapsed time considered here:
-                sucrose_input += df.loc[i, 'sucrose_input_rate'] * net_elapsed_time_in_days * 60 * 60 * 24.
-                sum_of_temperature_in_degree_days += df.loc[i, 'soil_temperature_in_Celsius'] * net_elapsed_time_in_days
-
-                # If at the end of the original time step corresponding to the line i in df, one final time step has been reached
-                # or if this is the last line of the original table df to be read:
-                if cumulated_time_in_days + original_time_step_in_days >= 0.9999 * final_time_step_in_days \
-                        or i == len(df['time_in_days']) - 1:
-
-                    # We move to the next row in the table to create:
-                    j += 1
-                    # print("   Creating line", j, "on", n_steps, "lines in the new input frame...")
-                    # We record the final temperature and sucrose input rate:
-                    input_frame.loc[j - 1, 'sucrose_input_rate'] = sucrose_input / (
-                            (cumulated_time_in_days + net_elapsed_time_in_days) * 60. * 60. * 24.)
-                    input_frame.loc[j - 1, 'soil_temperature_in_degree_Celsius'] = sum_of_temperature_in_degree_days \
-                                                                                   / ((
-                            cumulated_time_in_days + net_elapsed_time_in_days))
-
-                    # We reinitialize the counter with the exact time that has not been included yet:
-                    cumulated_time_in_days = remaining_time
-                    # print "After reinitializing cumulated time, it is equal to", cumulated_time_in_days
-                    # We reinitialize the sucrose input with the remaining sucrose that has not been taken into account:
-                    sucrose_input = df.loc[i, 'sucrose_input_rate'] * (cumulated_time_in_days) * 60 * 60 * 24.
-                    sum_of_temperature_in_degree_days = df.loc[i, 'soil_temperature_in_Celsius'] * (
-                        cumulated_time_in_days)
-
-                else:
-                    cumulated_time_in_days += original_time_step_in_days
-
-                # If the number of total lines of the final input frame has been reached:
-                if j >= n_steps:
-                    # Then we stop the loop here:
-                    break
-
-        # CASE 2: the final time step is higher than the original one, so we have to calculate an average value:
-        # -------------------------------------------------------------------------------------------------------
-        if final_time_step_in_days < original_time_step_in_days:
+        # CASE 2: the final time step is lower than the original one, so we have to interpolate values:
+        # ----------------------------------------------------------------------------------------------
+        else:
+            input_frame['sucrose_input_rate'] = interpolated_inputs(sucrose_input_rate, original_time_step_in_days, final_time_step_in_days, n_steps)
+            # NOTE: the temperature has always been interpolated from the first original value, which is kept here for identical input files
+            input_frame['soil_temperature_in_degree_Celsius'] = interpolated_inputs(temperature, original_time_step_in_days, final_time_step_in_days, n_steps,
+                                                                                    from_first_value=True)
 
-            # We initialize the row ID "i" in which the original values are read:
-            i = 1
-            # print "      Considering now line", i, "in the original table for time = ", df.loc[i, 'time_in_days']
+        if cache_dirpath is not None:
+            os.makedirs(cache_dirpath, exist_ok=True)
+            input_frame.to_csv(cache_path, na_rep='NA', index=False, header=True)
 
-            # We initialize the time over which sucrose input will be integrated:
-            cumulated_time_in_days = 0.
-            time_in_days = 0.
-            sucrose_input = 0.
-            sum_of_temperature_in_degree_days = 0.
+    input_frame.to_csv(final_input_file, na_rep='NA', index=False, header=True)
+    print("The new input file adapted to the required time step has been created and saved as 'updated_input_file.csv'.")
 
-            sucrose_input_rate_initial = df.loc[0, 'sucrose_input_rate']
-            temperature_initial = df.loc[0, 'soil_temperature_in_Celsius']
+    return input_frame
 
-            # For each line of the final table:
-            for j in range(0, n_steps):
 
-                # If the current cumulated time is below the time step of the main simulation:
-                if cumulated_time_in_days + final_time_step_in_days < 0.9999 * original_time_step_in_days:
-                    # Then the amount of time elapsed here is the initial time step:
-                    net_elapsed_time_in_days = final_time_step_in_days
-                    remaining_time = 0.
-                else:
-                    # Otherwise, we limit the elapsed time to the one necessary for reaching a round number of original_time_step_in_days:
-                    net_elapsed_time_in_days = final_time_step_in_days - (
-                            cumulated_time_in_days + final_time_step_in_days - original_time_step_in_days)
-                    remaining_time = (cumulated_time_in_days + final_time_step_in_days - original_time_step_in_days)
-
-                sucrose_input_rate = sucrose_input_rate_initial \
-                                     + (df.loc[
-                                            i, 'sucrose_input_rate'] - sucrose_input_rate_initial) / original_time_step_in_days * cumulated_time_in_days
-                temperature = temperature_initial \
-                              + (df.loc[
-                                     i, 'soil_temperature_in_Celsius'] - temperature_initial) / original_time_step_in_days * cumulated_time_in_days
-
-                print("   Creating line", j + 1, "on", n_steps, "lines in the new input frame...")
-                # We record the final temperature and sucrose input rate:
-                input_frame.loc[j, 'sucrose_input_rate'] = sucrose_input_rate
-                input_frame.loc[j, 'soil_temperature_in_degree_Celsius'] = temperature
-
-                # If at the end of the final time step corresponding to the line j in input_frame, one original time step has been reached:
-                if cumulated_time_in_days + final_time_step_in_days >= 0.9999 * original_time_step_in_days:
-
-                    # We record the current sucrose input rate and temperature in the original table:
-                    sucrose_input_rate_initial = df.loc[i, 'sucrose_input_rate']
-                    temperature = df.loc[i, 'soil_temperature_in_Celsius']
-
-                    # We move to the next row in the original table, unless we are already at the last line:
-                    if i < len(df['time_in_days']) - 1:
-                        i += 1
-                        # print "      Considering now line", i, "in the original table for time = ", df.loc[i, 'time_in_days']
-
-                    # We reinitialize the counter with the exact time that has not been included yet:
-                    cumulated_time_in_days = remaining_time
+def averaged_inputs(values, original_time_step_in_days, final_time_step_in_days, n_steps):
+    """
+    Averages the values of successive original time steps over each final time step, from the cumulative integral of the values.
+    An original time step overlapping two final time steps contributes to both in proportion of the overlap,
+    and the original time steps remaining after the last complete final time step are averaged in a truncated one,
+    unless this complete final time step ended during the last original time step. The following final time steps are NaN.
+    """
+    # Cumulative integral at the end of each original time step, values being constant during their time step:
+    original_times = original_time_step_in_days * np.arange(len(values) + 1)
+    cumulated_values = np.concatenate(([0.], np.cumsum(values * original_time_step_in_days)))
 
-                else:
+    # Final time steps are closed when reached within 0.01% of their length:
+    n_complete = int(np.floor(original_times[-1] / final_time_step_in_days + 1e-4))
+    truncated = (n_complete - 1e-4) * final_time_step_in_days <= original_times[-2]
+    n_averaged = min(n_steps, n_complete + int(truncated))
+    bounds = np.minimum(final_time_step_in_days * np.arange(n_averaged + 1), original_times[-1])
 
-                    cumulated_time_in_days += final_time_step_in_days
+    averages = np.full(n_steps, np.nan)
+    averages[:n_averaged] = np.diff(np.interp(bounds, original_times, cumulated_values)) / np.diff(bounds)
+    return averages
 
-                # If the number of total lines of the final input frame has been reached:
-                if j >= n_steps:
-                    # Then we stop the loop here:
-                    break
 
-    input_frame.to_csv(final_input_file, na_rep='NA', index=False, header=True)
-    print("The new input file adapted to the required time step has been created and saved as 'updated_input_file.csv'.")
+def interpolated_inputs(values, original_time_step_in_days, final_time_step_in_days, n_steps, from_first_value=False):
+    """
+    Linearly interpolates the values at the beginning of each final time step between the values of successive original time steps,
+    the last original value being kept after the end of the original table.
 
-    return input_frame
+    :param from_first_value: if True, values are interpolated between the first original value and the next original one instead
+    """
+    # Number of original time steps reached at the beginning of each final time step, within 0.01% of the original time step:
+    times = final_time_step_in_days * np.arange(n_steps)
+    reached = np.floor(times / original_time_step_in_days + 1e-4).astype(int)
+    elapsed_time_in_days = times - reached * original_time_step_in_days
+
+    last = len(values) - 1
+    start = np.zeros_like(reached) if from_first_value else np.minimum(reached, last)
+    end = np.minimum(reached + 1, last)
+    return values[start] + (values[end] - values[start]) / original_time_step_in_days * elapsed_time_in_days
 
 
 def is_int(dt):
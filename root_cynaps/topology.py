@@ -0,0 +1,149 @@
+"""
+root_cynaps.topology
+____________________
+Array index of the root system topology, used by components to sweep the MTG without per-vertex graph queries.
+"""
+
+# Imports
+import numpy as np
+from openalea.mtg.traversal import pre_order2
+from root_cynaps.property_store import take, put
+
+
+class TopologyIndex:
+    """
+    Parent and children relations of the root MTG stored as integer arrays of rows.
+    Rows follow the collar-to-tips pre-order, so that a parent row is always placed before its children rows,
+    and children of each row are stored contiguously (CSR layout) in children[children_start[row]:children_start[row + 1]].
+
+    The index is only rebuilt when the topology changed, i.e. when the number of vertices changed after growth.
+    """
+
+    def __init__(self, g):
+        self.g = g
+        self.size = None
+        self.update(g.vertices(scale=g.max_scale()))
+
+    def update(self, vertices, force=False):
+        """
+        Rebuilds the index if the provided vertices list does not correspond to the indexed topology anymore.
+
+        :param vertices: current list of vertices at the MTG's max scale
+        :param force: rebuilds the index even if the number of vertices is unchanged, e.g. after the MTG has been replaced
+        :return: True if the index has been rebuilt
+        """
+        if len(vertices) == self.size and not force:
+            return False
+
+        root_gen = self.g.component_roots_at_scale_iter(self.g.root, scale=self.g.max_scale())
+        root = next(root_gen)
+
+        self.vids = list(pre_order2(self.g, root))
+        self.order = np.array(self.vids, dtype=int)
+        self.row = dict(zip(self.vids, range(len(self.vids))))
+        self.parent = np.array([self.row.get(self.g.parent(vid), -1) for vid in self.vids], dtype=int)
+
+        # Children are grouped by parent row, parent rows being sorted, a stable sort keeps the pre-order among siblings
+        has_parent = self.parent >= 0
+        child_rows = np.flatnonzero(has_parent)
+        self.children = child_rows[np.argsort(self.parent[child_rows], kind="stable")]
+        self.children_count = np.bincount(self.parent[child_rows], minlength=len(self.order))
+        self.children_start = np.concatenate(([0], np.cumsum(self.children_count)))
+
+        # Depth of each row, obtained in one pass as parents are always met before their children
+        self.depth = np.zeros(len(self.order), dtype=int)
+        for r in child_rows.tolist():
+            self.depth[r] = self.depth[self.parent[r]] + 1
+        # Rows grouped by depth, from collar to the deepest tips
+        by_depth = np.argsort(self.depth, kind="stable")
+        self.levels = np.split(by_depth, np.cumsum(np.bincount(self.depth))[:-1])
+
+        self._ancestors = None
+        self.size = len(vertices)
+        return True
+
+    @property
+    def ancestors(self):
+        """
+        Binary lifting table, ancestors[k][row] being the 2**k-th ancestor row of row (-1 beyond the collar).
+        Built on first use after each topology update.
+        """
+        if self._ancestors is None:
+            table = [self.parent]
+            while (table[-1] >= 0).any():
+                previous = table[-1]
+                table.append(np.where(previous >= 0, previous[previous], -1))
+            self._ancestors = table
+        return self._ancestors
+
+    def rows(self, vids):
+        """
+        Rows of the provided vertex ids
+        """
+        return np.array([self.row[vid] for vid in vids], dtype=int)
+
+    def gather(self, prop):
+        """
+        Values of the {vid: value} property dictionary as a float array ordered by rows
+        """
+        return take(prop, self.vids)
+
+    def scatter(self, prop, values, rows=None):
+        """
+        Writes back a row-ordered array into the {vid: value} property dictionary, optionally for a subset of rows only
+        """
+        if rows is None:
+            put(prop, self.vids, values)
+        else:
+            put(prop, self.order[rows].tolist(), values[rows])
+
+    def children_sum(self, values):
+        """
+        Sum of the row-ordered values over the children of each row
+        """
+        return np.bincount(self.parent[self.parent >= 0], weights=values[self.parent >= 0], minlength=len(self.order))
+
+    def path_sum(self, values):
+        """
+        Cumulated values from the collar down to each row, both included
+        """
+        cumulated = np.array(values, dtype=float)
+        for level in self.levels[1:]:
+            cumulated[level] += cumulated[self.parent[level]]
+        return cumulated
+
+    def subtree_sum(self, values):
+        """
+        Cumulated values over the subtree borne by each row, the row itself included.
+        values can be a 2D array with one line per row.
+        """
+        cumulated = np.array(values, dtype=float)
+        for level in reversed(self.levels[1:]):
+            np.add.at(cumulated, self.parent[level], cumulated[level])
+        return cumulated
+
+    def furthest_ancestor(self, rows, condition):
+        """
+        For each row, furthest ancestor (or the row itself) reached while condition holds along the path towards collar.
+        condition(candidates, index) returns a boolean mask for candidate rows, index giving the corresponding position in rows,
+        and has to be monotonous along paths, i.e. if it fails for a row, it fails for all of its ancestors.
+        """
+        reached = np.array(rows, dtype=int)
+        index = np.arange(len(reached))
+        for jump in reversed(self.ancestors):
+            candidates = jump[reached]
+            move = candidates >= 0
+            move[move] = condition(candidates[move], index[move])
+            reached[move] = candidates[move]
+        return reached
+
+    def expand_children(self, rows):
+        """
+        Flattened children of the provided rows.
+
+        :return: position in rows of the parent of each child, child rows
+        """
+        counts = self.children_count[rows]
+        origin = np.repeat(np.arange(len(rows)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return origin, self.children[self.children_start[rows][origin] + offsets]
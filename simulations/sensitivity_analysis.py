@@ -1,34 +1,291 @@
 # Public packages
-import os
+import os, json
 import numpy as np
+import pandas as pd
+import multiprocessing as mp
+from scipy.stats import norm
 from SALib.analyze import sobol
 # Model packages
+from root_cynaps.root_cynaps import Model
 # Utility packages
 from log.logging import Logger
 from initialize.initialize import MakeScenarios as ms
-from initialize.initialize import read_table
 import matplotlib.pyplot as plt
-from simulations.single_plant.simulation import simulate_scenarios
+from simulations.simulation import simulate_scenarios, available_processes
 
 
-def sobol_analysis(problem, results_dirpath, scenarios_names, times=[], outputs=[]):
-    result_tables = [read_table(os.path.join(results_dirpath, name, "MTG_properties/MTG_properties_summed/plant_scale_properties.csv")) 
-                     for name in scenarios_names]
-    analyses = {}
-    for t in times:
-        results = {output: np.array([table[output][t] for table in result_tables], dtype=float) for output in outputs}
-        analyses[t] = {output: sobol.analyze(problem, results[output], calc_second_order=True) for output in outputs}
+PLANT_SCALE_TABLE = "MTG_properties/MTG_properties_summed/plant_scale_properties.csv"
 
-    return analyses
+
+def read_times(path, times, outputs, chunksize=1000):
+    """
+    Reads the rows of a plant scale table labelled by times in its first column, parsing only the outputs columns
+    and stopping at the chunk where the last of the times is found.
+
+    :return: (times, outputs) DataFrame
+    """
+    index = pd.read_csv(path, nrows=0).columns[0]
+    missing = set(times)
+    rows = []
+    with pd.read_csv(path, usecols=[index] + list(outputs), index_col=index, chunksize=chunksize) as chunks:
+        for chunk in chunks:
+            rows.append(chunk[chunk.index.isin(missing)])
+            missing.difference_update(chunk.index)
+            if len(missing) == 0:
+                break
+    return pd.concat(rows).loc[list(times), list(outputs)]
+
+
+def extract_results(results_dirpath, scenarios_names, times, outputs, cache_path=None):
+    """
+    Reads the plant scale outputs of each scenario at the provided times, labelling the rows of the tables.
+    Only the outputs columns and the rows up to the last time are parsed, one table at a time, into a preallocated matrix.
+
+    :param cache_path: .npz file where the matrix is stored, and reused as long as the selection and the tables are unchanged
+    :return: (times, outputs, scenarios) array
+    """
+    paths = [os.path.join(results_dirpath, str(name), PLANT_SCALE_TABLE) for name in scenarios_names]
+    selection = json.dumps(dict(scenarios=[str(name) for name in scenarios_names], times=list(times), outputs=list(outputs),
+                                modified=[os.path.getmtime(path) for path in paths]))
+    if cache_path is not None and os.path.isfile(cache_path):
+        with np.load(cache_path) as cached:
+            if str(cached["selection"]) == selection:
+                return cached["results"]
+
+    results = np.empty((len(times), len(outputs), len(paths)))
+    for k, path in enumerate(paths):
+        results[:, :, k] = read_times(path, times, outputs).to_numpy(dtype=float)
+
+    if cache_path is not None:
+        np.savez(cache_path, results=results, selection=selection)
+    return results
+
+
+def sobol_task(problem, results, analyze_kwargs):
+    return sobol.analyze(problem, results, calc_second_order=True, **analyze_kwargs)
+
+
+def sobol_analysis(problem, results_dirpath, scenarios_names, times=[], outputs=[], processes=None, cache_path=None, **analyze_kwargs):
+    """
+    Sobol indices of each output at each time from the scenarios results, see extract_results.
+    The analyses of (time, output) pairs are independent and spread over a pool of processes.
+
+    :param processes: number of processes, by default the number of cores, analyses being performed in this process if 1
+    :param analyze_kwargs: passed to SALib sobol.analyze, e.g. a seed for reproducible confidence intervals
+    :return: dict of Sobol indices by time then output
+    """
+    results = extract_results(results_dirpath, scenarios_names, times, outputs, cache_path=cache_path)
+    tasks = [(problem, results[i, j], analyze_kwargs) for i in range(len(times)) for j in range(len(outputs))]
+    if processes is None:
+        processes = min(available_processes(), len(tasks))
+
+    if processes > 1:
+        with mp.get_context("spawn").Pool(processes) as pool:
+            indices = pool.starmap(sobol_task, tasks)
+    else:
+        indices = [sobol_task(*task) for task in tasks]
+
+    indices = iter(indices)
+    return {t: {output: next(indices) for output in outputs} for t in times}
+
+
+class SobolAccumulator:
+    """
+    Running Sobol indices of outputs at given times, fed with the results of each scenario of a Saltelli plan as soon as it completes.
+    Scenarios are grouped by base sample, the rows of a group being A, AB_i, BA_i (if second order was sampled) and B,
+    and indices are estimated over the groups whose scenarios have all been pushed,
+    with the estimators and bootstrap confidence intervals of SALib sobol.analyze, the resamples being drawn as SALib does for the same seed.
+    """
+
+    def __init__(self, problem, times, outputs, calc_second_order=True, num_resamples=100, conf_level=0.95, seed=None):
+        self.names = problem["names"]
+        self.times = list(times)
+        self.outputs = list(outputs)
+        self.num_vars = len(self.names)
+        self.calc_second_order = calc_second_order
+        self.group_size = 2 * self.num_vars + 2 if calc_second_order else self.num_vars + 2
+        self.num_resamples = num_resamples
+        self.z = norm.ppf(0.5 + conf_level / 2)
+        self.seed = seed
+        self.groups = {}
+        self.pushed = {}
+        self.complete = []
+        self._indices = None
+
+    def push(self, index, values):
+        """
+        Adds the results of a scenario
+
+        :param index: position of the scenario in the plan
+        :param values: (times, outputs) array of the scenario outputs
+        :return: True if the group of the scenario is now complete, changing the estimates
+        """
+        group, row = divmod(index, self.group_size)
+        if group not in self.groups:
+            self.groups[group] = np.full((len(self.times), len(self.outputs), self.group_size), np.nan)
+            self.pushed[group] = set()
+        self.groups[group][:, :, row] = values
+        self.pushed[group].add(row)
+        if len(self.pushed[group]) < self.group_size:
+            return False
+        self.complete.append(group)
+        self._indices = None
+        return True
+
+    @property
+    def indices(self):
+        """
+        Last estimates, computed again only after groups have been completed, None while less than two groups are complete
+        """
+        if self._indices is None and len(self.complete) >= 2:
+            self._indices = self.estimate()
+        return self._indices
+
+    def estimate(self):
+        """
+        :return: dict of Sobol indices by time then output, over the complete groups,
+            each being a dict of S1, S1_conf, ST, ST_conf, and S2, S2_conf if second order was sampled, as returned by SALib sobol.analyze
+        """
+        Y = np.stack([self.groups[group] for group in sorted(self.complete)], axis=2)
+        # Standardized over all the rows of the groups like in SALib
+        Y = (Y - Y.mean(axis=(2, 3), keepdims=True)) / Y.std(axis=(2, 3), keepdims=True)
+        A, AB, BA, B = Y[..., 0], Y[..., 1:self.num_vars + 1], Y[..., self.num_vars + 1:-1], Y[..., -1]
+        n = len(self.complete)
+        # Drawn as (groups, resamples) like in SALib, then placed before the groups axis
+        resamples = np.random.default_rng(self.seed).integers(n, size=(n, self.num_resamples)).T
+
+        indices = dict(zip(("S1", "ST"), self.first_and_total_order(A, AB, B)))
+        boot = dict(zip(("S1", "ST"), self.first_and_total_order(A[:, :, resamples], AB[:, :, resamples], B[:, :, resamples])))
+        if self.calc_second_order:
+            indices["S2"] = self.second_order(A, AB, BA, B, indices["S1"])
+            boot["S2"] = self.second_order(A[:, :, resamples], AB[:, :, resamples], BA[:, :, resamples], B[:, :, resamples], boot["S1"])
+        for key, values in boot.items():
+            indices[key + "_conf"] = self.z * values.std(axis=2, ddof=1)
+        keys = ["S1", "S1_conf", "ST", "ST_conf"] + (["S2", "S2_conf"] if self.calc_second_order else [])
+        return {t: {output: {key: indices[key][i, j] for key in keys}
+                    for j, output in enumerate(self.outputs)} for i, t in enumerate(self.times)}
+
+    @staticmethod
+    def first_and_total_order(A, AB, B):
+        """
+        Estimators over the groups axis, which precedes the variables axis of AB
+        """
+        variance = np.var(np.concatenate([A, B], axis=-1), axis=-1)[..., np.newaxis]
+        A, B = A[..., np.newaxis], B[..., np.newaxis]
+        first_order = np.mean(B * (AB - A), axis=-2) / variance
+        total_order = 0.5 * np.mean((A - AB) ** 2, axis=-2) / variance
+        return first_order, total_order
+
+    @staticmethod
+    def second_order(A, AB, BA, B, first_order):
+        """
+        Estimators as (variables, variables) matrices over the last axes, only the upper triangle being filled like in SALib
+        """
+        num_vars = AB.shape[-1]
+        variance = np.var(np.concatenate([A, B], axis=-1), axis=-1)[..., np.newaxis]
+        second_order = np.full(first_order.shape + (num_vars,), np.nan)
+        for j in range(num_vars - 1):
+            joint = np.mean(BA[..., j, np.newaxis] * AB[..., j + 1:] - (A * B)[..., np.newaxis], axis=-2) / variance
+            second_order[..., j, j + 1:] = joint - first_order[..., j, np.newaxis] - first_order[..., j + 1:]
+        return second_order
+
+    def converged(self, tolerance, min_groups=10):
+        """
+        :return: True if at least min_groups groups are complete and all confidence intervals of first and total order indices are below tolerance
+        """
+        if len(self.complete) < max(2, min_groups):
+            return False
+        return all(np.all(indices[key] <= tolerance) for outputs in self.indices.values() for indices in outputs.values()
+                   for key in ("S1_conf", "ST_conf"))
+
+
+def online_sobol_analysis(problem, scenarios, scenarios_names, times=[], outputs=[], tolerance=0.05, min_groups=10,
+                          results_dirpath="outputs", seed=None, **simulation_kwargs):
+    """
+    Simulates the scenarios of a Saltelli plan while accumulating the Sobol indices of their outputs, see SobolAccumulator.
+    The results of each scenario are read as soon as it ends, and the campaign stops launching scenarios once all confidence intervals are below tolerance.
+
+    :param simulation_kwargs: passed to simulate_scenarios
+    :return: the accumulator, whose indices attribute holds the last estimates, and the scenario reports
+    """
+    accumulator = SobolAccumulator(problem, times, outputs, seed=seed)
+    positions = {name: k for k, name in enumerate(scenarios_names)}
+
+    def on_report(report):
+        if report["status"] not in ("done", "skipped"):
+            return False
+        values = extract_results(results_dirpath, [report["scenario"]], times, outputs)[:, :, 0]
+        if accumulator.push(positions[report["scenario"]], values):
+            print(f"[INFO] {len(accumulator.complete)} complete Sobol groups")
+            return accumulator.converged(tolerance, min_groups)
+        return False
+
+    reports = simulate_scenarios(scenarios, outputs_dirpath=results_dirpath, on_report=on_report, **simulation_kwargs)
+    return accumulator, reports
+
+
+def same_inputs(a, b):
+    """
+    Compares scenario inputs, recursing into dictionaries, tables being compared by value and MTGs by topology and properties
+    """
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(same_inputs(a[key], b[key]) for key in a)
+    if isinstance(a, (pd.DataFrame, pd.Series)):
+        return isinstance(b, type(a)) and a.equals(b)
+    if hasattr(a, "properties") and hasattr(b, "properties"):
+        return a is b or ([(vid, a.parent(vid)) for vid in a.vertices()] == [(vid, b.parent(vid)) for vid in b.vertices()]
+                          and same_inputs(a.properties(), b.properties()))
+    if isinstance(a, (np.ndarray, list, tuple)):
+        return np.array_equal(a, b)
+    return a == b
+
+
+def simulate_ensemble(problem, scenarios, simulation_length, outputs=[]):
+    """
+    Simulates at once the scenarios of a factorial plan only varying RootNitrogenModel parameters, as the members of a single model ensemble.
+    Scenarios differing by anything else, e.g. input tables, root architecture or other parameters, are rejected,
+    as members are all computed with the inputs of the first scenario.
+
+    :return: dict of (time steps, scenarios) arrays for each plant scale output of the nitrogen model
+    """
+    def shared(scenario):
+        roots = {name: value for name, value in scenario["parameters"]["root_cynaps"]["roots"].items() if name not in problem["names"]}
+        parameters = dict(scenario["parameters"], root_cynaps=dict(scenario["parameters"]["root_cynaps"], roots=roots))
+        return dict(scenario, parameters=parameters)
+
+    names = list(scenarios)
+    scenarios = list(scenarios.values())
+    reference = shared(scenarios[0])
+    for name, scenario in zip(names[1:], scenarios[1:]):
+        scenario = shared(scenario)
+        differences = [key for key in reference.keys() | scenario.keys() if key not in reference or key not in scenario
+                       or not same_inputs(reference[key], scenario[key])]
+        if len(differences) > 0:
+            raise ValueError(f"Scenario {name} differs from {names[0]} by its {', '.join(sorted(differences))}, "
+                             f"while only {', '.join(problem['names'])} can vary among ensemble members")
+
+    root_cynaps = Model(time_step=3600, **scenarios[0])
+    root_cynaps.set_ensemble(**{name: [scenario["parameters"]["root_cynaps"]["roots"][name] for scenario in scenarios]
+                                for name in problem["names"]})
+    results = {output: [] for output in outputs}
+    for _ in range(simulation_length):
+        root_cynaps.run()
+        for output in outputs:
+            results[output].append(root_cynaps.root_nitrogen.ensemble[output].copy())
+    return {output: np.array(values) for output, values in results.items()}
 
 
 if __name__ == '__main__':
     problem, scenarios_filename, scenarios_names = ms.from_factorial_plan("inputs/Factorial_plan_SA.xlsx", N=20)
     scenarios = ms.from_table(scenarios_filename, which=scenarios_names)
-    simulate_scenarios(scenarios, simulation_length=300, echo=False, log_settings=Logger.light_log)
     times=[142, 284]
     outputs=["total_struct_mass", "length", "C_hexose_root", "AA", "hexose_exudation", "import_Nm"]
-    analyses = sobol_analysis(problem=problem, results_dirpath="outputs", scenarios_names=scenarios_names, times=times, outputs=outputs)
+    # Stops launching scenarios once the indices have converged
+    accumulator, reports = online_sobol_analysis(problem=problem, scenarios=scenarios, scenarios_names=scenarios_names, times=times, outputs=outputs,
+                                                 tolerance=0.05, simulation_length=300, echo=False, log_settings=Logger.light_log)
+    analyses = accumulator.indices
+    if analyses is None:
+        raise RuntimeError(f"Sobol indices need at least two complete groups of scenarios, only {len(accumulator.complete)} completed")
     
     fig, axes = plt.subplots(len(outputs), len(times), figsize=(16, 6))
 
@@ -11,7 +11,8 @@ if __name__ == '__main__':
     problem, scenarios_filename, scenarios_names = ms.from_factorial_plan("inputs/Factorial_plan_SA.xlsx", save_scenarios=False, N=20)
     times=[142, 284]
     outputs=["total_struct_mass", "length", "C_hexose_root", "AA", "hexose_exudation", "import_Nm"]
-    analyses = sobol_analysis(problem=problem, results_dirpath="outputs", scenarios_names=scenarios_names, times=times, outputs=outputs)
+    analyses = sobol_analysis(problem=problem, results_dirpath="outputs", scenarios_names=scenarios_names, times=times, outputs=outputs,
+                              cache_path="outputs/SA_results.npz")
     
     fig, axes = plt.subplots(len(outputs), len(times), figsize=(16, 6))
 
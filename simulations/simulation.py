@@ -1,6 +1,10 @@
 # Public packages
-import os, sys, time
+import os, sys, time, json, traceback, tempfile, shutil, hashlib
+from collections import deque
+import numpy as np
+import pandas as pd
 import multiprocessing as mp
+from multiprocessing.connection import wait
 # Model packages
 from root_cynaps.root_cynaps import Model
 # Utility packages
@@ -9,8 +13,10 @@ from initialize.initialize import MakeScenarios as ms
 from analyze.analyze import analyze_data
 
 
-def single_run(scenario, outputs_dirpath="outputs", simulation_length=2500, echo=True, log_settings={}, analyze=True):
+def single_run(scenario, outputs_dirpath="outputs", simulation_length=2500, echo=True, log_settings={}, analyze=True, profile=False):
     root_cynaps = Model(time_step=3600, **scenario)
+    if profile:
+        root_cynaps.start_profiling()
 
     logger = Logger(model_instance=root_cynaps, components=root_cynaps.components,
                     outputs_dirpath=outputs_dirpath,
@@ -29,33 +35,204 @@ def single_run(scenario, outputs_dirpath="outputs", simulation_length=2500, echo
 
     finally:
         logger.stop()
+        if profile:
+            os.makedirs(outputs_dirpath, exist_ok=True)
+            root_cynaps.stop_profiling().to_csv(os.path.join(outputs_dirpath, "step_profile.csv"))
         if analyze:
             analyze_data(scenarios=[os.path.basename(outputs_dirpath)], outputs_dirpath="outputs", target_properties=None, **log_settings)
-        
+
+    return logger.exceptions
+
+
+class SharedTable:
+    """
+    Handle on an input table stored once as memory-mapped .npy files, replacing the table in scenarios sent to workers.
+    Values are stored in a single (rows, columns) array of the common dtype of the columns, and the index in a second file.
+    Workers rebuild the DataFrame on copy-on-write mappings of these files, as a single block viewing the mapped array,
+    so that pages are shared between processes instead of copied, including by the arrays read from the table by CompiledTable.
+    """
+
+    def __init__(self, table, dirpath):
+        self.key = hashlib.sha1(pd.util.hash_pandas_object(table, index=True).values.tobytes() + repr(list(table.columns)).encode()).hexdigest()
+        self.columns = list(table.columns)
+        self.paths = [os.path.join(dirpath, f"{self.key}_{name}.npy") for name in ("values", "index")]
+        if not os.path.isfile(self.paths[-1]):
+            for path, values in zip(self.paths, [np.ascontiguousarray(table.to_numpy()), table.index.to_numpy()]):
+                np.save(path, values)
+
+    def load(self):
+        values, index = (np.load(path, mmap_mode="c") for path in self.paths)
+        return pd.DataFrame(values, columns=self.columns, index=index, copy=False)
+
+    @staticmethod
+    def shareable(table):
+        return all(np.issubdtype(dtype, np.number) for dtype in list(table.dtypes) + [table.index.dtype]) and table.columns.is_unique
+
+
+def share_inputs(inputs, dirpath):
+    """
+    Replaces numeric input tables found in the nested scenario dictionaries by SharedTable handles.
+    Identical tables used by several scenarios are only stored once.
+    """
+    if isinstance(inputs, dict):
+        return {key: share_inputs(value, dirpath) for key, value in inputs.items()}
+    elif isinstance(inputs, pd.DataFrame) and SharedTable.shareable(inputs):
+        return SharedTable(inputs, dirpath)
+    else:
+        return inputs
 
 
-def simulate_scenarios(scenarios, simulation_length=2500, echo=True, log_settings={}, analyze=True):
-    processes = []
+def load_shared_inputs(inputs):
+    """
+    Reverts share_inputs in worker processes
+    """
+    if isinstance(inputs, dict):
+        return {key: load_shared_inputs(value) for key, value in inputs.items()}
+    elif isinstance(inputs, SharedTable):
+        return inputs.load()
+    else:
+        return inputs
+
+
+def run_scenario(connection, scenario_name, **kwargs):
+    """
+    Worker process target, sending back the status, duration and error traceback of the scenario run instead of raising.
+    """
+    start = time.time()
+    try:
+        kwargs["scenario"] = load_shared_inputs(kwargs["scenario"])
+        exceptions = single_run(**kwargs)
+        error = "".join(traceback.format_exception(*exceptions[0])) if len(exceptions) > 0 else None
+    except Exception:
+        error = traceback.format_exc()
+
+    report = dict(scenario=scenario_name, status="failed" if error else "done", duration=time.time() - start, error=error)
+    if report["status"] == "done":
+        # Marks the outputs as complete for batch resuming
+        os.makedirs(kwargs["outputs_dirpath"], exist_ok=True)
+        with open(os.path.join(kwargs["outputs_dirpath"], "run_report.json"), "w") as f:
+            json.dump(report, f)
+    connection.send(report)
+    connection.close()
+
+
+def completed(outputs_dirpath):
+    report_path = os.path.join(outputs_dirpath, "run_report.json")
+    if os.path.isfile(report_path):
+        with open(report_path) as f:
+            return json.load(f)["status"] == "done"
+    return False
+
+
+def available_processes(memory_per_process=None):
+    """
+    Number of scenarios that can run at once, bounded by cores and, if memory_per_process is given in GB, by available memory.
+    """
     max_processes = mp.cpu_count()
-    for scenario_name, scenario in scenarios.items():
-        
-        while len(processes) == max_processes:
-            for proc in processes:
-                if not proc.is_alive():
-                    processes.remove(proc)
-            time.sleep(1)
-        
-        print(f"[INFO] Launching scenario {scenario_name}...")
-        p = mp.Process(target=single_run, kwargs=dict(scenario=scenario, 
-                                                      outputs_dirpath=os.path.join("outputs", str(scenario_name)),
-                                                      simulation_length=simulation_length,
-                                                      echo=echo,
-                                                      log_settings=log_settings,
-                                                      analyze=analyze))
-        p.start()
-        processes.append(p)
+    if memory_per_process:
+        try:
+            available_memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_AVPHYS_PAGES") / 1e9
+            max_processes = min(max_processes, int(available_memory // memory_per_process))
+        except (ValueError, OSError, AttributeError):
+            # Available memory is not exposed on this platform
+            pass
+    return max(1, max_processes)
+
+
+def simulate_scenarios(scenarios, simulation_length=2500, echo=True, log_settings={}, analyze=True, outputs_dirpath="outputs",
+                       max_processes=None, memory_per_process=None, resume=False, share_inputs_tables=True, profile=False, on_report=None):
+    """
+    Runs each scenario in its own process, scenarios waiting in a queue until a process slot is released.
+
+    :param max_processes: maximal number of concurrent scenarios, by default the number of cores limited by available memory
+    :param memory_per_process: expected memory use of a scenario in GB, used to limit concurrency
+    :param resume: if True, scenarios whose outputs have already been completed are skipped
+    :param share_inputs_tables: if True, numeric input tables are stored once in memory-mapped files read by all workers
+    :param profile: if True, the per-step profile of the model processes is written in step_profile.csv of each scenario outputs
+    :param on_report: function called with the report of each scenario as soon as it ends or is skipped,
+    pending scenarios being cancelled once it returns True (running ones are let to complete)
+    :return: dict of reports with the status ('done', 'failed', 'crashed', 'skipped' or 'cancelled'), duration in seconds and error traceback of each scenario
+    """
+    if max_processes is None:
+        max_processes = available_processes(memory_per_process)
+
+    if share_inputs_tables:
+        shared_dirpath = tempfile.mkdtemp(prefix="root_cynaps_inputs_")
+        scenarios = {scenario_name: share_inputs(scenario, shared_dirpath) for scenario_name, scenario in scenarios.items()}
+
+    try:
+        return run_queue(scenarios, outputs_dirpath=outputs_dirpath, max_processes=max_processes, resume=resume, on_report=on_report,
+                         simulation_length=simulation_length, echo=echo, log_settings=log_settings, analyze=analyze, profile=profile)
+    finally:
+        if share_inputs_tables:
+            shutil.rmtree(shared_dirpath, ignore_errors=True)
+
+
+def run_queue(scenarios, outputs_dirpath, max_processes, resume, on_report=None, **run_settings):
+    """
+    Launches queued scenarios as process slots get released and collects their reports, see simulate_scenarios.
+    """
+    pending = deque(scenarios.items())
+    running = {}
+    reports = {}
+
+    def notify(report):
+        if on_report is not None and on_report(report) and len(pending) > 0:
+            print(f"[INFO] Stopping the campaign, cancelling {len(pending)} pending scenarios")
+            for scenario_name, _ in pending:
+                reports[scenario_name] = dict(scenario=scenario_name, status="cancelled", duration=0., error=None)
+            pending.clear()
+
+    while len(pending) > 0 or len(running) > 0:
+        while len(pending) > 0 and len(running) < max_processes:
+            scenario_name, scenario = pending.popleft()
+            scenario_dirpath = os.path.join(outputs_dirpath, str(scenario_name))
+            if resume and completed(scenario_dirpath):
+                print(f"[INFO] Skipping already completed scenario {scenario_name}")
+                reports[scenario_name] = dict(scenario=scenario_name, status="skipped", duration=0., error=None)
+                notify(reports[scenario_name])
+                continue
+
+            print(f"[INFO] Launching scenario {scenario_name}...")
+            receiver, sender = mp.Pipe(duplex=False)
+            p = mp.Process(target=run_scenario, kwargs=dict(connection=sender,
+                                                            scenario_name=scenario_name,
+                                                            scenario=scenario,
+                                                            outputs_dirpath=scenario_dirpath,
+                                                            **run_settings))
+            p.start()
+            sender.close()
+            running[p.sentinel] = dict(name=scenario_name, process=p, receiver=receiver, start=time.time())
+
+        # Blocks until a report is sent or a process ends
+        receivers = [run["receiver"] for run in running.values() if run["name"] not in reports]
+        ready = wait(list(running) + receivers)
+        for run in running.values():
+            if run["receiver"] in ready or (run["process"].sentinel in ready and run["receiver"].poll()):
+                try:
+                    report = run["receiver"].recv()
+                    reports[report["scenario"]] = report
+                except EOFError:
+                    pass
+
+        for sentinel in [sentinel for sentinel in ready if sentinel in running]:
+            run = running.pop(sentinel)
+            run["process"].join()
+            run["receiver"].close()
+            if run["name"] not in reports:
+                reports[run["name"]] = dict(scenario=run["name"], status="crashed", duration=time.time() - run["start"],
+                                            error=f"Process exited with code {run['process'].exitcode}")
+            report = reports[run["name"]]
+            print(f"[INFO] Scenario {run['name']} {report['status']} after {round(report['duration'])} s")
+            if report["error"]:
+                print(report["error"])
+            notify(report)
+
+    return reports
 
         
+
+
 if __name__ == "__main__":
     print("Starting simulation in 5 seconds, use Ctrl+C to cancel !")
     time.sleep(5)
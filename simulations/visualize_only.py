@@ -2,6 +2,8 @@
 import os, sys, time
 import pyvista as pv
 from openalea.mtg.traversal import post_order
+# Model packages
+from root_cynaps.spatial_index import spatial_index
 
 # Utility packages
 from log.visualize import plot_mtg_alt
@@ -14,21 +16,12 @@ class VertexPicker:
         self.g = g
         self.props = g.properties()
         self.target_property = target_property
+        self.index = spatial_index(g)
 
     # Define the callback for when an object is picked
     def __call__(self, picked_coordinates):
-        x, y, z = picked_coordinates
-        distances = {}
-        for vid in self.g.vertices():
-            if vid != 0:
-                distance = self.compute_vertex_distance(x, y, z, self.props["x2"][vid], self.props["y2"][vid], self.props["z2"][vid])
-                distances[vid] = distance
-
-        picked = min(distances, key=distances.get)
+        picked, distance = self.index.nearest(picked_coordinates)
         print(f"Picked vertex {picked} (+{self.g.children(picked)} -{self.g.parent(picked)}), distance_from_tip = {self.props['distance_from_tip'][picked]}, {self.target_property} = {self.props[self.target_property][picked]}")
-
-    def compute_vertex_distance(self, x1, y1, z1, x2, y2, z2):
-        return ((x1-x2)**2 + (y1-y2)**2 + (z1-z2)**2)**0.5
     
 
 def update_distance_from_tip(g):
@@ -0,0 +1,29 @@
+# Model packages
+from root_cynaps.root_cynaps import Model
+# Utility packages
+from initialize.initialize import MakeScenarios as ms
+
+
+def test_active_vertices(simulation_length=3):
+    scenarios = ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=["Reference_Fischer"])
+
+    for scenario_name, scenario in scenarios.items():
+        root_cynaps = Model(time_step=3600, **scenario)
+        nitrogen, water = root_cynaps.root_nitrogen, root_cynaps.root_water
+        nitrogen.vectorized_processes = True
+        for component in (nitrogen, water):
+            assert component.active_vertices == [vid for vid in component.vertices if component.struct_mass[vid] > 0]
+
+        inactive = [vid for vid in nitrogen.vertices if nitrogen.struct_mass[vid] <= 0]
+        initial_values = {name: {vid: nitrogen.props[name][vid] for vid in inactive} for name in nitrogen.vertex_states + nitrogen.vertex_rates}
+        for _ in range(simulation_length):
+            root_cynaps.run()
+
+        # Non emerged vertices are skipped, their rates and states being unchanged
+        for name, values in initial_values.items():
+            assert all(nitrogen.props[name][vid] == value for vid, value in values.items()), name
+        assert all(water.radial_import_water[vid] == 0. for vid in inactive)
+
+
+if __name__ == "__main__":
+    test_active_vertices()
@@ -0,0 +1,97 @@
+# Public packages
+import numpy as np
+# Model packages
+from root_cynaps.root_cynaps import Model
+# Utility packages
+from initialize.initialize import MakeScenarios as ms
+
+
+def axial_transport(nitrogen, solver):
+    names = ["cumulated_radial_exchanges_Nm", "cumulated_radial_exchanges_AA", "displaced_Nm_in", "displaced_AA_in",
+             "displaced_Nm_out", "displaced_AA_out", "Nm_differential_by_water_transport", "Nm_root_shoot_xylem", "AA_root_shoot_xylem"]
+    saved = {name: dict(nitrogen.props[name]) for name in names}
+    nitrogen.axial_transport_solver = solver
+    nitrogen.initialize_cumulative()
+    nitrogen._axial_transport_N()
+    results = {name: np.array([nitrogen.props[name][vid] for vid in nitrogen.vertices], dtype=float) for name in names[:-2]}
+    results.update({name: nitrogen.props[name][1] for name in names[-2:]})
+    for name, values in saved.items():
+        nitrogen.props[name].update(values)
+    return results
+
+
+def main_axis(nitrogen):
+    """
+    Vertices from collar to the apex of the first axis, following successors, or the first child otherwise
+    """
+    g = nitrogen.g
+    v = next(vid for vid in nitrogen.vertices if g.parent(vid) is None)
+    axis = [v]
+    while len(g.children(v)) > 0:
+        children = g.children(v)
+        v = next((child for child in children if g.edge_type(child) == "<"), children[0])
+        axis.append(v)
+    return axis
+
+
+def single_branch_axial_transport(nitrogen, solver):
+    """
+    Axial transport with only the main axis emerged, the other vertices exchanging nothing as for a single branch architecture
+    """
+    saved = dict(nitrogen.props["struct_mass"])
+    axis = set(main_axis(nitrogen))
+    nitrogen.props["struct_mass"].update({vid: 0. for vid in nitrogen.vertices if vid not in axis})
+    nitrogen.update_active_vertices()
+    results = axial_transport(nitrogen, solver)
+    nitrogen.props["struct_mass"].update(saved)
+    nitrogen.update_active_vertices()
+    return results
+
+
+def single_segment_downward_axial_transport(nitrogen, solver):
+    """
+    Axial transport with downward exports limited to the water content of each segment, so that downward columns are only shared
+    among the children of their segment and don't cross several branchings, where the solvers are documented to differ
+    """
+    saved = dict(nitrogen.props["axial_import_water_down"])
+    nitrogen.props["axial_import_water_down"].update({vid: max(saved[vid], - nitrogen.xylem_water[vid]) for vid in nitrogen.vertices})
+    results = axial_transport(nitrogen, solver)
+    nitrogen.props["axial_import_water_down"].update(saved)
+    return results
+
+
+def assert_same_transport(tree_flow, iterative):
+    # Nm_differential_by_water_transport accounts for all the inflows of the time step with tree_flow, by design
+    for name, values in iterative.items():
+        if name != "Nm_differential_by_water_transport":
+            assert np.allclose(tree_flow[name], values, rtol=1e-10, atol=1e-12 * np.max(np.abs(values), initial=0.)), name
+
+
+def test_axial_transport_solvers(simulation_length=3):
+    scenarios = ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=["Reference_Fischer"])
+
+    for scenario_name, scenario in scenarios.items():
+        root_cynaps = Model(time_step=3600, **scenario)
+        nitrogen = root_cynaps.root_nitrogen
+
+        for _ in range(simulation_length):
+            root_cynaps.run()
+
+            iterative = axial_transport(nitrogen, "iterative")
+            tree_flow = axial_transport(nitrogen, "tree_flow")
+
+            # Exported matter and exports to shoot do not depend on the down branches repartition, so they have to match
+            for name in ("displaced_Nm_out", "displaced_AA_out", "Nm_root_shoot_xylem", "AA_root_shoot_xylem"):
+                assert np.allclose(tree_flow[name], iterative[name], rtol=1e-10, atol=0.), name
+
+            # On the branched architecture, the amounts of each vertex have to match as long as downward columns are shared among the children
+            # of a single segment, i.e. upward columns of any length and the radius partition of downward exports among branches
+            assert_same_transport(single_segment_downward_axial_transport(nitrogen, "tree_flow"),
+                                  single_segment_downward_axial_transport(nitrogen, "iterative"))
+
+            # Without branching, water columns have a single path, so that all the transported amounts have to match
+            assert_same_transport(single_branch_axial_transport(nitrogen, "tree_flow"), single_branch_axial_transport(nitrogen, "iterative"))
+
+
+if __name__ == "__main__":
+    test_axial_transport_solvers()
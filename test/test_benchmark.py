@@ -0,0 +1,111 @@
+# Public packages
+import os, json, time, platform, resource, argparse
+import multiprocessing as mp
+import numpy as np
+import pytest
+# Model packages
+from root_cynaps.root_cynaps import Model
+# Utility packages
+from initialize.initialize import MakeScenarios as ms
+
+
+# Scenarios of the bundled RSML architectures, from the smallest to the largest root system
+ARCHITECTURES = ["Input_RSML_D1", "Input_RSML_D3", "Input_RSML_D5", "Input_RSML_D9", "Input_RSML_D11", "Input_RSML_D13"]
+
+
+def measure(scenario_name, steady_steps, connection):
+    """
+    Times the model construction, first step and following steps on one architecture, sending the results through connection.
+    Run in a fresh process so that the peak memory only accounts for this architecture.
+    """
+    scenario = ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=[scenario_name])[scenario_name]
+
+    start = time.perf_counter()
+    root_cynaps = Model(time_step=3600, **scenario)
+    construction = time.perf_counter() - start
+
+    start = time.perf_counter()
+    root_cynaps.run()
+    first_step = time.perf_counter() - start
+
+    steady = []
+    for _ in range(steady_steps):
+        start = time.perf_counter()
+        root_cynaps.run()
+        steady.append(time.perf_counter() - start)
+
+    connection.send(dict(vertices=len(root_cynaps.g.vertices(scale=root_cynaps.g.max_scale())),
+                         construction=construction, first_step=first_step,
+                         steady_step_median=float(np.median(steady)), steady_step_min=float(np.min(steady)),
+                         # Kilobytes on Linux
+                         peak_memory_MB=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+    connection.close()
+
+
+def run_benchmark(architectures=ARCHITECTURES, steady_steps=5):
+    """
+    :return: machine description and measures of each architecture, as stored in the baseline file
+    """
+    context = mp.get_context("spawn")
+    results = {}
+    for scenario_name in architectures:
+        receiver, sender = context.Pipe(duplex=False)
+        p = context.Process(target=measure, args=(scenario_name, steady_steps, sender))
+        p.start()
+        sender.close()
+        results[scenario_name] = receiver.recv()
+        p.join()
+        print(f"[INFO] {scenario_name}: {results[scenario_name]}")
+
+    machine = dict(platform=platform.platform(), processor=platform.processor(), cpu_count=os.cpu_count(),
+                   python=platform.python_version(), numpy=np.__version__)
+    return dict(machine=machine, steady_steps=steady_steps, results=results)
+
+
+def regressions(benchmark, baseline, tolerance=0.25):
+    """
+    :return: list of the measures exceeding their baseline value by more than tolerance, as a fraction of the baseline
+    """
+    exceeded = []
+    for scenario_name, measures in benchmark["results"].items():
+        reference = baseline["results"].get(scenario_name)
+        if reference is None:
+            continue
+        for name in ("construction", "first_step", "steady_step_median", "peak_memory_MB"):
+            if measures[name] > reference[name] * (1 + tolerance):
+                exceeded.append(f"{scenario_name} {name}: {measures[name]:.3g} against {reference[name]:.3g} in baseline")
+    return exceeded
+
+
+@pytest.mark.skipif(not os.environ.get("ROOT_CYNAPS_BENCHMARK"),
+                    reason="Timings depend on the machine load, set ROOT_CYNAPS_BENCHMARK=1 or run this file as a script to benchmark")
+def test_benchmark(baseline_path="outputs/benchmark_baseline.json", steady_steps=5, tolerance=0.25, update_baseline=False):
+    """
+    Compares the benchmark with the baseline measured on the same machine, the baseline being written if it doesn't exist yet.
+    Not collected by default test runs, where it would fail on a busy machine, e.g. conda builds.
+    """
+    benchmark = run_benchmark(steady_steps=steady_steps)
+
+    if update_baseline or not os.path.isfile(baseline_path):
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, "w") as f:
+            json.dump(benchmark, f, indent=1)
+        print(f"[INFO] Benchmark baseline written in {baseline_path}")
+        return
+
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    if baseline["machine"] != benchmark["machine"]:
+        print("[WARNING] Baseline has been measured on another machine or environment, comparison may not be relevant")
+    exceeded = regressions(benchmark, baseline, tolerance=tolerance)
+    assert len(exceeded) == 0, "Performance regressions:\n" + "\n".join(exceeded)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark of Root-CyNAPS on the bundled RSML architectures")
+    parser.add_argument("--baseline", default="outputs/benchmark_baseline.json")
+    parser.add_argument("--steady-steps", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+    test_benchmark(baseline_path=args.baseline, steady_steps=args.steady_steps, tolerance=args.tolerance, update_baseline=args.update_baseline)
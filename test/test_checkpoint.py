@@ -0,0 +1,60 @@
+# Public packages
+import os
+# Model packages
+from root_cynaps.root_cynaps import Model
+# Utility packages
+from initialize.initialize import MakeScenarios as ms
+
+
+def test_checkpoint(simulation_length=2, checkpoint_path="outputs/checkpoint.pckl"):
+    scenarios = ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=["Reference_Fischer"])
+    os.makedirs(os.path.dirname(checkpoint_path), exist_ok=True)
+
+    for scenario_name, scenario in scenarios.items():
+        root_cynaps = Model(time_step=3600, **scenario)
+        for _ in range(simulation_length):
+            root_cynaps.run()
+        root_cynaps.checkpoint(checkpoint_path)
+        for _ in range(simulation_length):
+            root_cynaps.run()
+        reference = {name: dict(values) for name, values in root_cynaps.g.properties().items()}
+
+        # A restored run has to continue exactly as the uninterrupted one
+        scenario = ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=[scenario_name])[scenario_name]
+        restored = Model(time_step=3600, **scenario)
+        restored.restore(checkpoint_path)
+        for _ in range(simulation_length):
+            restored.run()
+
+        assert restored.time == root_cynaps.time
+        for name, values in reference.items():
+            assert restored.g.properties()[name] == values, name
+
+
+def test_checkpoint_in_place(simulation_length=2, checkpoint_path="outputs/checkpoint.pckl"):
+    scenarios = ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=["Reference_Fischer"])
+    os.makedirs(os.path.dirname(checkpoint_path), exist_ok=True)
+
+    for scenario_name, scenario in scenarios.items():
+        root_cynaps = Model(time_step=3600, **scenario)
+        root_cynaps.run()
+        root_cynaps.checkpoint(checkpoint_path)
+        saved = {name: dict(values) for name, values in root_cynaps.g.properties().items()}
+
+        # Restoring the model which kept running brings back the saved values in the same dictionaries,
+        # emptying those of properties which did not exist yet
+        for _ in range(simulation_length):
+            root_cynaps.run()
+        root_cynaps.g.add_property("added_after_checkpoint")
+        root_cynaps.g.properties()["added_after_checkpoint"].update(dict.fromkeys(root_cynaps.g.vertices(), 1.))
+        properties = dict(root_cynaps.g.properties())
+        root_cynaps.restore(checkpoint_path)
+
+        for name, values in properties.items():
+            assert root_cynaps.g.properties()[name] is values, name
+            assert values == saved.get(name, {}), name
+
+
+if __name__ == "__main__":
+    test_checkpoint()
+    test_checkpoint_in_place()
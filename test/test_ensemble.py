@@ -0,0 +1,90 @@
+# Public packages
+import numpy as np
+# Model packages
+from root_cynaps.root_cynaps import Model
+# Utility packages
+from initialize.initialize import MakeScenarios as ms
+
+
+def test_ensemble(simulation_length=3, factors=(1., 0.5, 2.)):
+    scenarios = ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=["Reference_Fischer"])
+
+    for scenario_name, scenario in scenarios.items():
+        ensemble = Model(time_step=3600, **scenario)
+        nitrogen = ensemble.root_nitrogen
+        nitrogen.vectorized_processes = True
+        parameters = {name: [getattr(nitrogen, name) * factor for factor in factors] for name in ("vmax_Nm_root", "smax_AA", "Km_Nm_AA")}
+        ensemble.set_ensemble(**parameters)
+        for _ in range(simulation_length):
+            ensemble.run()
+
+        # Each member has to follow the run of a single model with its parameter set
+        for member in range(len(factors)):
+            scenario = ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=[scenario_name])[scenario_name]
+            single = Model(time_step=3600, **scenario)
+            single.root_nitrogen.vectorized_processes = True
+            # Ensemble members are transported with the tree_flow solver
+            single.root_nitrogen.axial_transport_solver = "tree_flow"
+            for name, values in parameters.items():
+                setattr(single.root_nitrogen, name, values[member])
+            for _ in range(simulation_length):
+                single.run()
+
+            for name in nitrogen.vertex_states:
+                expected = single.root_nitrogen.vertex_array(name)
+                assert np.allclose(nitrogen.ensemble[name][member], expected, rtol=1e-10, atol=0.), name
+            for name in nitrogen.plant_states:
+                assert np.isclose(nitrogen.ensemble[name][member], single.root_nitrogen.props[name][1], rtol=1e-10, atol=0.), name
+
+
+def grow(root_cynaps):
+    """
+    Growth step followed by the updates of the components, as in coupled models
+    """
+    root_cynaps.root_growth()
+    root_cynaps.root_anatomy.post_growth_updating()
+    root_cynaps.root_water.post_growth_updating()
+    root_cynaps.root_nitrogen.post_growth_updating()
+    root_cynaps.soil.post_growth_updating()
+    root_cynaps.root_anatomy()
+
+
+def test_ensemble_growth(simulation_length=3, factors=(1., 0.5, 2.)):
+    scenarios = ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=["Reference_Fischer"])
+
+    for scenario_name, scenario in scenarios.items():
+        ensemble = Model(time_step=3600, **scenario)
+        nitrogen = ensemble.root_nitrogen
+        nitrogen.vectorized_processes = True
+        parameters = {name: [getattr(nitrogen, name) * factor for factor in factors] for name in ("vmax_Nm_root", "smax_AA", "Km_Nm_AA")}
+        ensemble.set_ensemble(**parameters)
+        initial_size = len(nitrogen.vertices)
+        for _ in range(simulation_length):
+            grow(ensemble)
+            ensemble.run()
+        assert len(nitrogen.vertices) > initial_size
+        for name in nitrogen.vertex_states:
+            assert nitrogen.ensemble[name].shape == (len(factors), len(nitrogen.vertices)), name
+
+        # Vertices created by growth have to be partitioned in each member as in the single model with its parameter set
+        for member in range(len(factors)):
+            scenario = ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=[scenario_name])[scenario_name]
+            single = Model(time_step=3600, **scenario)
+            single.root_nitrogen.vectorized_processes = True
+            single.root_nitrogen.axial_transport_solver = "tree_flow"
+            for name, values in parameters.items():
+                setattr(single.root_nitrogen, name, values[member])
+            for _ in range(simulation_length):
+                grow(single)
+                single.run()
+
+            for name in nitrogen.vertex_states:
+                expected = single.root_nitrogen.vertex_array(name)
+                assert np.allclose(nitrogen.ensemble[name][member], expected, rtol=1e-10, atol=0.), name
+            for name in nitrogen.plant_states:
+                assert np.isclose(nitrogen.ensemble[name][member], single.root_nitrogen.props[name][1], rtol=1e-10, atol=0.), name
+
+
+if __name__ == "__main__":
+    test_ensemble()
+    test_ensemble_growth()
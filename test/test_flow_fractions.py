@@ -0,0 +1,62 @@
+# Public packages
+import numpy as np
+from openalea.mtg.traversal import pre_order2
+# Model packages
+from root_cynaps.root_cynaps import Model
+# Utility packages
+from initialize.initialize import MakeScenarios as ms
+
+
+def baseline_flow_fractions(water):
+    """
+    Fractions of their parent down flow received by vertices in the collar to tips loop partitioning axial flows, kept as reference,
+    i.e. Hagen-Poiseuille conductances normalized over siblings, or over collar children for the collar
+    """
+    fractions = {}
+    root = next(water.g.component_roots_at_scale_iter(water.g.root, scale=1))
+    for vid in pre_order2(water.g, root):
+        child = water.g.children(vid)
+        if vid not in water.collar_skip:
+            if len(child) == 1:
+                if vid == 1 and len(water.collar_children) > 0:
+                    HP = [np.pi * (water.radius[k] ** 4) / (8 * water.sap_viscosity) for k in water.collar_children]
+                    fractions.update({k: coefficient / sum(HP) for k, coefficient in zip(water.collar_children, HP)})
+                else:
+                    fractions[child[0]] = 1.
+            else:
+                HP = [np.pi * (water.radius[k] ** 4) / (8 * water.sap_viscosity) for k in child]
+                fractions.update({k: coefficient / sum(HP) for k, coefficient in zip(child, HP)})
+    return fractions
+
+
+def compare_fractions(water):
+    for vid, fraction in baseline_flow_fractions(water).items():
+        assert np.isclose(water.flow_fractions[water.topology.row[vid]], fraction, rtol=1e-12, atol=0.), vid
+
+
+def test_flow_fractions(simulation_length=2):
+    scenarios = ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=["Reference_Fischer"])
+
+    for scenario_name, scenario in scenarios.items():
+        root_cynaps = Model(time_step=3600, **scenario)
+        water = root_cynaps.root_water
+        root_cynaps.run()
+        compare_fractions(water)
+
+        # Without radius or topology change, fractions are kept between time steps
+        fractions = water.flow_fractions
+        for _ in range(simulation_length):
+            root_cynaps.run()
+        assert water.flow_fractions is fractions
+
+        # A radius change is accounted for at the next time step, in the fractions of the vertex and of its siblings
+        vid = next(vid for vid in water.vertices if len(water.g.children(vid)) > 1)
+        child = water.g.children(vid)[0]
+        water.radius[child] *= 2
+        root_cynaps.run()
+        assert water.flow_fractions is not fractions
+        compare_fractions(water)
+
+
+if __name__ == "__main__":
+    test_flow_fractions()
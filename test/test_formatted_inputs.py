@@ -0,0 +1,111 @@
+# Public packages
+import os, tempfile
+import numpy as np
+import pandas as pd
+# Model packages
+from root_cynaps.tools import formatted_inputs
+
+
+def baseline_formatted_inputs(df, original_time_step_in_days, final_time_step_in_days, n_steps):
+    """
+    Row by row resampling of formatted_inputs before it worked on arrays, kept as reference
+
+    :return: sucrose input rates and soil temperatures of the final time steps
+    """
+    input_frame = pd.DataFrame(columns=["step_number", "soil_temperature_in_degree_Celsius", "sucrose_input_rate"])
+    input_frame["step_number"] = range(1, n_steps + 1)
+
+    if final_time_step_in_days >= original_time_step_in_days:
+        j = 0
+        cumulated_time_in_days = 0.
+        sucrose_input = 0.
+        sum_of_temperature_in_degree_days = 0.
+        for i in range(0, len(df['time_in_days'])):
+            if (cumulated_time_in_days + original_time_step_in_days) < 0.9999 * final_time_step_in_days:
+                net_elapsed_time_in_days = original_time_step_in_days
+                remaining_time = 0.
+            else:
+                net_elapsed_time_in_days = original_time_step_in_days - (
+                        cumulated_time_in_days + original_time_step_in_days - final_time_step_in_days)
+                remaining_time = (cumulated_time_in_days + original_time_step_in_days - final_time_step_in_days)
+
+            sucrose_input += df.loc[i, 'sucrose_input_rate'] * net_elapsed_time_in_days * 60 * 60 * 24.
+            sum_of_temperature_in_degree_days += df.loc[i, 'soil_temperature_in_Celsius'] * net_elapsed_time_in_days
+
+            if cumulated_time_in_days + original_time_step_in_days >= 0.9999 * final_time_step_in_days \
+                    or i == len(df['time_in_days']) - 1:
+                j += 1
+                input_frame.loc[j - 1, 'sucrose_input_rate'] = sucrose_input / (
+                        (cumulated_time_in_days + net_elapsed_time_in_days) * 60. * 60. * 24.)
+                input_frame.loc[j - 1, 'soil_temperature_in_degree_Celsius'] = sum_of_temperature_in_degree_days / (
+                        cumulated_time_in_days + net_elapsed_time_in_days)
+                cumulated_time_in_days = remaining_time
+                sucrose_input = df.loc[i, 'sucrose_input_rate'] * (cumulated_time_in_days) * 60 * 60 * 24.
+                sum_of_temperature_in_degree_days = df.loc[i, 'soil_temperature_in_Celsius'] * (cumulated_time_in_days)
+            else:
+                cumulated_time_in_days += original_time_step_in_days
+
+            if j >= n_steps:
+                break
+
+    else:
+        i = 1
+        cumulated_time_in_days = 0.
+        sucrose_input_rate_initial = df.loc[0, 'sucrose_input_rate']
+        temperature_initial = df.loc[0, 'soil_temperature_in_Celsius']
+        for j in range(0, n_steps):
+            if cumulated_time_in_days + final_time_step_in_days < 0.9999 * original_time_step_in_days:
+                remaining_time = 0.
+            else:
+                remaining_time = (cumulated_time_in_days + final_time_step_in_days - original_time_step_in_days)
+
+            sucrose_input_rate = sucrose_input_rate_initial \
+                                 + (df.loc[i, 'sucrose_input_rate'] - sucrose_input_rate_initial) / original_time_step_in_days * cumulated_time_in_days
+            temperature = temperature_initial \
+                          + (df.loc[i, 'soil_temperature_in_Celsius'] - temperature_initial) / original_time_step_in_days * cumulated_time_in_days
+            input_frame.loc[j, 'sucrose_input_rate'] = sucrose_input_rate
+            input_frame.loc[j, 'soil_temperature_in_degree_Celsius'] = temperature
+
+            if cumulated_time_in_days + final_time_step_in_days >= 0.9999 * original_time_step_in_days:
+                sucrose_input_rate_initial = df.loc[i, 'sucrose_input_rate']
+                # Temperature has always been interpolated from the first original value, as the initial value was not updated
+                temperature = df.loc[i, 'soil_temperature_in_Celsius']
+                if i < len(df['time_in_days']) - 1:
+                    i += 1
+                cumulated_time_in_days = remaining_time
+            else:
+                cumulated_time_in_days += final_time_step_in_days
+
+    return (input_frame["sucrose_input_rate"].to_numpy(dtype=float),
+            input_frame["soil_temperature_in_degree_Celsius"].to_numpy(dtype=float))
+
+
+def test_formatted_inputs():
+    """
+    Resampled forcing has to match the row by row resampling on the bundled hourly inputs, when aggregating it over days,
+    keeping its time step, aggregating it over a non commensurate time step and interpolating it over shorter time steps,
+    including final time steps after the end of the original table.
+    """
+    forcing = pd.read_csv("inputs/NW_collar_Fischer_1966_Reicoski_1994.csv", sep=";")
+    original_time_step_in_days = 1 / 24.
+    df = pd.DataFrame(dict(time_in_days=forcing["t"] * original_time_step_in_days, sucrose_input_rate=forcing["AA_root_shoot_phloem"],
+                           soil_temperature_in_Celsius=forcing["soil_temperature"]))
+
+    # (original rows, final time step, simulation period) cases
+    cases = [(len(df), 1., 120.), (len(df), original_time_step_in_days, 30.), (len(df), 0.1, 110.), (48, 1 / 96., 3.)]
+    with tempfile.TemporaryDirectory() as dirpath:
+        original_input_file = os.path.join(dirpath, "original_input_file.csv")
+        for rows, final_time_step_in_days, simulation_period_in_days in cases:
+            df[:rows].to_csv(original_input_file, index=False)
+            input_frame = formatted_inputs(original_input_file=original_input_file, final_input_file=os.path.join(dirpath, "updated_input_file.csv"),
+                                           original_time_step_in_days=original_time_step_in_days, final_time_step_in_days=final_time_step_in_days,
+                                           simulation_period_in_days=simulation_period_in_days)
+            n_steps = len(input_frame)
+            sucrose_input_rate, temperature = baseline_formatted_inputs(pd.read_csv(original_input_file), original_time_step_in_days,
+                                                                        final_time_step_in_days, n_steps)
+            assert np.allclose(input_frame["sucrose_input_rate"].to_numpy(dtype=float), sucrose_input_rate, rtol=1e-9, atol=0., equal_nan=True), final_time_step_in_days
+            assert np.allclose(input_frame["soil_temperature_in_degree_Celsius"].to_numpy(dtype=float), temperature, rtol=1e-9, atol=0., equal_nan=True), final_time_step_in_days
+
+
+if __name__ == "__main__":
+    test_formatted_inputs()
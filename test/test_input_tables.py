@@ -0,0 +1,92 @@
+# Public packages
+import os, glob, tempfile
+import numpy as np
+import pandas as pd
+# Model packages
+from root_cynaps.root_cynaps import Model
+from root_cynaps.input_tables import CompiledTable
+from simulations.simulation import SharedTable
+# Utility packages
+from initialize.initialize import MakeScenarios as ms
+
+
+def test_input_tables(simulation_length=5):
+    scenarios = ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=["Reference_Fischer"])
+
+    for scenario_name, scenario in scenarios.items():
+        root_cynaps = Model(time_step=3600, **scenario)
+        components = (root_cynaps.soil, root_cynaps.root_water, root_cynaps.root_nitrogen, root_cynaps.root_anatomy, root_cynaps.root_growth)
+        for i in range(simulation_length):
+            when = root_cynaps.time
+            root_cynaps.run()
+            for compiled in root_cynaps.input_forcing.tables.values():
+                # Values applied in run are those of the table row of the time step
+                row = compiled(when)
+                for j, column in enumerate(compiled.columns):
+                    for component in components:
+                        prop = getattr(component, column, None)
+                        if isinstance(prop, dict) and len(prop) == 1:
+                            assert np.isclose(next(iter(prop.values())), row[j]), (i, column)
+
+        # The cursor also reads the tables backwards, e.g. after a restore
+        for name, table in (scenario["input_tables"] or {}).items():
+            compiled = CompiledTable(table)
+            forward = [compiled(when).copy() for when in np.arange(0., 10., 0.5)]
+            backward = [compiled(when).copy() for when in np.arange(0., 10., 0.5)[::-1]]
+            assert np.allclose(forward, backward[::-1]), name
+
+
+def test_compiled_tables(samples=500):
+    # Compiled tables are compared with an independent interpolation of the raw CSV columns, including times before and after the table
+    rng = np.random.default_rng(0)
+    for path in glob.glob("inputs/*.csv"):
+        raw = pd.read_csv(path, sep=";")
+        times = raw["t"].to_numpy(dtype=float)
+        whens = np.sort(np.concatenate([rng.uniform(times.min() - 5., times.max() + 5., samples), times[:10]]))
+        for interpolation in ("linear", "step"):
+            compiled = CompiledTable(raw, interpolation=interpolation)
+            for when in whens:
+                row = compiled(when)
+                for j, column in enumerate(compiled.columns):
+                    values = raw[column].to_numpy(dtype=float)
+                    if interpolation == "linear":
+                        expected = np.interp(when, times, values)
+                    else:
+                        expected = values[max(int(np.searchsorted(times, when, side="right")) - 1, 0)]
+                    assert np.isclose(row[j], expected, rtol=1e-12, atol=0.), (path, interpolation, when, column)
+
+
+
+def mapped(array, path):
+    """
+    :return: True if array is a view of the memory-mapped file at path
+    """
+    while array is not None:
+        if isinstance(array, np.memmap) and os.path.samefile(array.filename, path):
+            return True
+        array = getattr(array, "base", None)
+    return False
+
+
+def test_shared_tables():
+    # Tables loaded by workers have to hold the same values and be read by compiled tables without copying the mapped files
+    with tempfile.TemporaryDirectory() as dirpath:
+        for path in glob.glob("inputs/*.csv"):
+            raw = pd.read_csv(path, sep=";")
+            shared = SharedTable(raw, dirpath)
+            loaded = shared.load()
+            assert list(loaded.columns) == list(raw.columns), path
+            assert np.array_equal(loaded.to_numpy(dtype=float), raw.to_numpy(dtype=float)), path
+            assert np.array_equal(loaded.index.to_numpy(), raw.index.to_numpy()), path
+            assert all(mapped(loaded[column].to_numpy(), shared.paths[0]) for column in loaded.columns), path
+
+            compiled, expected = CompiledTable(loaded), CompiledTable(raw)
+            assert mapped(compiled.times, shared.paths[0]) and mapped(compiled.values, shared.paths[0]), path
+            assert compiled.columns == expected.columns, path
+            assert np.array_equal(compiled.times, expected.times) and np.array_equal(compiled.values, expected.values), path
+
+
+if __name__ == "__main__":
+    test_input_tables()
+    test_compiled_tables()
+    test_shared_tables()
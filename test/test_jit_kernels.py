@@ -0,0 +1,43 @@
+# Public packages
+import numpy as np
+# Model packages
+from root_cynaps.root_cynaps import Model
+from root_cynaps import kernels
+# Utility packages
+from initialize.initialize import MakeScenarios as ms
+
+
+def test_jit_kernels(simulation_length=3):
+    scenarios = ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=["Reference_Fischer"])
+    if not kernels.jit_available:
+        print("[WARNING] numba is not installed, kernels are only validated in their Python version")
+
+    for scenario_name, scenario in scenarios.items():
+        root_cynaps = Model(time_step=3600, **scenario)
+        nitrogen = root_cynaps.root_nitrogen
+        nitrogen.vectorized_processes = True
+
+        for _ in range(simulation_length):
+            root_cynaps.run()
+
+            nitrogen.jit_kernels = False
+            reference = nitrogen.vectorized_rates(nitrogen.active_vertices)
+            # Compiled rates, which fall back to the NumPy formulations without numba, have to match them
+            nitrogen.jit_kernels = True
+            compiled = nitrogen.vectorized_rates(nitrogen.active_vertices)
+            for name, values in reference.items():
+                assert np.allclose(compiled[name], values, rtol=1e-12, atol=0.), name
+
+            # Python versions of the kernels are checked even without numba
+            arrays = {name: nitrogen.vertex_array(name, nitrogen.active_vertices) for name in ("Nm", "AA", "struct_mass", "C_hexose_root", "soil_temperature")}
+            temperature_factor = nitrogen.process_temperature_modification(soil_temperature=arrays["soil_temperature"], processes="active")
+            synthesis = kernels.AA_synthesis.py_func(arrays["struct_mass"], arrays["Nm"], arrays["C_hexose_root"], temperature_factor,
+                                                     nitrogen.smax_AA, nitrogen.Km_Nm_AA, nitrogen.Km_C_AA)
+            assert np.allclose(synthesis, reference["AA_synthesis"], rtol=1e-12, atol=0.)
+            catabolism = kernels.catabolism.py_func(arrays["struct_mass"], arrays["AA"], arrays["C_hexose_root"], temperature_factor,
+                                                    nitrogen.cmax_AA, nitrogen.Km_AA_catab, nitrogen.storage_C_regulation)
+            assert np.allclose(catabolism, reference["AA_catabolism"], rtol=1e-12, atol=0.)
+
+
+if __name__ == "__main__":
+    test_jit_kernels()
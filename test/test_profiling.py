@@ -0,0 +1,65 @@
+# Public packages
+import os, sys
+# Model packages
+from root_cynaps.root_cynaps import Model
+# Utility packages
+from initialize.initialize import MakeScenarios as ms
+
+
+def test_profiling(simulation_length=3):
+    scenarios = ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=["Reference_Fischer"])
+
+    for scenario_name, scenario in scenarios.items():
+        root_cynaps = Model(time_step=3600, **scenario)
+        root_cynaps.run()
+
+        root_cynaps.start_profiling()
+        for _ in range(simulation_length):
+            root_cynaps.run()
+        profiler = root_cynaps.stop_profiling()
+        # Once stopped, runs are not traced anymore
+        assert sys.getprofile() is None
+        root_cynaps.run()
+
+        table = profiler.table()
+        assert sorted(table["step"].unique()) == list(range(root_cynaps.time - simulation_length - 1, root_cynaps.time - 1))
+        steps = table[table["process"] == "step"].set_index("step")["wall_time"]
+        for component in ("RootWaterModel", "RootNitrogenModel"):
+            calls = table[(table["component"] == component) & (table["process"] == "__call__")].set_index("step")
+            assert (calls["calls"] >= 1).all(), component
+            assert (calls["wall_time"] <= steps[calls.index]).all(), component
+        # Decorated processes are traced
+        assert (table[table["process"] == "_import_Nm"]["vertices"] > 0).all()
+
+        os.makedirs("outputs", exist_ok=True)
+        profiler.to_csv("outputs/step_profile.csv")
+        profiler.to_json("outputs/step_profile.json")
+
+
+def test_profiling_interrupted():
+    scenarios = ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=["Reference_Fischer"])
+
+    for scenario_name, scenario in scenarios.items():
+        root_cynaps = Model(time_step=3600, **scenario)
+        root_cynaps.start_profiling()
+        # A failing step doesn't leave the profiling hook installed
+        input_forcing, root_cynaps.input_forcing = root_cynaps.input_forcing, None
+        try:
+            root_cynaps.run()
+        except AttributeError:
+            pass
+        assert sys.getprofile() is None
+        root_cynaps.input_forcing = input_forcing
+
+        # Stopping profiling while a step is recorded removes the hook
+        root_cynaps.profiler.start(root_cynaps.time)
+        profiler = root_cynaps.stop_profiling()
+        assert sys.getprofile() is None
+        # The failed step and the interrupted one are both recorded
+        table = profiler.table()
+        assert len(table[table["process"] == "step"]) == 2
+
+
+if __name__ == "__main__":
+    test_profiling()
+    test_profiling_interrupted()
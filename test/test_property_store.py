@@ -0,0 +1,38 @@
+# Public packages
+import pickle
+# Model packages
+from root_cynaps.root_cynaps import Model
+from root_cynaps.property_store import ColumnarProperty
+# Utility packages
+from initialize.initialize import MakeScenarios as ms
+
+
+def test_property_store(simulation_length=3):
+    scenarios = ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=["Reference_Fischer"])
+
+    for scenario_name, scenario in scenarios.items():
+        scenario["parameters"]["root_cynaps"]["roots"]["columnar_properties"] = True
+        columnar = Model(time_step=3600, **scenario)
+        nitrogen = columnar.root_nitrogen
+        assert isinstance(nitrogen.Nm, ColumnarProperty) and nitrogen.Nm is columnar.g.properties()["Nm"]
+        # Components sharing a property keep sharing it
+        assert columnar.root_water.struct_mass is nitrogen.struct_mass
+
+        scenario = ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=[scenario_name])[scenario_name]
+        reference = Model(time_step=3600, **scenario)
+        for model in (columnar, reference):
+            model.root_nitrogen.vectorized_processes = True
+            for _ in range(simulation_length):
+                model.run()
+
+        # Columns store the same values as the dictionaries they replace
+        for name, values in reference.g.properties().items():
+            assert columnar.g.properties()[name] == values, name
+
+        # Properties are pickled with their shared index, as in checkpoints
+        restored = pickle.loads(pickle.dumps(columnar.g.properties()))
+        assert restored["Nm"] == nitrogen.Nm and restored["Nm"].index is restored["AA"].index
+
+
+if __name__ == "__main__":
+    test_property_store()
@@ -0,0 +1,92 @@
+# Public packages
+import os, tempfile
+import numpy as np
+import xarray as xr
+# Model packages
+from root_cynaps.root_cynaps import Model
+from root_cynaps.output_properties import state_extracts, flow_extracts, global_state_extracts, global_flow_extracts
+from root_cynaps.property_views import PropertyViews, RingBufferLogger
+from root_cynaps.simulation_no_C import NetCDFTimeWriter
+# Utility packages
+from initialize.initialize import MakeScenarios as ms
+
+
+class DatasetsList:
+    """
+    Writer keeping the flushed datasets in memory
+    """
+    def __init__(self):
+        self.datasets = []
+
+    def append(self, datasets):
+        self.datasets.append(xr.concat(datasets, dim="t"))
+
+
+def test_property_views(simulation_length=5, buffered_steps=2):
+    scenarios = ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=["Reference_Fischer"])
+    log_outputs = {}
+    for d in [state_extracts, flow_extracts, global_state_extracts, global_flow_extracts]:
+        log_outputs.update(d)
+
+    for scenario_name, scenario in scenarios.items():
+        root_cynaps = Model(time_step=3600, **scenario)
+        g = root_cynaps.g
+        writer = DatasetsList()
+        logger = RingBufferLogger(PropertyViews(g, variables=log_outputs), writer, capacity=buffered_steps)
+
+        expected = []
+        for i in range(simulation_length):
+            root_cynaps.run()
+            logger.snapshot(time=i)
+            props = g.properties()
+            expected.append({name: np.array([props.get(name, {}).get(vid, np.nan) for vid in logger.views.vids], dtype=float)
+                             for name in log_outputs})
+            # Views are aligned on the same rows as the logged vertices
+            assert np.array_equal(logger.views["Nm"], expected[-1]["Nm"], equal_nan=True)
+        logger.flush()
+
+        logged = xr.concat(writer.datasets, dim="t")
+        assert list(logged["t"].values) == list(range(simulation_length))
+        for i in range(simulation_length):
+            for name in log_outputs:
+                assert np.array_equal(logged[name].isel(t=i).values, expected[i][name], equal_nan=True), (i, name)
+
+
+def test_property_views_growth(simulation_length=6, buffered_steps=3, growth_steps=(2, 3)):
+    scenarios = ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=["Reference_Fischer"])
+
+    for scenario_name, scenario in scenarios.items():
+        root_cynaps = Model(time_step=3600, **scenario)
+        g = root_cynaps.g
+        props = g.properties()
+        file_path = os.path.join(tempfile.mkdtemp(), "merged.nc")
+        writer = NetCDFTimeWriter(file_path, time_dim="t", scenario=dict(scenario_name=scenario_name, growing=True))
+        logger = RingBufferLogger(PropertyViews(g, variables=dict(Nm=state_extracts["Nm"])), writer, capacity=buffered_steps)
+
+        expected = []
+        for i in range(simulation_length):
+            if i in growth_steps:
+                # Vertices added between snapshots, as growth does, flushing the buffered steps with fewer vertices
+                tip = max(g.vertices(scale=g.max_scale()))
+                for _ in range(2):
+                    tip = g.add_child(tip, edge_type="<", label="Segment")
+                    props["Nm"][tip] = float(i)
+            # Values change at each step
+            props["Nm"].update((vid, value * 1.1) for vid, value in list(props["Nm"].items()))
+            logger.snapshot(time=i)
+            expected.append(dict(props["Nm"]))
+        logger.flush()
+        writer.close()
+
+        logged = xr.open_dataset(file_path)
+        assert logged.sizes["vid"] == len(expected[-1])
+        for i, values in enumerate(expected):
+            logged_values = logged["Nm"].isel(scenario_name=0, growing=0, t=i)
+            for vid in logged["vid"].values:
+                # Vertices which did not exist yet are NaN
+                assert np.isclose(logged_values.sel(vid=vid).item(), values.get(vid, np.nan), equal_nan=True), (i, vid)
+
+
+if __name__ == "__main__":
+    test_property_views()
+    test_property_views_growth()
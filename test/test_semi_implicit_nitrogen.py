@@ -0,0 +1,77 @@
+# Public packages
+import numpy as np
+# Model packages
+from root_cynaps.root_cynaps import Model
+# Utility packages
+from initialize.initialize import MakeScenarios as ms
+
+
+def run_nitrogen(scenario_name, duration, time_step, pool_update_solver):
+    scenario = ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=[scenario_name])[scenario_name]
+    root_cynaps = Model(time_step=time_step, **scenario)
+    root_cynaps.root_nitrogen.pool_update_solver = pool_update_solver
+    for _ in range(int(duration / time_step)):
+        root_cynaps.run()
+    return root_cynaps.root_nitrogen
+
+
+def test_semi_implicit_nitrogen(duration=6 * 3600, rtol=0.05):
+    """
+    Plant scale pools of semi implicit runs have to follow the hourly explicit reference over the same duration,
+    the scheme being of first order the bound is rtol at 1 h and grows proportionally to the time step, i.e. 2 * rtol at 2 h, 3 * rtol at 3 h and 6 * rtol at 6 h.
+    """
+    scenarios = ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=["Reference_Fischer"])
+
+    for scenario_name in scenarios:
+        explicit = run_nitrogen(scenario_name, duration, 3600, "explicit")
+        for time_step in (3600, 2 * 3600, 3 * 3600, 6 * 3600):
+            semi_implicit = run_nitrogen(scenario_name, duration, time_step, "semi_implicit")
+            # Pools stay positive without deficits carried over
+            for name in ("Nm", "AA"):
+                assert (semi_implicit.vertex_array(name) >= 0.).all(), (time_step, name)
+            emerged = semi_implicit.vertex_array("struct_mass") > 0
+            for name in ("deficit_Nm", "deficit_AA"):
+                assert (semi_implicit.vertex_array(name)[emerged] == 0.).all(), (time_step, name)
+
+            bound = rtol * time_step / 3600
+            for name in ("total_Nm", "total_AA", "total_xylem_Nm", "total_xylem_AA"):
+                assert np.isclose(semi_implicit.props[name][1], explicit.props[name][1], rtol=bound, atol=0.), (time_step, name)
+
+
+def test_semi_implicit_mass_balance(time_step=6 * 3600, simulation_length=2):
+    """
+    The amounts of Nm and AA pools change exactly by the limited rates they exchange, loadings of xylem being those same rates,
+    so that receiving pools are not credited with more than what the donor pools lost.
+    """
+    scenarios = ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=["Reference_Fischer"])
+
+    for scenario_name, scenario in scenarios.items():
+        root_cynaps = Model(time_step=time_step, **scenario)
+        nitrogen = root_cynaps.root_nitrogen
+        nitrogen.pool_update_solver = "semi_implicit"
+        # Deficits of the initialization would otherwise be debited at the first step
+        for name in ("deficit_Nm", "deficit_AA"):
+            nitrogen.props[name].update(dict.fromkeys(nitrogen.props[name], 0.))
+
+        for i in range(simulation_length):
+            struct_mass = nitrogen.vertex_array("struct_mass")
+            Nm, AA = nitrogen.vertex_array("Nm") * struct_mass, nitrogen.vertex_array("AA") * struct_mass
+            root_cynaps.run()
+            rates = {name: nitrogen.vertex_array(name) for name, _, _, _, _ in nitrogen.pool_transfers()}
+            emerged = struct_mass > 0
+
+            Nm_balance = Nm + time_step * (rates["import_Nm"] + rates["mychorizal_mediated_import_Nm"] + rates["nitrogenase_fixation"]
+                                           - rates["diffusion_Nm_soil"] + rates["diffusion_Nm_xylem"] - rates["export_Nm"]
+                                           - rates["AA_synthesis"] * nitrogen.r_Nm_AA + rates["AA_catabolism"] / nitrogen.r_Nm_AA)
+            AA_balance = AA + time_step * (rates["import_AA"] + rates["diffusion_AA_phloem"] - rates["diffusion_AA_soil"] - rates["export_AA"]
+                                           + rates["AA_synthesis"] - rates["struct_synthesis"] - rates["storage_synthesis"] * nitrogen.r_AA_stor
+                                           + rates["storage_catabolism"] / nitrogen.r_AA_stor - rates["AA_catabolism"])
+            assert np.allclose((nitrogen.vertex_array("Nm") * struct_mass)[emerged], Nm_balance[emerged], rtol=1e-9, atol=1e-12 * Nm.max()), i
+            assert np.allclose((nitrogen.vertex_array("AA") * struct_mass)[emerged], AA_balance[emerged], rtol=1e-9, atol=1e-12 * AA.max()), i
+            for name in ("deficit_Nm", "deficit_AA"):
+                assert (nitrogen.vertex_array(name)[emerged] == 0.).all(), (i, name)
+
+
+if __name__ == "__main__":
+    test_semi_implicit_nitrogen()
+    test_semi_implicit_mass_balance()
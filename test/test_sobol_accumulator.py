@@ -0,0 +1,42 @@
+# Public packages
+import numpy as np
+from SALib.analyze import sobol
+from SALib.sample import sobol as sobol_sample
+from SALib.test_functions import Ishigami
+# Model packages
+from simulations.sensitivity_analysis import SobolAccumulator
+
+
+def test_sobol_accumulator(N=64, seed=3):
+    """
+    Indices accumulated scenario by scenario, in any completion order, have to be those of SALib sobol.analyze on the whole plan,
+    with the same structure and the same confidence intervals for the same seed.
+    """
+    problem = dict(num_vars=3, names=["x1", "x2", "x3"], bounds=[[-np.pi, np.pi]] * 3)
+    X = sobol_sample.sample(problem, N, calc_second_order=True, seed=seed)
+    times, outputs = [0, 1], ["ishigami", "product"]
+    # (scenarios, times, outputs) values of a known plan
+    Y = np.empty((len(X), len(times), len(outputs)))
+    Y[:, 0, 0] = Ishigami.evaluate(X)
+    Y[:, 0, 1] = X[:, 0] * X[:, 1] + X[:, 2]
+    Y[:, 1, 0] = 2 * Ishigami.evaluate(X) + X[:, 2]
+    Y[:, 1, 1] = X[:, 0] * X[:, 1] * X[:, 2]
+
+    accumulator = SobolAccumulator(problem, times, outputs, seed=seed)
+    assert accumulator.indices is None
+    for index in np.random.default_rng(seed).permutation(len(X)):
+        accumulator.push(index, Y[index])
+    assert len(accumulator.complete) == N
+
+    for i, t in enumerate(times):
+        for j, output in enumerate(outputs):
+            expected = sobol.analyze(problem, Y[:, i, j], calc_second_order=True, seed=seed)
+            indices = accumulator.indices[t][output]
+            assert set(indices) == {"S1", "S1_conf", "ST", "ST_conf", "S2", "S2_conf"}
+            for key, values in indices.items():
+                assert values.shape == expected[key].shape, (t, output, key)
+                assert np.allclose(values, expected[key], rtol=1e-9, atol=1e-12, equal_nan=True), (t, output, key)
+
+
+if __name__ == "__main__":
+    test_sobol_accumulator()
@@ -0,0 +1,41 @@
+# Public packages
+import numpy as np
+# Model packages
+from root_cynaps.root_cynaps import Model
+from root_cynaps.spatial_index import spatial_index
+# Utility packages
+from initialize.initialize import MakeScenarios as ms
+
+
+def test_spatial_index(queries=50, radius=0.01):
+    scenarios = ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=["Reference_Fischer"])
+
+    for scenario_name, scenario in scenarios.items():
+        root_cynaps = Model(time_step=3600, **scenario)
+        g = root_cynaps.g
+        props = g.properties()
+        index = spatial_index(g)
+        assert spatial_index(g) is index
+
+        vids = np.array([vid for vid in props["x2"]])
+        coordinates = np.array([(props["x2"][vid], props["y2"][vid], props["z2"][vid]) for vid in vids])
+        rng = np.random.default_rng(0)
+        points = coordinates.min(axis=0) + rng.random((queries, 3)) * (coordinates.max(axis=0) - coordinates.min(axis=0))
+        distances = np.sqrt(((points[:, np.newaxis] - coordinates[np.newaxis]) ** 2).sum(axis=2))
+
+        # Same vertices as the exhaustive search done by the picker before
+        nearest, nearest_distances = index.nearest_vertices(points)
+        assert np.array_equal(nearest, vids[distances.argmin(axis=1)])
+        assert np.allclose(nearest_distances, distances.min(axis=1))
+        for point, point_distances in zip(points, distances):
+            assert sorted(index.within(point, radius)) == sorted(vids[point_distances <= radius].tolist())
+
+        # Moving a vertex, as growth elongates apexes, is seen by the next query without invalidating the index
+        vid = int(vids[-1])
+        moved = coordinates.max(axis=0) + 1.
+        props["x2"][vid], props["y2"][vid], props["z2"][vid] = moved
+        assert index.nearest(moved) == (vid, 0.)
+
+
+if __name__ == "__main__":
+    test_spatial_index()
@@ -0,0 +1,64 @@
+# Public packages
+from inspect import signature
+import numpy as np
+# Model packages
+from root_cynaps.root_cynaps import Model
+# Utility packages
+from initialize.initialize import MakeScenarios as ms
+
+
+def per_vertex(nitrogen, name):
+    f = getattr(nitrogen, "_" + name)
+    return np.array([f(*(vid if arg == "vertex_index" else nitrogen.props[arg][vid] for arg in signature(f).parameters))
+                     for vid in nitrogen.vertices], dtype=float)
+
+
+def test_vectorized_nitrogen(simulation_length=3):
+    scenarios = ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=["Reference_Fischer"])
+
+    for scenario_name, scenario in scenarios.items():
+        root_cynaps = Model(time_step=3600, **scenario)
+        nitrogen = root_cynaps.root_nitrogen
+
+        for _ in range(simulation_length):
+            root_cynaps.run()
+
+            # Rates computed on arrays have to match the per-vertex computation
+            for name, values in nitrogen.vectorized_rates().items():
+                assert np.allclose(values, per_vertex(nitrogen, name), rtol=1e-10, atol=0.), name
+
+            # Same for states, which are not written back here
+            for name, values in nitrogen.vectorized_states().items():
+                if name in nitrogen.vertex_states:
+                    assert np.allclose(values, per_vertex(nitrogen, name), rtol=1e-10, atol=0.), name
+
+
+def test_vectorized_step(simulation_length=3):
+    scenarios = ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=["Reference_Fischer"])
+
+    for scenario_name in scenarios:
+        runs = []
+        for vectorized_processes in (False, True):
+            scenario = ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=[scenario_name])[scenario_name]
+            root_cynaps = Model(time_step=3600, **scenario)
+            root_cynaps.root_nitrogen.vectorized_processes = vectorized_processes
+            for _ in range(simulation_length):
+                root_cynaps.run()
+            runs.append(root_cynaps.g.properties())
+
+        # Whole time steps computed with vectorized_step have to give the same properties as the per-vertex scheduling
+        per_vertex_run, vectorized_run = runs
+        assert per_vertex_run.keys() == vectorized_run.keys()
+        for name, values in per_vertex_run.items():
+            assert values.keys() == vectorized_run[name].keys(), name
+            for vid, value in values.items():
+                other = vectorized_run[name][vid]
+                if isinstance(value, (int, float, np.number)) and not isinstance(value, bool):
+                    assert np.isclose(other, value, rtol=1e-10, atol=0., equal_nan=True), (name, vid, value, other)
+                else:
+                    assert other == value, (name, vid)
+
+
+if __name__ == "__main__":
+    test_vectorized_nitrogen()
+    test_vectorized_step()
@@ -0,0 +1,74 @@
+# Public packages
+import numpy as np
+from openalea.mtg.traversal import pre_order2
+# Model packages
+from root_cynaps.root_cynaps import Model
+# Utility packages
+from initialize.initialize import MakeScenarios as ms
+
+
+def baseline_partition_axial_flows(water, total_delta_water):
+    """
+    Collar to tips loop computing the axial flows before the level by level sweep, kept as reference
+    """
+    root = next(water.g.component_roots_at_scale_iter(water.g.root, scale=1))
+    for vid in pre_order2(water.g, root):
+        child = water.g.children(vid)
+        if vid not in water.collar_skip:
+            delta_water = total_delta_water * water.xylem_water[vid] / water.total_xylem_water[1]
+            if (vid != 1) and ((len(child) == 0) or (True not in [water.struct_mass[k] > 0 for k in child])):
+                water.axial_import_water_down[vid] = 0
+            else:
+                water.axial_import_water_down[vid] = delta_water - water.radial_import_water[vid] + water.axial_export_water_up[vid]
+
+            if len(child) == 1:
+                if vid == 1 and len(water.collar_children) > 0:
+                    HP = [np.pi * (water.radius[k] ** 4) / (8 * water.sap_viscosity) for k in water.collar_children]
+                    for k, coefficient in zip(water.collar_children, HP):
+                        water.axial_export_water_up[k] = (coefficient / sum(HP)) * water.axial_import_water_down[vid]
+                else:
+                    water.axial_export_water_up[child[0]] = water.axial_import_water_down[vid]
+            else:
+                HP = [np.pi * (water.radius[k] ** 4) / (8 * water.sap_viscosity) for k in child]
+                for k, coefficient in zip(child, HP):
+                    water.axial_export_water_up[k] = (coefficient / sum(HP)) * water.axial_import_water_down[vid]
+
+
+def compare_partitions(water):
+    names = ("axial_export_water_up", "axial_import_water_down")
+    total_delta_water = sum(water.radial_import_water.values()) - water.axial_export_water_up[1]
+    saved = {name: dict(water.props[name]) for name in names}
+    baseline_partition_axial_flows(water, total_delta_water)
+    expected = {name: dict(water.props[name]) for name in names}
+    for name, values in saved.items():
+        water.props[name].update(values)
+
+    water.partition_axial_flows(total_delta_water)
+    for name, values in expected.items():
+        for vid, value in values.items():
+            assert np.isclose(water.props[name][vid], value, rtol=1e-9, atol=1e-30), (name, vid, water.props[name][vid], value)
+
+
+def test_water_flow_levels():
+    scenarios = ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=["Reference_Fischer"])
+
+    for scenario_name, scenario in scenarios.items():
+        root_cynaps = Model(time_step=3600, **scenario)
+        water = root_cynaps.root_water
+        root_cynaps.run()
+        g = water.g
+        # The level sweep has to partition flows among branches as the baseline loop did
+        assert any(len(g.children(vid)) > 1 for vid in water.vertices)
+        compare_partitions(water)
+
+        # Same when collar flow is partitioned among collar children, i.e. emerged children of a non emerged vertex below collar
+        if len(water.collar_children) == 0:
+            collar_child = next(vid for vid in g.children(1) if any(water.struct_mass[k] > 0 for k in g.children(vid)))
+            water.struct_mass[collar_child] = 0.
+            water.post_coupling_init()
+        assert len(water.collar_children) > 0
+        compare_partitions(water)
+
+
+if __name__ == "__main__":
+    test_water_flow_levels()
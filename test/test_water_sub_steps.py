@@ -0,0 +1,93 @@
+# Public packages
+import numpy as np
+# Model packages
+from root_cynaps.root_cynaps import Model
+# Utility packages
+from initialize.initialize import MakeScenarios as ms
+
+
+def run_water(scenario, simulation_length, **sub_stepping):
+    root_cynaps = Model(time_step=3600, **scenario)
+    for name, value in sub_stepping.items():
+        setattr(root_cynaps.root_water, name, value)
+    for _ in range(simulation_length):
+        root_cynaps.run()
+    return root_cynaps.root_water
+
+
+def test_water_sub_steps(simulation_length=5):
+    scenarios = ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=["Reference_Fischer"])
+
+    for scenario_name, scenario in scenarios.items():
+        adaptive = run_water(scenario, simulation_length)
+        statistics = adaptive.sub_stepping_statistics()
+        assert statistics["time_steps"] == simulation_length
+        assert adaptive.min_sub_steps <= statistics["min"] <= statistics["max"] <= adaptive.max_sub_steps
+
+        # Adaptive sub-steps have to follow the finest fixed sub-steps within the accuracy criterion
+        scenario = ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=[scenario_name])[scenario_name]
+        fixed = run_water(scenario, simulation_length, min_sub_steps=adaptive.max_sub_steps)
+        assert fixed.sub_stepping_statistics()["mean"] == fixed.max_sub_steps
+        assert np.isclose(adaptive.total_xylem_water[1], fixed.total_xylem_water[1], rtol=simulation_length * adaptive.max_xylem_water_change)
+
+
+def test_sub_step_flows(simulation_length=5):
+    scenarios = ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=["Reference_Fischer"])
+
+    for scenario_name, scenario in scenarios.items():
+        root_cynaps = Model(time_step=3600, **scenario)
+        water = root_cynaps.root_water
+        water.min_sub_steps, water.max_sub_steps = 1, 10
+        reference_sub_step = root_cynaps.root_water.time_step / water.max_sub_steps
+
+        fine = Model(time_step=3600, **ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=[scenario_name])[scenario_name])
+        fine.root_water.min_sub_steps = fine.root_water.max_sub_steps = water.max_sub_steps
+
+        for _ in range(simulation_length):
+            root_cynaps.run()
+            fine.run()
+            # Whatever the number of sub-steps, flows are amounts over the reference sub-step, as in the fixed fine sub-stepping
+            potential_transpiration = water.water_root_shoot_xylem[1] * reference_sub_step
+            assert water.axial_export_water_up[1] <= potential_transpiration * (1 + 1e-9)
+            assert np.isclose(water.axial_export_water_up[1], fine.root_water.axial_export_water_up[1], rtol=water.max_xylem_water_change)
+            assert np.isclose(sum(water.radial_import_water.values()), sum(fine.root_water.radial_import_water.values()),
+                              rtol=simulation_length * water.max_xylem_water_change, atol=1e-3 * potential_transpiration)
+        # Flows have been rescaled at least once
+        assert water.sub_stepping_statistics()["min"] < water.max_sub_steps
+
+
+
+def test_fixed_sub_steps(simulation_length=5):
+    """
+    Fixed sub-steps have to reproduce the former water component built with time_step / 10, called once per sub-step.
+    """
+    scenarios = ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=["Reference_Fischer"])
+
+    for scenario_name, scenario in scenarios.items():
+        fixed = Model(time_step=3600, **scenario)
+        fixed.root_water.min_sub_steps = fixed.root_water.max_sub_steps = 10
+
+        former = Model(time_step=3600, **ms.from_table(file_path="inputs/Scenarios_24_06.xlsx", which=[scenario_name])[scenario_name])
+        former.root_water.time_step = former.root_water.time_step / 10
+        former.root_water.min_sub_steps = former.root_water.max_sub_steps = 1
+
+        for i in range(simulation_length):
+            # Water is run alone, so that other components do not feed back on the compared states
+            for model in (fixed, former):
+                model.input_forcing.apply(when=model.time)
+            fixed.root_water()
+            for _ in range(10):
+                former.root_water()
+            fixed.time += 1
+            former.time += 1
+
+            for name, values in former.g.properties().items():
+                if name != "water_sub_steps":
+                    assert fixed.g.properties()[name] == values, (i, name)
+        assert fixed.root_water.sub_stepping_statistics()["mean"] == 10
+
+
+if __name__ == "__main__":
+    test_water_sub_steps()
+    test_sub_step_flows()
+    test_fixed_sub_steps()